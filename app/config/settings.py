@@ -1,10 +1,15 @@
 import os
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 SETTINGS_PATH = os.path.join("app", "config", "settings.json")
 
+# Copia en memoria para rutas calientes (búsqueda RAG); se invalida al guardar
+_settings_cache = None
+_settings_cache_lock = threading.Lock()
+
 def load_settings():
     """Carga la configuración desde settings.json"""
     try:
@@ -17,6 +22,28 @@ def load_settings():
         logger.error(f"❌ Error en JSON de configuración: {e}")
         return create_default_settings()
 
+def get_cached_settings():
+    """
+    Configuración en memoria sin releer settings.json en cada llamada
+
+    El diccionario es compartido: solo lectura (para modificar la
+    configuración usar load_settings + save_settings).
+    """
+    global _settings_cache
+    settings = _settings_cache
+    if settings is None:
+        with _settings_cache_lock:
+            if _settings_cache is None:
+                _settings_cache = load_settings()
+            settings = _settings_cache
+    return settings
+
+def invalidate_settings_cache():
+    """Descarta la copia en memoria (tras escribir settings.json)"""
+    global _settings_cache
+    with _settings_cache_lock:
+        _settings_cache = None
+
 def save_settings(data):
     """Guarda la configuración en settings.json"""
     try:
@@ -25,6 +52,7 @@ def save_settings(data):
         
         with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
+        invalidate_settings_cache()
         logger.info("✅ Configuración guardada correctamente")
     except Exception as e:
         logger.error(f"❌ Error guardando configuración: {e}")
@@ -37,6 +65,91 @@ def create_default_settings():
         "modelo_openai": "gpt-4",
         "default_model_type": "local",  # "local" o "openai"
         "rag_k": 5,
+        "rag_min_similarity": 0.25,
+        "rag_adaptive_margin": 0.2,
+        "rag_search_mode": "hybrid",
+        "embedding_backend": "torch",
+        "embedding_onnx_quantization": "avx2",
+        "embedding_cache": {
+            "max_size": 1024,
+            "ttl_seconds": 3600
+        },
+        "retrieval_cache": {
+            "max_size": 512,
+            "ttl_seconds": 600
+        },
+        "embedding_batching": {
+            "batch_size": 64
+        },
+        "embedding_workers": 0,
+        "embedding_pool_chunk_size": 256,
+        "ingestion_parse_workers": 0,
+        "ingestion_file_timeout": 300,
+        "ingestion_flush_batch": 256,
+        "ingestion_queue_size": 8,
+        "document_classifier_max_chars": 0,
+        "structural_chunk_max_chars": 4000,
+        "parsed_text_cache": {
+            "enabled": True,
+            "path": "vectorstore/parsed_cache",
+            "max_size_mb": 2048,
+            "max_age_days": 0
+        },
+        "ingestion_jobs": {
+            "max_concurrent": 1,
+            "db_path": "vectorstore/ingestion_jobs.sqlite",
+            "progress_interval_seconds": 1.0,
+            "history_limit": 200
+        },
+        "browser_pool": {
+            "size": 2,
+            "max_pages_per_driver": 50,
+            "page_load_timeout": 30,
+            "ready_timeout": 10
+        },
+        "web_crawler": {
+            "concurrency": 8,
+            "per_host_concurrency": 4,
+            "per_host_delay": 0.1,
+            "timeout": 15,
+            "min_text_chars": 200,
+            "browser_fallback": True,
+            "checkpoint_pages": 25,
+            "frontier": {
+                "path_priorities": {},
+                "max_query_variants_per_path": 10,
+                "respect_robots": True,
+                "use_sitemaps": True,
+                "max_sitemap_urls": 5000
+            }
+        },
+        "web_boilerplate": {
+            "enabled": True,
+            "min_page_ratio": 0.3,
+            "min_pages": 3,
+            "warmup_pages": 10,
+            "max_fingerprints_per_host": 50000,
+            "near_duplicates": True,
+            "simhash_max_distance": 3
+        },
+        "web_ingestion": {
+            "batch_size": 256
+        },
+        "chunk_embedding_cache": {
+            "enabled": True,
+            "path": "vectorstore/embedding_cache.sqlite"
+        },
+        "pdf_extraction": {
+            "min_chars_per_page": 20,
+            "min_alnum_ratio": 0.5,
+            "max_word_length": 25,
+            "parallel_min_pages": 40,
+            "workers": 0
+        },
+        "token_chunking": {
+            "max_tokens": 0,
+            "overlap_tokens": 32
+        },
         "document_folders": [],
         "web_sources": [],
         "api_sources": [],
@@ -83,6 +196,31 @@ def get_rag_k():
     config = load_settings()
     return config.get("rag_k", 5)
 
+def get_rag_min_similarity():
+    """Obtiene la similitud mínima para aceptar un fragmento RAG"""
+    config = get_cached_settings()
+    return config.get("rag_min_similarity", 0.25)
+
+def get_rag_adaptive_margin():
+    """Obtiene el margen respecto al mejor fragmento para el k adaptativo (None = desactivado)"""
+    config = get_cached_settings()
+    return config.get("rag_adaptive_margin", 0.2)
+
+def get_rag_search_mode():
+    """Obtiene el modo de búsqueda RAG (vector, hybrid o lexical)"""
+    config = get_cached_settings()
+    return config.get("rag_search_mode", "hybrid")
+
+def get_embedding_backend():
+    """Obtiene el backend de embeddings (torch, onnx u onnx-int8)"""
+    config = load_settings()
+    return config.get("embedding_backend", "torch")
+
+def get_embedding_onnx_quantization():
+    """Obtiene la configuración de cuantización int8 para ONNX (avx2, avx512, avx512_vnni, arm64)"""
+    config = load_settings()
+    return config.get("embedding_onnx_quantization", "avx2")
+
 def get_model_preferences():
     """Obtiene las preferencias de modelos para diferentes funciones"""
     config = load_settings()
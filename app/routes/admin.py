@@ -156,8 +156,11 @@ def test_specific_model(model_type):
 @admin_bp.route("/admin/status")
 def admin_status():
     """Endpoint para obtener estado actual del sistema"""
+    from app.utils.embedding_registry import get_embedding_registry_stats
+    
     return {
         "system_status": model_manager.get_system_status(),
         "available_models": model_manager.get_available_models(),
+        "embedding_models": get_embedding_registry_stats(),
         "config": get_available_models_config()
     }
\ No newline at end of file
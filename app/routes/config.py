@@ -13,8 +13,10 @@ from app.utils.rag_utils import (
     obtener_estadisticas_vectorstore,
     buscar_por_tipo_documento,
     obtener_tipos_documento_disponibles,
-    reindexar_fuente
+    FUENTES_REINDEXABLES
 )
+from app.services.ingestion_jobs import get_ingestion_jobs, submit_document_ingestion
+from app.config.settings import invalidate_settings_cache
 
 config_bp = Blueprint("config", __name__)
 CONFIG_PATH = os.path.join("app", "config", "settings.json")
@@ -37,6 +39,7 @@ def guardar_config(data):
     try:
         with open(CONFIG_PATH, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
+        invalidate_settings_cache()
         return True
     except Exception as e:
         logger.error(f"❌ Error guardando config: {e}")
@@ -72,14 +75,18 @@ def config():
                 flash("❌ El valor debe ser un número entero", "danger")
             return redirect("/config")
 
-        # NUEVA FUNCIONALIDAD: Reindexar con LlamaIndex
+        # Reindexar con LlamaIndex en segundo plano
         if accion == "reindexar_documentos":
+            if not carpetas:
+                flash("⚠️ No hay carpetas configuradas para reindexar", "warning")
+                return redirect("/config")
             try:
-                total_docs = ingest_documents_with_llamaindex(carpetas)
-                if total_docs > 0:
-                    flash(f"✅ Reindexados {total_docs} fragmentos con LlamaIndex + ChromaDB", "success")
-                else:
-                    flash("⚠️ No se encontraron documentos para reindexar", "warning")
+                job = submit_document_ingestion(carpetas)
+                flash(
+                    f"🚀 Reindexación en segundo plano (trabajo {job['id']}, estado: {job['status']}). "
+                    f"Progreso en /api/ingestion/jobs/{job['id']}",
+                    "info"
+                )
             except Exception as e:
                 flash(f"❌ Error en reindexación: {str(e)}", "danger")
             return redirect("/config")
@@ -296,17 +303,57 @@ def api_vectorstore_stats():
 
 @config_bp.route("/api/reindexar/<fuente>", methods=["POST"])
 def api_reindexar_fuente(fuente):
-    """API endpoint para reindexar fuentes específicas"""
+    """API endpoint para reindexar fuentes específicas (trabajo en segundo plano)"""
+    if fuente not in FUENTES_REINDEXABLES:
+        return jsonify({
+            "success": False,
+            "error": f"Fuente desconocida: {fuente}",
+            "fuentes_validas": list(FUENTES_REINDEXABLES)
+        }), 400
+    
     try:
-        total = reindexar_fuente(fuente)
+        job = submit_document_ingestion(cargar_config().get("document_folders", []))
         
         return jsonify({
             "success": True,
-            "message": f"Reindexados {total} documentos",
-            "total_documents": total
+            "message": f"Reindexación de {fuente} en segundo plano",
+            "job": job,
+            "status_url": f"/api/ingestion/jobs/{job['id']}"
+        }), 202
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@config_bp.route("/api/ingestion/jobs", methods=["GET"])
+def api_ingestion_jobs():
+    """API endpoint con los últimos trabajos de ingesta"""
+    try:
+        jobs = get_ingestion_jobs()
+        return jsonify({
+            "success": True,
+            "active": jobs.active_count(),
+            "max_concurrent": jobs.max_concurrent,
+            "jobs": jobs.list_jobs(limit=request.args.get("limit", 50, type=int))
         })
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@config_bp.route("/api/ingestion/jobs/<job_id>", methods=["GET"])
+def api_ingestion_job(job_id):
+    """API endpoint con el estado y progreso de un trabajo de ingesta"""
+    job = get_ingestion_jobs().get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Trabajo no encontrado"}), 404
+    return jsonify({"success": True, "job": job})
+
+@config_bp.route("/api/ingestion/jobs/<job_id>/cancel", methods=["POST"])
+def api_cancelar_ingestion_job(job_id):
+    """API endpoint para cancelar un trabajo de ingesta en cola o en marcha"""
+    if not get_ingestion_jobs().cancel(job_id):
+        return jsonify({"success": False, "error": "El trabajo no existe o ya ha terminado"}), 404
+    return jsonify({"success": True, "job": get_ingestion_jobs().get(job_id)})
\ No newline at end of file
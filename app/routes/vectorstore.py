@@ -74,94 +74,53 @@ def vista_vectorstore():
             "analisis": analizar(embeddings)
         }
 
-    return render_template("vectorstore.html", datos=datos)
+    return render_template("vectorstore.html", datos=datos, reindexables=FUENTES_FAISS_REINDEXABLES)
 
 
-# Versión corregida de la función reindex_fuente con mejor debugging:
+# Fuentes con ingesta FAISS propia → (módulo, función de entrada). Los
+# documentos se indexan en ChromaDB (/api/reindexar/documents) y las APIs
+# aún no tienen ingesta: se rechazan hasta que exista su punto de entrada.
+FUENTES_FAISS_REINDEXABLES = {
+    "web": ("app.services.ingest_web", "main")
+}
 
-# Reemplaza tu función reindex_fuente con esta versión de debugging:
+def _ejecutar_reindexacion(fuente):
+    """Ingesta FAISS de una fuente (se ejecuta como trabajo en segundo plano)"""
+    import logging
+    import importlib
+    logger = logging.getLogger(__name__)
+    
+    module_name, function_name = FUENTES_FAISS_REINDEXABLES[fuente]
+    main = getattr(importlib.import_module(module_name), function_name)
+    
+    logger.info(f"🚀 Ejecutando ingesta de {fuente}...")
+    if not main():
+        raise RuntimeError(f"La ingesta de {fuente} no devolvió resultados")
+    return {"fuente": fuente}
 
 @vectorstore_bp.route("/vectorstore/reindex/<fuente>", methods=["POST"])
 def reindex_fuente(fuente):
-    """Reindexar fuente específica con debugging completo"""
-    import logging
-    import sys
-    import traceback
+    """Encolar la reindexación de una fuente; el progreso se consulta en /api/ingestion/jobs"""
+    from app.services.ingestion_jobs import get_ingestion_jobs
     
-    # Configurar logging para que aparezca en consola
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-    
-    print(f"\n{'='*50}")
-    print(f"🚀 INICIANDO REINDEXACIÓN DE: {fuente}")
-    print(f"{'='*50}")
+    if fuente not in FUENTES_FAISS_REINDEXABLES:
+        flash(
+            f"Fuente no reindexable: {fuente} "
+            f"(válidas: {', '.join(FUENTES_FAISS_REINDEXABLES)}; documentos en /api/reindexar/documents)",
+            "danger"
+        )
+        return vista_vectorstore(), 400
     
     try:
-        success = False
-        
-        if fuente == "documents":
-            print("📄 Procesando documentos...")
-            logger.info("📄 Importando módulo de documentos...")
-            
-            try:
-                from app.services.ingest_documents_improved import main
-                print("✅ Módulo importado correctamente")
-                logger.info("📄 Ejecutando ingesta de documentos...")
-                success = main()
-                print(f"📄 Resultado documentos: {success}")
-                
-            except ImportError as e:
-                print(f"❌ Error importando módulo de documentos: {e}")
-                # Intentar con el módulo original
-                try:
-                    from app.services.ingest_documents import main
-                    print("🔄 Usando módulo original...")
-                    success = main()
-                except Exception as e2:
-                    print(f"❌ Error con módulo original: {e2}")
-                    success = False
-                    
-        elif fuente == "web":
-            print("🌐 Procesando web...")
-            logger.info("🌐 Importando módulo web...")
-            from app.services.ingest_web import main
-            print("✅ Módulo web importado")
-            logger.info("🌐 Ejecutando ingesta web...")
-            success = main()
-            print(f"🌐 Resultado web: {success}")
-            
-        elif fuente == "apis":
-            print("🔌 Procesando APIs...")
-            logger.info("🔌 Importando módulo APIs...")
-            from app.services.ingest_api import main
-            print("✅ Módulo APIs importado")
-            logger.info("🔌 Ejecutando ingesta APIs...")
-            success = main()
-            print(f"🔌 Resultado APIs: {success}")
-            
-        else:
-            print(f"❌ Fuente no válida: {fuente}")
-            flash("Fuente no válida", "danger")
-            return redirect(url_for("vectorstore.vista_vectorstore"))
-        
-        # Mostrar resultado final
-        print(f"\n{'='*30}")
-        if success:
-            print(f"✅ {fuente.upper()} REINDEXADO CORRECTAMENTE")
-            flash(f"✅ {fuente.capitalize()} reindexado correctamente", "success")
-        else:
-            print(f"❌ FALLÓ LA REINDEXACIÓN DE {fuente.upper()}")
-            flash(f"❌ Error al reindexar {fuente}", "danger")
-        print(f"{'='*30}\n")
-            
+        job = get_ingestion_jobs().submit(
+            f"faiss_{fuente}", lambda ctx: _ejecutar_reindexacion(fuente),
+            key=f"faiss_{fuente}", params={"fuente": fuente}
+        )
+        flash(
+            f"🚀 Reindexación de {fuente} en segundo plano (trabajo {job['id']}, estado: {job['status']})",
+            "info"
+        )
     except Exception as e:
-        error_msg = f"❌ ERROR CRÍTICO en {fuente}: {str(e)}"
-        print(f"\n{error_msg}")
-        print("📋 TRACEBACK COMPLETO:")
-        traceback.print_exc()
-        
-        logger.error(error_msg)
         flash(f"❌ Error inesperado: {str(e)}", "danger")
-
-    print(f"🔚 FINALIZANDO REINDEXACIÓN DE {fuente.upper()}")
-    return redirect(url_for("vectorstore.vista_vectorstore"))
\ No newline at end of file
+    
+    return redirect(url_for("vectorstore.vista_vectorstore"))
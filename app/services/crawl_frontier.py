@@ -0,0 +1,239 @@
+"""
+Frontera del crawler: canonicalización de URLs, prioridades, robots.txt y sitemaps
+El presupuesto de páginas (`depth` en web_sources) se gasta en páginas únicas y
+con contenido: las variantes de una misma URL (parámetros de seguimiento, orden,
+barra final, mayúsculas del host...) cuentan una sola vez, las rutas sin
+contenido (login, búsqueda, calendarios infinitos) se descartan o se dejan
+para el final y las secciones configuradas se visitan primero.
+"""
+import re
+import heapq
+import fnmatch
+import logging
+import posixpath
+import itertools
+import xml.etree.ElementTree as ET
+from urllib.robotparser import RobotFileParser
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote, unquote
+from typing import List, Dict, Any, Optional, Tuple, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRONTIER_CONFIG = {
+    # Parámetros que no cambian el contenido (admiten comodines)
+    "ignore_query_params": ["utm_*", "fbclid", "gclid", "mc_cid", "mc_eid", "_ga",
+                            "phpsessid", "jsessionid", "sid", "sessionid",
+                            "sort", "order", "orderby", "dir", "print"],
+    # Variantes de query distintas que se aceptan por ruta (paginación, filtros)
+    "max_query_variants_per_path": 10,
+    "skip_extensions": [".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+                        ".zip", ".rar", ".7z", ".mp3", ".mp4", ".avi", ".mov", ".woff", ".woff2",
+                        ".ttf", ".xml", ".json", ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".odt"],
+    "exclude_patterns": [r"/(login|logout|acceso|registro|wp-admin|wp-login)", r"/(buscar|search)(/|\?|$)",
+                         r"[?&](replytocom|share)="],
+    "low_priority_patterns": [r"/(tag|etiqueta|author|autor|feed|calendar|calendario|agenda)/",
+                              r"/page/\d+", r"[?&](page|pagina|p)=\d+"],
+    # Prefijos de ruta -> ajuste de prioridad (negativo = antes)
+    "path_priorities": {},
+    "respect_robots": True,
+    "robots_user_agent": "AsistenteMunicipalBot",
+    "use_sitemaps": True,
+    "max_sitemap_urls": 5000
+}
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def _remove_dot_segments(path: str) -> str:
+    if not path:
+        return "/"
+    normalized = posixpath.normpath(path)
+    if normalized == ".":
+        normalized = "/"
+    if path.startswith("//") or normalized.startswith("//"):
+        normalized = "/" + normalized.lstrip("/")
+    return normalized
+
+def canonicalize_url(url: str, ignore_params: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Forma canónica de una URL http(s), o None si no es rastreable
+
+    Esquema y host en minúsculas, sin puerto por defecto ni fragmento, ruta
+    sin segmentos "."/".." ni barra final, escapes normalizados y parámetros
+    sin los ignorados y ordenados.
+    """
+    ignore_params = DEFAULT_FRONTIER_CONFIG["ignore_query_params"] if ignore_params is None else ignore_params
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip(".")
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = _remove_dot_segments(quote(unquote(parts.path), safe="/%:@!$&'()*+,;=-._~"))
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not any(fnmatch.fnmatch(key.lower(), pattern) for pattern in ignore_params)
+    ]
+    query = urlencode(sorted(params))
+    return urlunsplit((scheme, host, path, query, ""))
+
+class CrawlFrontier:
+    """
+    Cola de prioridad de URLs de un host
+
+    Prioridad = profundidad + ajustes por ruta; a igual prioridad, orden de
+    descubrimiento (anchura). Las URLs se deduplican por su forma canónica.
+    """
+
+    def __init__(self, host: str, config: Optional[Dict[str, Any]] = None):
+        self.host = host
+        self.config = {**DEFAULT_FRONTIER_CONFIG, **(config or {})}
+        self._exclude = [re.compile(p, re.IGNORECASE) for p in self.config["exclude_patterns"]]
+        self._low = [re.compile(p, re.IGNORECASE) for p in self.config["low_priority_patterns"]]
+        self._skip_ext = tuple(ext.lower() for ext in self.config["skip_extensions"])
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = itertools.count()
+        self._seen: Set[str] = set()
+        self._query_variants: Dict[str, int] = {}
+        self.robots: Optional[RobotFileParser] = None
+        self.user_agent = "*"
+        self.stats = {"added": 0, "duplicates": 0, "excluded": 0, "robots_blocked": 0,
+                      "query_variants_capped": 0, "sitemap_urls": 0}
+
+    def canonical(self, url: str) -> Optional[str]:
+        return canonicalize_url(url, self.config["ignore_query_params"])
+
+    def priority(self, url: str, depth: int) -> float:
+        path_query = url.split(self.host, 1)[-1]
+        score = float(depth)
+        for prefix, adjustment in self.config["path_priorities"].items():
+            if path_query.startswith(prefix):
+                score += adjustment
+        if any(p.search(path_query) for p in self._low):
+            score += 10
+        if "?" in path_query:
+            score += 1
+        return score
+
+    def _accept(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.netloc != self.host:
+            return False
+        path_query = url.split(self.host, 1)[-1]
+        if parts.path.lower().endswith(self._skip_ext) or any(p.search(path_query) for p in self._exclude):
+            self.stats["excluded"] += 1
+            return False
+        if self.robots is not None and not self.robots.can_fetch(self.user_agent, url):
+            self.stats["robots_blocked"] += 1
+            return False
+        if parts.query:
+            variants = self._query_variants.get(parts.path, 0)
+            if variants >= self.config["max_query_variants_per_path"]:
+                self.stats["query_variants_capped"] += 1
+                return False
+            self._query_variants[parts.path] = variants + 1
+        return True
+
+    def add(self, url: str, depth: int, priority_adjustment: float = 0.0) -> Optional[str]:
+        """Encola la URL si es nueva y rastreable; devuelve su forma canónica"""
+        canonical = self.canonical(url)
+        if canonical is None:
+            return None
+        if canonical in self._seen:
+            self.stats["duplicates"] += 1
+            return None
+        self._seen.add(canonical)
+        if not self._accept(canonical):
+            return None
+        heapq.heappush(self._heap, (self.priority(canonical, depth) + priority_adjustment,
+                                    next(self._counter), canonical, depth))
+        self.stats["added"] += 1
+        return canonical
+
+    def mark_seen(self, url: str) -> bool:
+        """Registra una URL alcanzada por redirección; False si ya se conocía"""
+        canonical = self.canonical(url)
+        if canonical is None or canonical in self._seen:
+            return False
+        self._seen.add(canonical)
+        return True
+
+    def pop(self) -> Optional[Tuple[float, int, str, int]]:
+        return heapq.heappop(self._heap) if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado serializable de la frontera (para reanudar un crawl interrumpido)"""
+        return {"heap": [list(entry) for entry in self._heap], "seen": sorted(self._seen),
+                "query_variants": dict(self._query_variants), "stats": dict(self.stats)}
+
+    def restore(self, snapshot: Dict[str, Any]):
+        """Recupera una instantánea de `snapshot` (robots.txt se vuelve a cargar aparte)"""
+        self._heap = [tuple(entry) for entry in snapshot["heap"]]
+        heapq.heapify(self._heap)
+        self._seen = set(snapshot["seen"])
+        self._query_variants = dict(snapshot["query_variants"])
+        self.stats.update(snapshot["stats"])
+        self._counter = itertools.count(max((entry[1] for entry in self._heap), default=-1) + 1)
+
+    def load_robots(self, robots_txt: Optional[str], user_agent: str = "*"):
+        """Aplica un robots.txt ya descargado (None = sin restricciones)"""
+        self.user_agent = user_agent
+        if not robots_txt or not self.config["respect_robots"]:
+            return
+        parser = RobotFileParser()
+        parser.parse(robots_txt.splitlines())
+        self.robots = parser
+
+    def robots_crawl_delay(self) -> Optional[float]:
+        if self.robots is None:
+            return None
+        delay = self.robots.crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def robots_sitemaps(self) -> List[str]:
+        if self.robots is None:
+            return []
+        return list(self.robots.site_maps() or [])
+
+def parse_sitemap(xml_text: str) -> Tuple[List[Tuple[str, Optional[float]]], List[str]]:
+    """
+    Entradas de un sitemap
+
+    Returns:
+        ([(url, prioridad del sitemap o None)], [sitemaps hijos de un sitemapindex])
+    """
+    try:
+        root = ET.fromstring(xml_text.encode("utf-8") if isinstance(xml_text, str) else xml_text)
+    except ET.ParseError as e:
+        logger.warning(f"⚠️ Sitemap no válido: {e}")
+        return [], []
+
+    def _local(tag: str) -> str:
+        return tag.rsplit("}", 1)[-1]
+
+    urls, children = [], []
+    for node in root:
+        fields = {_local(child.tag): (child.text or "").strip() for child in node}
+        if not fields.get("loc"):
+            continue
+        if _local(root.tag) == "sitemapindex":
+            children.append(fields["loc"])
+        else:
+            try:
+                priority = float(fields["priority"]) if fields.get("priority") else None
+            except ValueError:
+                priority = None
+            urls.append((fields["loc"], priority))
+    return urls, children
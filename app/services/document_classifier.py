@@ -0,0 +1,203 @@
+"""
+Clasificador de tipos de documento municipal en una sola pasada
+Las palabras clave y expresiones de todos los tipos se compilan una vez en
+un único patrón (trie de prefijos) que recorre el texto una sola vez
+"""
+import re
+import logging
+from typing import List, Dict, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Patrones específicos de administración local española
+# (keywords: peso 1 por aparición, regex: peso 3 por coincidencia)
+DOCUMENT_TYPE_PATTERNS = {
+    "ordenanza": {
+        "keywords": ["ordenanza", "artículo", "título", "capítulo", "disposición", "boe", "bop"],
+        "regex": [r"ordenanza\s+municipal", r"artículo\s+\d+", r"título\s+[ivx]+"]
+    },
+    "acta": {
+        "keywords": ["acta", "sesión", "punto del día", "acuerdo", "pleno", "comisión"],
+        "regex": [r"acta\s+de\s+la\s+sesión", r"punto\s+\d+", r"acuerdo\s+número"]
+    },
+    "resolucion": {
+        "keywords": ["resuelvo", "considerando", "por tanto", "resolución", "alcaldía"],
+        "regex": [r"resolución\s+número", r"considerando\s+que", r"por\s+tanto"]
+    },
+    "presupuesto": {
+        "keywords": ["partida", "euros", "gastos", "ingresos", "presupuesto", "capítulo"],
+        "regex": [r"partida\s+\d+", r"\d+[.,]\d+\s*€", r"capítulo\s+[ivx]+"]
+    },
+    "convenio": {
+        "keywords": ["convenio", "colaboración", "acuerdo marco", "partes"],
+        "regex": [r"convenio\s+de\s+colaboración", r"acuerdo\s+marco"]
+    },
+    "normativa": {
+        "keywords": ["reglamento", "instrucción", "circular", "protocolo", "normativa"],
+        "regex": [r"reglamento\s+municipal", r"instrucción\s+técnica"]
+    },
+    "subvencion": {
+        "keywords": ["subvención", "ayuda", "beca", "convocatoria", "bases"],
+        "regex": [r"convocatoria\s+de\s+subvenciones", r"bases\s+reguladoras"]
+    },
+    "licencia": {
+        "keywords": ["licencia", "autorización", "permiso", "actividad", "obras"],
+        "regex": [r"licencia\s+de\s+obras", r"licencia\s+de\s+actividad"]
+    }
+}
+
+KEYWORD_WEIGHT = 1
+REGEX_WEIGHT = 3
+
+# Caracteres que terminan el prefijo literal de una expresión regular
+_REGEX_META = set("[(.*+?{|^$")
+
+def _literal_prefix(pattern: str) -> str:
+    """Prefijo literal de una regex (ej: 'partida\\s+\\d+' -> 'partida')"""
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            break
+        if char in _REGEX_META:
+            break
+        prefix.append(char)
+        i += 1
+    # Un cuantificador tras el último literal lo hace opcional
+    if i < len(pattern) and pattern[i] in "*?{" and prefix:
+        prefix.pop()
+    return "".join(prefix)
+
+def _trie_pattern(words: List[str]) -> str:
+    """Alternativa factorizada por prefijos; el cierre greedy devuelve la palabra más larga"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        group = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{group})?" if "" in node else group
+
+    return build(trie)
+
+class DocumentTypeClassifier:
+    """
+    Clasificador precompilado con puntuaciones idénticas al recuento por patrón
+
+    Un único patrón con lookahead localiza todas las posiciones donde empieza
+    alguna palabra clave o el prefijo literal de alguna regex. En cada posición
+    se acreditan las palabras clave que coinciden y se verifican (con `match`
+    anclado) solo las regex cuyo prefijo coincide. Por término se respeta el
+    recuento sin solapamiento de `str.count` / `re.findall`.
+    """
+
+    def __init__(self, patterns: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 max_chars: int = 0, sample_windows: int = 8):
+        self.patterns = patterns or DOCUMENT_TYPE_PATTERNS
+        self.max_chars = max_chars
+        self.sample_windows = max(2, sample_windows)
+
+        # término -> [(tipo, peso)]; el mismo término puede puntuar en varios tipos
+        self._weights: Dict[Tuple[str, str], List[Tuple[str, int]]] = {}
+        for doc_type, info in self.patterns.items():
+            for keyword in info["keywords"]:
+                self._weights.setdefault(("kw", keyword), []).append((doc_type, KEYWORD_WEIGHT))
+            for regex_pattern in info["regex"]:
+                self._weights.setdefault(("re", regex_pattern), []).append((doc_type, REGEX_WEIGHT))
+
+        self._regexes = {term: re.compile(term[1]) for term in self._weights if term[0] == "re"}
+
+        # Términos por prefijo literal; las regex sin prefijo se cuentan aparte
+        by_head: Dict[str, List[Tuple[str, str]]] = {}
+        self._unanchored: List[Tuple[str, str]] = []
+        for term in self._weights:
+            head = term[1] if term[0] == "kw" else _literal_prefix(term[1])
+            if head:
+                by_head.setdefault(head, []).append(term)
+            else:
+                self._unanchored.append(term)
+
+        # Para cada prefijo: todos los términos cuyo prefijo es prefijo suyo
+        self._candidates = {
+            head: [term for other, terms in by_head.items() if head.startswith(other) for term in terms]
+            for head in by_head
+        }
+        self._scanner = re.compile("(?=(" + _trie_pattern(list(by_head)) + "))")
+
+    def sample(self, text: str) -> str:
+        """Muestra representativa: ventanas repartidas uniformemente por el texto"""
+        if not self.max_chars or len(text) <= self.max_chars:
+            return text
+        window = self.max_chars // self.sample_windows
+        step = (len(text) - window) / (self.sample_windows - 1)
+        return "\n".join(text[int(i * step):int(i * step) + window] for i in range(self.sample_windows))
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Puntuación por tipo de documento (una pasada sobre el texto en minúsculas)"""
+        text_lower = self.sample(text).lower()
+        counts = dict.fromkeys(self._weights, 0)
+        last_end = dict.fromkeys(self._weights, 0)
+
+        for match in self._scanner.finditer(text_lower):
+            position = match.start()
+            for term in self._candidates[match.group(1)]:
+                if position < last_end[term]:
+                    continue
+                if term[0] == "kw":
+                    end = position + len(term[1])
+                else:
+                    found = self._regexes[term].match(text_lower, position)
+                    if not found:
+                        continue
+                    end = found.end()
+                counts[term] += 1
+                last_end[term] = end
+
+        for term in self._unanchored:
+            counts[term] = len(self._regexes[term].findall(text_lower))
+
+        scores = dict.fromkeys(self.patterns, 0)
+        for term, count in counts.items():
+            if count:
+                for doc_type, weight in self._weights[term]:
+                    scores[doc_type] += count * weight
+        return scores
+
+    def classify(self, text: str) -> Tuple[str, int]:
+        """
+        Tipo de documento detectado y su puntuación
+
+        Returns:
+            ("documento_vacio" | "documento_general" | tipo, puntuación)
+        """
+        if not text:
+            return "documento_vacio", 0
+
+        scores = self.scores(text)
+        detected_type = max(scores, key=scores.get)
+        if scores[detected_type] > 0:
+            return detected_type, scores[detected_type]
+        return "documento_general", 0
+
+_classifier_instance = None
+
+def get_document_classifier() -> DocumentTypeClassifier:
+    """Obtener instancia única del clasificador (max_chars de settings.json)"""
+    global _classifier_instance
+    if _classifier_instance is None:
+        from app.config.settings import load_settings
+        _classifier_instance = DocumentTypeClassifier(
+            max_chars=load_settings().get("document_classifier_max_chars", 0)
+        )
+    return _classifier_instance
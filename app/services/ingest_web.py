@@ -1,13 +1,16 @@
 import os
-import json
-import pickle
-import numpy as np
-import faiss
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup, SoupStrainer
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from sentence_transformers import SentenceTransformer
+import argparse
+from urllib.parse import urlparse
+from app.config.settings import load_settings
+from app.utils.browser_pool import get_browser_pool
+from app.services.web_crawler import AsyncCrawler, crawler_config
+from app.services.crawl_frontier import canonicalize_url
+from app.utils.embedding_registry import get_embedding_model
+from app.utils.chunk_embedding_cache import get_chunk_embedding_cache, embedding_namespace
+from app.utils.crawl_state import CrawlState, text_sha256, web_chunk_id
+from app.utils.simhash import simhash, SimHashIndex
+from app.utils.staged_faiss_store import StagedFaissStore
+from app.services.web_boilerplate import SiteBoilerplate, extract_blocks
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 def limpiar_texto(texto):
@@ -16,14 +19,6 @@ def limpiar_texto(texto):
     texto = texto.replace("\xa0", " ").strip()
     return texto
 
-# Configuración
-CONFIG_PATH = os.path.join("app", "config", "settings.json")
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    settings = json.load(f)
-
-modelo_embedding = settings.get("embedding_model", "all-MiniLM-L6-v2")
-embedding_model = SentenceTransformer(modelo_embedding)
-
 splitter = RecursiveCharacterTextSplitter(
     chunk_size=512,
     chunk_overlap=64,
@@ -33,110 +28,339 @@ splitter = RecursiveCharacterTextSplitter(
 VECTOR_DIR = os.path.join("vectorstore", "web")
 os.makedirs(VECTOR_DIR, exist_ok=True)
 
-index_path = os.path.join(VECTOR_DIR, "index.faiss")
-fragmentos_path = os.path.join(VECTOR_DIR, "fragmentos.pkl")
-metadatos_path = os.path.join(VECTOR_DIR, "metadatos.pkl")
-embeddings_path = os.path.join(VECTOR_DIR, "embeddings.npy")
-
-fragmentos_totales = []
-metadatos_totales = []
-vectores_totales = []
-
 def partir_en_bloques(texto):
     return splitter.split_text(limpiar_texto(texto))
 
-def obtener_urls_del_html(html, base_url):
-    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a"))
-    urls = set()
-    for tag in soup:
-        if tag.name == "a" and tag.get("href"):
-            href = urljoin(base_url, tag["href"])
-            if urlparse(href).netloc == urlparse(base_url).netloc:
-                urls.add(href.split("#")[0])
-    return urls
-
-def extraer_y_indexar_url(url):
-    print(f"🔎 Visitando: {url}")
-    try:
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--no-sandbox')
-        driver = webdriver.Chrome(options=options)
-        driver.get(url)
-        driver.implicitly_wait(8)
-        html = driver.page_source
-        driver.quit()
-    except Exception as e:
-        print(f"❌ Error al acceder a {url}: {str(e)}")
-        return set()
-
-    texto = BeautifulSoup(html, "html.parser").get_text(separator="\n")
-    fragmentos = partir_en_bloques(texto)
-    if not fragmentos:
-        print("⚠️ Página vacía.")
-        return set()
-
-    vectores = embedding_model.encode(fragmentos).astype("float32")
-    fragmentos_totales.extend(fragmentos)
-    vectores_totales.extend(vectores)
-    metadatos_totales.extend([
-        {
-            "texto": frag,
-            "fuente": "web",
-            "url": url,
-            "etiquetas": ["web"]
-        } for frag in fragmentos
-    ])
-
-    nuevas_urls = obtener_urls_del_html(html, url)
-    print(f"🔗 {len(nuevas_urls)} nuevos enlaces encontrados.")
-    return nuevas_urls
-
-def crawl_dominio(base_url, max_paginas=10):
-    visitadas = set()
-    pendientes = [base_url]
-    urls_en_cola = set(pendientes)
-
-    while pendientes and len(visitadas) < max_paginas:
-        url = pendientes.pop(0)
-        urls_en_cola.discard(url)
-
-        if url in visitadas:
-            continue
-
-        nuevas_urls = extraer_y_indexar_url(url)
-        visitadas.add(url)
-
-        for nueva in nuevas_urls:
-            if nueva not in visitadas and nueva not in urls_en_cola:
-                pendientes.append(nueva)
-                urls_en_cola.add(nueva)
-
-    print(f"✅ Crawling finalizado. Total páginas visitadas: {len(visitadas)}")
-
-def guardar_vectorstore():
-    index = faiss.IndexFlatL2(384)
-    index.add(np.array(vectores_totales).astype("float32"))
-    faiss.write_index(index, index_path)
-
-    with open(fragmentos_path, "wb") as f:
-        pickle.dump(fragmentos_totales, f)
-    with open(metadatos_path, "wb") as f:
-        pickle.dump(metadatos_totales, f)
-    np.save(embeddings_path, np.array(vectores_totales))
-
-    print(f"✅ Vectorstore guardado en {VECTOR_DIR}")
+class WebIngestion:
+    """
+    Una ejecución de la ingesta web: crawl de las fuentes, troceado y embeddings
 
-if __name__ == "__main__":
+    El estado de la ejecución vive en la instancia y los vectores se vuelcan
+    por lotes a vectorstore/web/checkpoint/. Cada `checkpoint_pages` páginas
+    se guardan también la frontera del crawl, el estado por URL y los
+    contadores, de modo que una ingesta interrumpida continúa donde se quedó.
+    La configuración se lee al crear la instancia: un trabajo en el servidor
+    usa los valores de settings.json vigentes en ese momento.
+    """
+
+    def __init__(self, fuentes, reanudar=True, settings=None):
+        self.settings = settings if settings is not None else load_settings()
+        self.modelo_embedding = self.settings.get("embedding_model", "all-MiniLM-L6-v2")
+        config = self.settings.get("web_ingestion", {})
+        self.fuentes = [(fuente.get("url"), fuente.get("depth", 10)) for fuente in fuentes]
+        self.store = StagedFaissStore(VECTOR_DIR, batch_size=config.get("batch_size", 256))
+        self.estado = CrawlState()
+        self.plantilla = SiteBoilerplate(config=self.settings.get("web_boilerplate", {}))
+        self.indice_simhash = SimHashIndex(
+            max_distance=self.settings.get("web_boilerplate", {}).get("simhash_max_distance", 3)
+        )
+        # Si se conservan los fragmentos del vectorstore actual (páginas sin cambios)
+        self.conservar_anteriores = False
+        self.fuente_actual = 0
+        self.crawl_pendiente = None
+        # Fragmentos de versiones anteriores de páginas modificadas o eliminadas
+        self.ids_eliminados = set()
+        self.resumen_recrawl = {"paginas_nuevas": 0, "paginas_modificadas": 0, "paginas_sin_cambios": 0,
+                                "paginas_eliminadas": 0, "paginas_reindexadas": 0}
+        # Fragmentos antes y después de quitar plantilla y casi duplicados
+        self.resumen_fragmentos = {"fragmentos_brutos": 0, "fragmentos_indexados": 0, "casi_duplicados": 0}
+        self.paginas_en_espera = []
+
+        if not (reanudar and self.reanudar()):
+            self.store.reset()
+            self.cargar_vectorstore_existente()
+
+    def reanudar(self):
+        """Recupera el checkpoint de una ingesta interrumpida, si es de esta misma configuración"""
+        checkpoint = self.store.load_checkpoint()
+        if checkpoint is None:
+            return False
+        if checkpoint.get("fuentes") != self.fuentes or checkpoint.get("embedding_model") != self.modelo_embedding:
+            print("⚠️ El checkpoint es de otras fuentes u otro modelo de embeddings, se empieza de cero")
+            return False
+
+        self.store.resume(checkpoint)
+        self.estado.entries = checkpoint["crawl_state"]
+        self.plantilla.hosts = checkpoint["boilerplate"]
+        self.plantilla.stats.update(checkpoint["boilerplate_stats"])
+        self.conservar_anteriores = checkpoint["conservar_anteriores"]
+        self.fuente_actual = checkpoint["fuente_actual"]
+        self.crawl_pendiente = checkpoint["crawl"]
+        self.ids_eliminados = set(checkpoint["ids_eliminados"])
+        self.resumen_recrawl.update(checkpoint["resumen_recrawl"])
+        self.resumen_fragmentos.update(checkpoint["resumen_fragmentos"])
+        self.paginas_en_espera = checkpoint["paginas_en_espera"]
+
+        if self.conservar_anteriores:
+            self._indexar_huellas(zip(*self.store.previous_rows()))
+        self._indexar_huellas(self.store.staged_rows())
+        print(f"♻️ Reanudando la ingesta web interrumpida ({checkpoint['saved_at']}): "
+              f"fuente {min(self.fuente_actual + 1, len(self.fuentes))}/{len(self.fuentes)}, "
+              f"{self.store.rows} fragmentos ya escritos")
+        return True
+
+    def cargar_vectorstore_existente(self):
+        """Decide si se conservan los fragmentos del crawl anterior (páginas sin cambios)"""
+        if not self.estado.existed:
+            return
+        if not self.store.has_previous():
+            # Estado sin vectores (borrados a mano): las páginas "sin cambios" se perderían
+            self.estado.clear()
+            return
+        try:
+            fragmentos, metadatos = self.store.previous_rows()
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el vectorstore web anterior ({e}), se reconstruye completo")
+            self.estado.clear()
+            return
+        self.conservar_anteriores = True
+        self._indexar_huellas(zip(fragmentos, metadatos))
+        print(f"📦 {len(fragmentos)} fragmentos del crawl anterior se conservan salvo cambios")
+
+    def _indexar_huellas(self, filas):
+        """Añade al índice SimHash los fragmentos ya indexados"""
+        for frag, meta in filas:
+            if meta.get("chunk_id"):
+                self.indice_simhash.add(meta.get("simhash") or simhash(frag), meta["chunk_id"])
+
+    def guardar_checkpoint(self, crawl=None):
+        """Vuelca el lote en curso y guarda lo necesario para reanudar (se llama en el hilo de on_page)"""
+        self.store.save_checkpoint({
+            "fuentes": self.fuentes,
+            "embedding_model": self.modelo_embedding,
+            "fuente_actual": self.fuente_actual,
+            "crawl": crawl,
+            "conservar_anteriores": self.conservar_anteriores,
+            "ids_eliminados": sorted(self.ids_eliminados),
+            "resumen_recrawl": self.resumen_recrawl,
+            "resumen_fragmentos": self.resumen_fragmentos,
+            "paginas_en_espera": self.paginas_en_espera,
+            "crawl_state": self.estado.entries,
+            "boilerplate": self.plantilla.hosts,
+            "boilerplate_stats": self.plantilla.stats
+        })
+        if crawl is not None:
+            print(f"💾 Checkpoint: {len(crawl['visited'])} páginas visitadas, "
+                  f"{self.store.rows} fragmentos escritos")
+
+    def indexar_pagina(self, pagina):
+        """Trocea y embebe el texto de una página descargada, salvo que no haya cambiado"""
+        estado = self.estado
+        anterior = estado.get(pagina.url)
+
+        if pagina.gone:
+            if anterior:
+                self.eliminar_fragmentos(estado.remove(pagina.url))
+                self.resumen_recrawl["paginas_eliminadas"] += 1
+                print(f"🗑️ Página eliminada del sitio: {pagina.url}")
+            return
+
+        if pagina.not_modified:
+            estado.touch(pagina.url, pagina.etag, pagina.last_modified)
+            self.resumen_recrawl["paginas_sin_cambios"] += 1
+            return
+
+        print(f"🔎 Visitada: {pagina.url}{' (navegador)' if pagina.rendered else ''} en {pagina.seconds}s")
+        bloques = extract_blocks(pagina.html)
+        content_sha = text_sha256(limpiar_texto("\n".join(bloques)))
+        host = urlparse(pagina.url).netloc
+        self.plantilla.observe(host, bloques)
+        if anterior and anterior.get("content_sha256") == content_sha:
+            # Cabeceras distintas pero mismo texto (fechas, tokens...): nada que reembeber
+            estado.touch(pagina.url, pagina.etag, pagina.last_modified, pagina.links)
+            self.resumen_recrawl["paginas_sin_cambios"] += 1
+            return
+
+        if anterior:
+            self.eliminar_fragmentos(anterior.get("chunk_ids", []))
+        self.resumen_recrawl["paginas_modificadas" if anterior else "paginas_nuevas"] += 1
+
+        if self.plantilla.config["enabled"] and self.plantilla.warming_up(host):
+            # Host sin historial: se esperan unas páginas para saber qué bloques se repiten
+            pagina.html = ""
+            self.paginas_en_espera.append((pagina, bloques, content_sha))
+            return
+        self.procesar_paginas_en_espera()
+        self._indexar_bloques(pagina, bloques, content_sha)
+
+    def eliminar_fragmentos(self, chunk_ids):
+        """
+        Marca fragmentos para eliminar e invalida las páginas que dependían de ellos
+
+        Una página con fragmentos descartados como casi duplicados de estos
+        perdería ese contenido: se fuerza su reindexación (en este crawl si
+        aún no se ha visitado, o al final con `reindexar_dependientes`).
+        """
+        chunk_ids = set(chunk_ids) - self.ids_eliminados
+        if not chunk_ids:
+            return
+        self.ids_eliminados.update(chunk_ids)
+        for url in self.estado.dependents(chunk_ids):
+            self.estado.invalidate(url)
+
+    def reindexar_dependientes(self, crawler, host=None):
+        """Vuelve a descargar e indexar las páginas invalidadas por `eliminar_fragmentos`"""
+        procesadas = set()
+        pendientes = self.estado.pending_reindex(host)
+        while pendientes:
+            for url in pendientes:
+                procesadas.add(url)
+                try:
+                    pagina = crawler.fetch_page(url)
+                except Exception as e:
+                    # Sigue invalidada: se reindexará en la próxima ingesta
+                    print(f"⚠️ No se pudo reindexar {url}: {e}")
+                    continue
+                if pagina is None:
+                    continue
+                self.resumen_recrawl["paginas_reindexadas"] += 1
+                print(f"♻️ Reindexando {url}: sus fragmentos casi duplicados ya no están indexados")
+                self.indexar_pagina(pagina)
+            self.procesar_paginas_en_espera()
+            # Reindexar puede eliminar fragmentos de los que dependen otras páginas
+            pendientes = [url for url in self.estado.pending_reindex(host) if url not in procesadas]
+
+    def procesar_paginas_en_espera(self):
+        """Indexa las páginas retenidas mientras se calentaban las estadísticas de plantilla"""
+        while self.paginas_en_espera:
+            self._indexar_bloques(*self.paginas_en_espera.pop(0))
+
+    def _indexar_bloques(self, pagina, bloques, content_sha):
+        host = urlparse(pagina.url).netloc
+        contenido = self.plantilla.strip(host, bloques)
+        fragmentos = partir_en_bloques("\n".join(contenido))
+        self.resumen_fragmentos["fragmentos_brutos"] += len(partir_en_bloques("\n".join(bloques)))
+
+        # Se descartan los fragmentos casi idénticos a uno ya indexado (salvo que
+        # ese pertenezca a una versión anterior que se va a eliminar); se guarda
+        # contra cuál para reindexar la página si ese fragmento desaparece
+        casi_duplicados = self.settings.get("web_boilerplate", {}).get("near_duplicates", True)
+        seleccion = []
+        suprimidos_por = set()
+        for i, frag in enumerate(fragmentos):
+            huella = simhash(frag)
+            chunk_id = web_chunk_id(pagina.url, content_sha, i)
+            original = self.indice_simhash.find(huella, exclude=self.ids_eliminados) if casi_duplicados else None
+            if original:
+                suprimidos_por.add(original)
+                self.resumen_fragmentos["casi_duplicados"] += 1
+                continue
+            self.indice_simhash.add(huella, chunk_id)
+            seleccion.append((frag, chunk_id, huella))
+
+        self.estado.update(pagina.url, content_sha, [chunk_id for _, chunk_id, _ in seleccion],
+                           pagina.links, pagina.etag, pagina.last_modified, sorted(suprimidos_por))
+        if not seleccion:
+            print(f"⚠️ Página sin contenido propio: {pagina.url}")
+            return
+
+        textos = [frag for frag, _, _ in seleccion]
+        # Modelo antes que namespace: el namespace usa el backend realmente cargado
+        modelo = get_embedding_model(self.modelo_embedding)
+        vectores = get_chunk_embedding_cache().embed(
+            embedding_namespace(self.modelo_embedding), textos, modelo.encode
+        )
+        self.resumen_fragmentos["fragmentos_indexados"] += len(textos)
+        self.store.add(textos, vectores, [
+            {
+                "texto": frag,
+                "fuente": "web",
+                "url": pagina.url,
+                "etiquetas": ["web"],
+                "chunk_id": chunk_id,
+                "simhash": huella
+            } for frag, chunk_id, huella in seleccion
+        ])
+
+    def crawl_dominio(self, base_url, max_paginas=10, reanudar_crawl=None):
+        estado = self.estado
+        crawler = AsyncCrawler(crawler_config(), crawl_state=estado)
+        visitadas = crawler.crawl(base_url, max_paginas, self.indexar_pagina,
+                                  on_checkpoint=self.guardar_checkpoint, resume=reanudar_crawl)
+        self.procesar_paginas_en_espera()
+
+        # Si el crawl recorrió todo el sitio sin errores, las páginas conocidas que
+        # ya no están enlazadas desde ninguna parte se consideran eliminadas
+        if len(visitadas) < max_paginas and not crawler.stats["errors"]:
+            for url in estado.urls_for_host(urlparse(canonicalize_url(base_url) or base_url).netloc):
+                if url not in visitadas:
+                    self.eliminar_fragmentos(estado.remove(url))
+                    self.resumen_recrawl["paginas_eliminadas"] += 1
+
+        self.reindexar_dependientes(crawler, urlparse(canonicalize_url(base_url) or base_url).netloc)
+
+        print(f"✅ Crawling finalizado. Total páginas visitadas: {len(visitadas)} "
+              f"en {crawler.stats['seconds']}s ({crawler.stats['http_pages']} por HTTP, "
+              f"{crawler.stats['rendered_pages']} con navegador, {crawler.stats['errors']} errores)")
+        if crawler.stats["rendered_pages"]:
+            pool_stats = get_browser_pool().get_stats()
+            print(f"🌐 Navegadores: {pool_stats['drivers_started']} arranques para {pool_stats['pages']} páginas "
+                  f"({pool_stats['startup_seconds']}s de arranque)")
+        cache_stats = get_chunk_embedding_cache().stats()
+        print(f"🧠 Caché de embeddings: {cache_stats['hits']} fragmentos reutilizados, "
+              f"{cache_stats['misses']} calculados (hit ratio {cache_stats['hit_ratio']})")
+        return visitadas
+
+    def guardar_vectorstore(self):
+        """Consolida los lotes con el vectorstore actual y guarda el estado del crawl"""
+        resultado = self.store.consolidate(self.conservar_anteriores, self.ids_eliminados)
+        self.estado.save()
+        self.plantilla.save()
+        self.store.reset()
+
+        if resultado["eliminados"]:
+            print(f"🗑️ {resultado['eliminados']} fragmentos obsoletos eliminados")
+        print(f"✅ Vectorstore guardado en {VECTOR_DIR} ({resultado['fragmentos']} fragmentos, "
+              f"{resultado['nuevos']} nuevos)")
+        resumen = self.resumen_recrawl
+        print(f"🔁 Recrawl: {resumen['paginas_nuevas']} nuevas, {resumen['paginas_modificadas']} modificadas, "
+              f"{resumen['paginas_sin_cambios']} sin cambios, {resumen['paginas_eliminadas']} eliminadas, "
+              f"{resumen['paginas_reindexadas']} reindexadas por casi duplicados eliminados")
+        plantilla = self.plantilla.stats
+        if plantilla["blocks"]:
+            print(f"🧹 Plantilla del sitio: {plantilla['boilerplate_blocks']}/{plantilla['blocks']} bloques y "
+                  f"{plantilla['boilerplate_characters']}/{plantilla['characters']} caracteres descartados")
+        fragmentos = self.resumen_fragmentos
+        ahorrados = fragmentos["fragmentos_brutos"] - fragmentos["fragmentos_indexados"]
+        print(f"♻️ Fragmentos: {fragmentos['fragmentos_indexados']} indexados de "
+              f"{fragmentos['fragmentos_brutos']} ({fragmentos['casi_duplicados']} casi duplicados, "
+              f"{ahorrados} vectores ahorrados)")
+
+    def ejecutar(self):
+        for i, (url, max_paginas) in enumerate(self.fuentes):
+            if i < self.fuente_actual:
+                print(f"⏭️ {url} ya se recorrió antes de la interrupción")
+                continue
+            self.fuente_actual = i
+            reanudar_crawl, self.crawl_pendiente = self.crawl_pendiente, None
+            print(f"🌐 {'Reanudando' if reanudar_crawl else 'Iniciando'} crawl para: {url} con depth={max_paginas}")
+            self.crawl_dominio(url, max_paginas, reanudar_crawl)
+            self.fuente_actual = i + 1
+            self.guardar_checkpoint()
+
+        # Páginas de otros dominios invalidadas después de recorrer el suyo
+        if self.estado.pending_reindex():
+            self.reindexar_dependientes(AsyncCrawler(crawler_config(), crawl_state=self.estado))
+
+        if not self.store.rows and not self.conservar_anteriores and not self.ids_eliminados:
+            print("⚠️ No se obtuvo texto de ninguna página")
+            self.store.reset()
+            return False
+        self.guardar_vectorstore()
+        return True
+
+def main(reanudar=True):
+    # Se relee settings.json en cada ejecución (el servidor lanza main() como trabajo)
+    settings = load_settings()
     fuentes = settings.get("web_sources", [])
     if not fuentes:
         print("⚠️ No hay URLs configuradas")
-    else:
-        for fuente in fuentes:
-            url = fuente.get("url")
-            max_paginas = fuente.get("depth", 10)
-            print(f"🌐 Iniciando crawl para: {url} con depth={max_paginas}")
-            crawl_dominio(url, max_paginas)
-
-        guardar_vectorstore()
\ No newline at end of file
+        return False
+    return WebIngestion(fuentes, reanudar, settings).ejecutar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl e indexación de las fuentes web configuradas")
+    parser.add_argument("--desde-cero", action="store_true",
+                        help="Ignorar el checkpoint de una ingesta interrumpida")
+    args = parser.parse_args()
+    main(reanudar=not args.desde_cero)
@@ -0,0 +1,279 @@
+"""
+Trabajos de ingesta en segundo plano
+Las reindexaciones lanzadas desde la web se encolan y se ejecutan en un pool
+de hilos acotado, de modo que la petición HTTP responde al instante y nunca
+hay más de `max_concurrent` ingestas a la vez. Los trabajos se persisten en
+SQLite con su progreso, resultado y error, y se pueden cancelar.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DB = os.path.join("vectorstore", "ingestion_jobs.sqlite")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+class JobCancelled(Exception):
+    """Lanzada por un trabajo que atiende la cancelación en mitad de su ejecución"""
+
+class JobContext:
+    """Lo que recibe la función del trabajo: reporte de progreso y señal de cancelación"""
+
+    def __init__(self, manager: "IngestionJobManager", job_id: str):
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self._manager = manager
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def update(self, progress: Dict[str, Any]):
+        self._manager._update_progress(self.job_id, progress)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+class IngestionJobManager:
+    """Cola de trabajos con pool de hilos acotado y tabla de trabajos persistida"""
+
+    def __init__(self, db_path: str = DEFAULT_JOBS_DB, max_concurrent: int = 1,
+                 progress_interval: float = 1.0, history_limit: int = 200):
+        self.db_path = db_path
+        self.max_concurrent = max(1, max_concurrent)
+        self.progress_interval = progress_interval
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        # Estado en memoria compartido entre los hilos de los trabajos y los de
+        # las peticiones; lock propio para no esperar a SQLite. Orden: _lock
+        # puede tomar _state_lock, nunca al revés.
+        self._state_lock = threading.Lock()
+        self._contexts: Dict[str, JobContext] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._progress_saved_at: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                            thread_name_prefix="ingestion-job")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " job_key TEXT,"
+                " status TEXT NOT NULL,"
+                " params TEXT,"
+                " progress TEXT,"
+                " result TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL)"
+            )
+            # Trabajos de un proceso anterior que no llegaron a terminar
+            interrupted = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                (JOB_FAILED, "Interrumpido por reinicio del servidor", time.time(), *ACTIVE_STATES)
+            ).rowcount
+            self._conn.execute(
+                "DELETE FROM jobs WHERE id NOT IN (SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)",
+                (self.history_limit,)
+            )
+            self._conn.commit()
+        if interrupted:
+            logger.warning(f"⚠️ {interrupted} trabajos de ingesta interrumpidos por un reinicio")
+
+    def _write(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        values = [json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                  for v in fields.values()]
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*values, job_id))
+            self._conn.commit()
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for name in ("params", "progress", "result"):
+            job[name] = json.loads(job[name]) if job[name] else {}
+        # El progreso en memoria es más reciente que el persistido
+        with self._state_lock:
+            progress = self._progress.get(job["id"])
+            if progress is not None:
+                job["progress"] = dict(progress)
+        end = job["finished_at"] or time.time()
+        job["elapsed_seconds"] = round(end - job["started_at"], 2) if job["started_at"] else 0.0
+        return job
+
+    def submit(self, kind: str, target: Callable[[JobContext], Any], key: Optional[str] = None,
+               params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Encola un trabajo; `target(ctx)` se ejecuta en el pool
+
+        Si ya hay un trabajo activo con la misma `key` se devuelve ese en lugar
+        de encolar otro (pulsar dos veces "reindexar" no duplica la ingesta).
+
+        Returns:
+            Trabajo en forma de diccionario (ver `get`)
+        """
+        with self._lock:
+            if key:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE job_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                    (key, *ACTIVE_STATES)
+                ).fetchone()
+                if row is not None:
+                    logger.info(f"ℹ️ Ya hay un trabajo activo para {key}: {row['id']}")
+                    return self._row_to_job(row)
+
+            job_id = uuid.uuid4().hex[:12]
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, job_key, status, params, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, JOB_QUEUED, json.dumps(params or {}, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+            context = JobContext(self, job_id)
+            with self._state_lock:
+                self._contexts[job_id] = context
+
+        self._executor.submit(self._run, context, target)
+        logger.info(f"📥 Trabajo de ingesta {job_id} encolado ({kind})")
+        return self.get(job_id)
+
+    def _run(self, context: JobContext, target: Callable[[JobContext], Any]):
+        job_id = context.job_id
+        if context.cancelled:
+            with self._state_lock:
+                self._contexts.pop(job_id, None)
+            return
+
+        self._write(job_id, status=JOB_RUNNING, started_at=time.time())
+        logger.info(f"🚀 Trabajo de ingesta {job_id} iniciado")
+        status, result, error = JOB_COMPLETED, None, None
+        try:
+            result = target(context)
+            if context.cancelled:
+                status = JOB_CANCELLED
+        except JobCancelled:
+            status = JOB_CANCELLED
+        except Exception as e:
+            logger.error(f"❌ Trabajo de ingesta {job_id} fallido: {e}")
+            status, error = JOB_FAILED, str(e)
+        finally:
+            with self._state_lock:
+                progress = self._progress.pop(job_id, {})
+                self._progress_saved_at.pop(job_id, None)
+                self._contexts.pop(job_id, None)
+
+        if result is not None and not isinstance(result, dict):
+            result = {"value": result}
+        self._write(job_id, status=status, progress=progress, result=result or {},
+                    error=error, finished_at=time.time())
+        logger.info(f"🏁 Trabajo de ingesta {job_id}: {status}")
+
+    def _update_progress(self, job_id: str, progress: Dict[str, Any]):
+        now = time.time()
+        with self._state_lock:
+            merged = {**self._progress.get(job_id, {}), **progress}
+            self._progress[job_id] = merged
+            save = now - self._progress_saved_at.get(job_id, 0) >= self.progress_interval
+            if save:
+                self._progress_saved_at[job_id] = now
+        if save:
+            self._write(job_id, progress=merged)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Solicita la cancelación de un trabajo activo
+
+        Un trabajo en cola no llega a ejecutarse; uno en marcha se detiene en el
+        siguiente punto de control (la ingesta termina de escribir el lote en curso).
+        """
+        with self._state_lock:
+            context = self._contexts.get(job_id)
+        if context is None:
+            return False
+        context.cancel_event.set()
+        job = self.get(job_id)
+        if job and job["status"] == JOB_QUEUED:
+            self._write(job_id, status=JOB_CANCELLED, finished_at=time.time())
+        logger.info(f"🛑 Cancelación solicitada para el trabajo {job_id}")
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def active_count(self) -> int:
+        with self._state_lock:
+            return len(self._contexts)
+
+    def shutdown(self, cancel: bool = True):
+        if cancel:
+            with self._state_lock:
+                job_ids = list(self._contexts)
+            for job_id in job_ids:
+                self.cancel(job_id)
+        self._executor.shutdown(wait=False)
+
+_manager_instance = None
+_manager_lock = threading.Lock()
+
+def get_ingestion_jobs() -> IngestionJobManager:
+    """Obtener instancia única (configuración "ingestion_jobs" de settings.json)"""
+    global _manager_instance
+    with _manager_lock:
+        if _manager_instance is None:
+            from app.config.settings import load_settings
+            config = load_settings().get("ingestion_jobs", {})
+            _manager_instance = IngestionJobManager(
+                db_path=config.get("db_path", DEFAULT_JOBS_DB),
+                max_concurrent=config.get("max_concurrent", 1),
+                progress_interval=config.get("progress_interval_seconds", 1.0),
+                history_limit=config.get("history_limit", 200)
+            )
+    return _manager_instance
+
+def submit_document_ingestion(folder_paths: List[str], forzar: bool = False) -> Dict[str, Any]:
+    """Encola la ingesta LlamaIndex + ChromaDB de las carpetas de documentos"""
+    def _target(job: JobContext) -> Dict[str, Any]:
+        from app.utils.rag_utils import ingest_documents_with_llamaindex, obtener_estadisticas_ultima_ingesta
+        total = ingest_documents_with_llamaindex(
+            folder_paths, forzar=forzar, progreso=job.update, cancelar=job.cancel_event
+        )
+        stats = obtener_estadisticas_ultima_ingesta()
+        # Una carpeta que no se pudo procesar no puede constar como completada
+        errores = stats.get("carpetas_con_error") or []
+        if errores:
+            raise RuntimeError("; ".join(f"{e['carpeta']}: {e['error']}" for e in errores))
+        return {"total_documents": total, **stats}
+
+    return get_ingestion_jobs().submit(
+        "documents", _target, key="documents",
+        params={"folders": list(folder_paths), "forzar": forzar}
+    )
@@ -4,23 +4,35 @@ Detección inteligente de tipos documentales y chunking optimizado
 """
 import os
 import re
+import time
 import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import datetime
 
 # LlamaIndex imports
 try:
     from llama_index.core import SimpleDirectoryReader, Document
-    from llama_index.readers.file import PDFReader, DocxReader
+    from llama_index.core.readers.base import BaseReader
+    from llama_index.readers.file import DocxReader
     from llama_index.core.text_splitter import SentenceSplitter
-    from llama_index.core.node_parser import SimpleNodeParser
 except ImportError:
     # Fallback para versiones anteriores
     from llama_index import SimpleDirectoryReader, Document
-    from llama_index.readers.file import PDFReader, DocxReader
+    from llama_index.readers.base import BaseReader
+    from llama_index.readers.file import DocxReader
     from llama_index.text_splitter import SentenceSplitter
-    from llama_index.node_parser import SimpleNodeParser
+
+from app.config.settings import load_settings
+from app.services.document_classifier import get_document_classifier
+from app.services.structural_chunker import STRUCTURAL_SPANNERS, structural_spans
+from app.utils.token_chunker import TokenChunker, get_token_chunker
+from app.utils.pdf_extractor import extract_pdf_pages
+from app.utils.parsed_text_cache import get_parsed_text_cache, extractor_id
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -30,168 +42,159 @@ class MunicipalDocumentIngestor:
     """Ingesta optimizada para documentos de administración local"""
     
     def __init__(self):
-        # Configurar splitter para documentos legales y administrativos
+        # Splitter de respaldo si falla el chunking (tamaño acorde al límite de 256 tokens del modelo)
         self.text_splitter = SentenceSplitter(
-            chunk_size=1024,
-            chunk_overlap=200,
+            chunk_size=256,
+            chunk_overlap=32,
             separator=" ",
             paragraph_separator="\n\n",
             secondary_chunking_regex=r"[.!?]"
         )
         
-        # Parser de nodos
-        self.node_parser = SimpleNodeParser.from_defaults(
-            include_metadata=True,
-            include_prev_next_rel=True
-        )
+        # Chunker por tokens del modelo de embeddings (se crea al primer uso)
+        self._token_chunker = None
+        
+        # Longitud máxima de las secciones estructurales (artículos, puntos, partidas)
+        self.max_chunk_chars = load_settings().get("structural_chunk_max_chars", 4000)
         
         logger.info("✅ MunicipalDocumentIngestor inicializado")
     
-    def process_municipal_folder(self, folder_path: str) -> List[Document]:
+    @property
+    def token_chunker(self) -> TokenChunker:
+        if self._token_chunker is None:
+            self._token_chunker = get_token_chunker()
+        return self._token_chunker
+    
+    def list_folder_files(self, folder_path: str) -> List[str]:
+        """Archivos de la carpeta (recursivo, sin ocultos) que leería SimpleDirectoryReader"""
+        files = []
+        for root, dirs, filenames in os.walk(folder_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for filename in filenames:
+                if filename.startswith(".") or filename.startswith("~$"):
+                    continue
+                files.append(os.path.join(root, filename))
+        return sorted(files)
+    
+    def process_municipal_folder(self, folder_path: str, input_files: Optional[List[str]] = None,
+                                 workers: Optional[int] = None,
+                                 file_timeout: Optional[float] = None) -> List[Document]:
         """
         Procesa carpeta con documentos municipales
         
         Args:
             folder_path: Ruta a la carpeta con documentos
+            input_files: Si se indica, solo se leen estos archivos (ingesta incremental)
+            workers: Procesos de parseo (None = "ingestion_parse_workers" de settings.json)
+            file_timeout: Segundos máximos por archivo (None = "ingestion_file_timeout")
             
         Returns:
             Lista de documentos procesados con metadatos enriquecidos
         """
+        enriched_docs = []
+        for _, docs in self.iter_municipal_folder(folder_path, input_files, workers, file_timeout):
+            enriched_docs.extend(docs)
+        
+        logger.info(f"✅ Enriquecidos {len(enriched_docs)} documentos")
+        return enriched_docs
+    
+    def iter_municipal_folder(self, folder_path: str, input_files: Optional[List[str]] = None,
+                              workers: Optional[int] = None,
+                              file_timeout: Optional[float] = None,
+                              file_hashes: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        Parsea y enriquece los archivos de una carpeta, entregándolos a medida que terminan
+        
+        Con más de un worker cada archivo se parsea en un proceso aparte con
+        un tiempo máximo: un PDF problemático se descarta sin bloquear el resto.
+        `file_hashes` (ruta → sha256 ya calculado por el manifiesto) evita
+        volver a leer cada archivo para consultar la caché de texto.
+        
+        Yields:
+            (ruta del archivo, documentos enriquecidos de ese archivo)
+        """
         if not os.path.exists(folder_path):
             logger.warning(f"⚠️ Carpeta no encontrada: {folder_path}")
-            return []
+            return
         
-        # Configurar lectores específicos por tipo de archivo
-        file_extractor = {
-            ".pdf": PDFReader(return_full_document=True),
-            ".docx": DocxReader(),
-            ".txt": None  # Usar lector por defecto
-        }
+        files = self.list_folder_files(folder_path) if input_files is None else list(input_files)
+        if not files:
+            return
         
-        logger.info(f"📁 Procesando carpeta: {folder_path}")
+        settings = load_settings()
+        if workers is None:
+            workers = settings.get("ingestion_parse_workers", 0)
+        if not workers:
+            workers = default_parse_workers()
+        workers = min(workers, len(files))
+        if file_timeout is None:
+            file_timeout = settings.get("ingestion_file_timeout", 300)
         
-        try:
-            # Cargar documentos
-            reader = SimpleDirectoryReader(
-                input_dir=folder_path,
-                file_extractor=file_extractor,
-                recursive=True,
-                exclude_hidden=True,
-                filename_as_id=True
-            )
-            
-            documents = reader.load_data()
-            logger.info(f"📄 Cargados {len(documents)} documentos")
-            
-            # Enriquecer metadatos por tipo de documento
-            enriched_docs = []
-            for doc in documents:
+        logger.info(f"📁 Procesando carpeta: {folder_path} ({len(files)} archivos, {workers} procesos)")
+        
+        if workers <= 1:
+            for file_path in files:
                 try:
-                    # Detectar tipo de documento municipal
-                    doc_type = self._detect_municipal_document_type(doc.text)
-                    
-                    # Obtener información del archivo
-                    file_info = self._extract_file_info(doc.metadata.get('file_name', ''))
-                    
-                    # Enriquecer metadatos
-                    doc.metadata.update({
-                        "document_type": doc_type,
-                        "processed_by": "llamaindex",
-                        "chunk_strategy": "sentence_based",
-                        "source_folder": folder_path,
-                        "processed_at": datetime.now().isoformat(),
-                        "file_extension": file_info["extension"],
-                        "file_size_kb": file_info["size_kb"],
-                        "confidence_score": self._calculate_confidence_score(doc.text, doc_type)
-                    })
-                    
-                    enriched_docs.append(doc)
-                    
+                    docs = _load_file_documents(file_path, (file_hashes or {}).get(file_path))
                 except Exception as e:
-                    logger.error(f"❌ Error procesando documento {doc.metadata.get('file_name', 'unknown')}: {e}")
+                    logger.error(f"❌ Error leyendo {file_path}: {e}")
                     continue
-            
-            logger.info(f"✅ Enriquecidos {len(enriched_docs)} documentos")
-            return enriched_docs
-            
-        except Exception as e:
-            logger.error(f"❌ Error procesando carpeta {folder_path}: {e}")
-            return []
+                yield file_path, self._enrich_documents(docs, folder_path)
+            return
+        
+        for file_path, docs in _parse_files_parallel(files, workers, file_timeout, file_hashes):
+            yield file_path, self._enrich_documents(docs, folder_path)
+    
+    def _enrich_documents(self, documents: List[Document], folder_path: str) -> List[Document]:
+        """Enriquece los metadatos de los documentos según su tipo municipal"""
+        enriched_docs = []
+        for doc in documents:
+            try:
+                # Detectar tipo de documento municipal
+                doc_type = self._detect_municipal_document_type(doc.text)
+                
+                # Obtener información del archivo
+                file_info = self._extract_file_info(
+                    doc.metadata.get('file_path') or doc.metadata.get('file_name', '')
+                )
+                
+                # Enriquecer metadatos
+                doc.metadata.update({
+                    "document_type": doc_type,
+                    "processed_by": "llamaindex",
+                    "chunk_strategy": "structural" if doc_type in STRUCTURAL_SPANNERS else "token_window",
+                    "source_folder": folder_path,
+                    "processed_at": datetime.now().isoformat(),
+                    "file_extension": file_info["extension"],
+                    "file_size_kb": file_info["size_kb"],
+                    "confidence_score": self._calculate_confidence_score(doc.text, doc_type)
+                })
+                
+                enriched_docs.append(doc)
+                
+            except Exception as e:
+                logger.error(f"❌ Error procesando documento {doc.metadata.get('file_name', 'unknown')}: {e}")
+                continue
+        
+        return enriched_docs
     
     def _detect_municipal_document_type(self, text: str) -> str:
         """
         Detecta tipo de documento municipal usando patrones específicos
         
+        Usa el clasificador precompilado de una sola pasada
+        (ver app/services/document_classifier.py)
+        
         Args:
             text: Contenido del documento
             
         Returns:
             Tipo de documento detectado
         """
-        if not text:
-            return "documento_vacio"
-            
-        text_lower = text.lower()
-        
-        # Patrones específicos de administración local española
-        patterns = {
-            "ordenanza": {
-                "keywords": ["ordenanza", "artículo", "título", "capítulo", "disposición", "boe", "bop"],
-                "regex": [r"ordenanza\s+municipal", r"artículo\s+\d+", r"título\s+[ivx]+"]
-            },
-            "acta": {
-                "keywords": ["acta", "sesión", "punto del día", "acuerdo", "pleno", "comisión"],
-                "regex": [r"acta\s+de\s+la\s+sesión", r"punto\s+\d+", r"acuerdo\s+número"]
-            },
-            "resolucion": {
-                "keywords": ["resuelvo", "considerando", "por tanto", "resolución", "alcaldía"],
-                "regex": [r"resolución\s+número", r"considerando\s+que", r"por\s+tanto"]
-            },
-            "presupuesto": {
-                "keywords": ["partida", "euros", "gastos", "ingresos", "presupuesto", "capítulo"],
-                "regex": [r"partida\s+\d+", r"\d+[.,]\d+\s*€", r"capítulo\s+[ivx]+"]
-            },
-            "convenio": {
-                "keywords": ["convenio", "colaboración", "acuerdo marco", "partes"],
-                "regex": [r"convenio\s+de\s+colaboración", r"acuerdo\s+marco"]
-            },
-            "normativa": {
-                "keywords": ["reglamento", "instrucción", "circular", "protocolo", "normativa"],
-                "regex": [r"reglamento\s+municipal", r"instrucción\s+técnica"]
-            },
-            "subvencion": {
-                "keywords": ["subvención", "ayuda", "beca", "convocatoria", "bases"],
-                "regex": [r"convocatoria\s+de\s+subvenciones", r"bases\s+reguladoras"]
-            },
-            "licencia": {
-                "keywords": ["licencia", "autorización", "permiso", "actividad", "obras"],
-                "regex": [r"licencia\s+de\s+obras", r"licencia\s+de\s+actividad"]
-            }
-        }
-        
-        # Calcular puntuaciones
-        scores = {}
-        for doc_type, pattern_info in patterns.items():
-            score = 0
-            
-            # Puntuación por keywords
-            for keyword in pattern_info["keywords"]:
-                score += text_lower.count(keyword)
-            
-            # Puntuación por regex (peso mayor)
-            for regex_pattern in pattern_info["regex"]:
-                matches = len(re.findall(regex_pattern, text_lower))
-                score += matches * 3  # Peso mayor para patrones regex
-            
-            scores[doc_type] = score
-        
-        # Determinar tipo con mayor puntuación
-        if max(scores.values()) > 0:
-            detected_type = max(scores, key=scores.get)
-            logger.debug(f"🔍 Documento detectado como: {detected_type} (score: {scores[detected_type]})")
-            return detected_type
-        
-        return "documento_general"
+        detected_type, score = get_document_classifier().classify(text)
+        if score > 0:
+            logger.debug(f"🔍 Documento detectado como: {detected_type} (score: {score})")
+        return detected_type
     
     def _extract_file_info(self, filename: str) -> Dict[str, Any]:
         """Extrae información del archivo"""
@@ -233,171 +236,246 @@ class MunicipalDocumentIngestor:
         Returns:
             Lista de chunks especializados
         """
-        specialized_chunks = []
+        specialized_chunks = [
+            Document(text=text, metadata={**doc_metadata, **section_metadata})
+            for text, doc_metadata, section_metadata in self.iter_chunks(documents)
+        ]
+        logger.info(f"✅ Total chunks especializados: {len(specialized_chunks)}")
+        return specialized_chunks
+    
+    def iter_chunks(self, documents: List[Document]) -> Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """
+        Chunking especializado sin copiar metadatos
+        
+        Ordenanzas, actas y presupuestos se cortan por sus fronteras
+        estructurales (offsets de una sola pasada, ver structural_chunker.py);
+        el resto se divide en ventanas del tamaño máximo de secuencia del
+        modelo de embeddings (ver app/utils/token_chunker.py). Ningún chunk
+        supera ese límite, así que el modelo no trunca texto en silencio.
         
+        Yields:
+            (texto del chunk, metadatos del documento (compartidos, no modificar),
+             metadatos de la sección)
+        """
         for doc in documents:
             doc_type = doc.metadata.get("document_type", "general")
             
             try:
-                if doc_type == "ordenanza":
-                    chunks = self._chunk_legal_document(doc)
-                elif doc_type == "acta":
-                    chunks = self._chunk_meeting_document(doc)
-                elif doc_type == "presupuesto":
-                    chunks = self._chunk_budget_document(doc)
+                token_chunker = self.token_chunker
+                if doc_type in STRUCTURAL_SPANNERS:
+                    spans = structural_spans(doc.text, doc_type, self.max_chunk_chars)
+                    # Fallback al documento original si no hay secciones
+                    sections = [(doc.text[start:end], meta) for start, end, meta in spans] or [(doc.text, {})]
+                    
+                    # Secciones que el modelo truncaría: se dividen en ventanas de tokens
+                    chunks = []
+                    for section_text, meta in sections:
+                        windows = token_chunker.split_text(section_text)
+                        if len(windows) <= 1:
+                            chunks.append((section_text, meta))
+                        else:
+                            chunks.extend((window, {**meta, "token_window": i}) for i, window in enumerate(windows))
                 else:
-                    # Chunking estándar con nodos
-                    nodes = self.node_parser.get_nodes_from_documents([doc])
-                    chunks = [Document(text=node.text, metadata=doc.metadata) for node in nodes]
+                    # Chunking estándar por tokens del modelo de embeddings
+                    chunks = [(window, {}) for window in token_chunker.split_text(doc.text)]
                 
-                specialized_chunks.extend(chunks)
                 logger.debug(f"📝 {doc_type}: {len(chunks)} chunks creados")
                 
             except Exception as e:
                 logger.error(f"❌ Error chunking documento {doc_type}: {e}")
                 # Fallback a chunking estándar
-                chunks = self.text_splitter.split_text(doc.text)
-                chunks = [Document(text=chunk, metadata=doc.metadata) for chunk in chunks]
-                specialized_chunks.extend(chunks)
-        
-        logger.info(f"✅ Total chunks especializados: {len(specialized_chunks)}")
-        return specialized_chunks
+                chunks = [(chunk, {}) for chunk in self.text_splitter.split_text(doc.text)]
+            
+            for text, section_metadata in chunks:
+                yield text, doc.metadata, section_metadata
+
+class TieredPDFReader(BaseReader):
+    """Lector PDF por niveles: capa de texto y maquetación solo para páginas problemáticas"""
     
-    def _chunk_legal_document(self, doc: Document) -> List[Document]:
-        """Chunking especializado para documentos legales (ordenanzas, reglamentos)"""
-        text = doc.text
-        chunks = []
-        
-        # Dividir por artículos
-        article_pattern = r'(Artículo\s+\d+[.\-\s]*[.:]*)'
-        articles = re.split(article_pattern, text, flags=re.IGNORECASE)
-        
-        current_chunk = ""
-        article_number = None
-        
-        for i, part in enumerate(articles):
-            if re.match(article_pattern, part, re.IGNORECASE):
-                # Guardar chunk anterior si existe
-                if current_chunk.strip():
-                    chunks.append(Document(
-                        text=current_chunk.strip(),
-                        metadata={
-                            **doc.metadata, 
-                            "section_type": "article",
-                            "article_number": article_number
-                        }
-                    ))
-                
-                # Extraer número de artículo
-                match = re.search(r'(\d+)', part)
-                article_number = match.group(1) if match else None
-                current_chunk = part
-            else:
-                current_chunk += part
-        
-        # Añadir último chunk
-        if current_chunk.strip():
-            chunks.append(Document(
-                text=current_chunk.strip(),
-                metadata={
-                    **doc.metadata, 
-                    "section_type": "article",
-                    "article_number": article_number
-                }
-            ))
-        
-        return chunks if chunks else [doc]  # Fallback al documento original
+    def __init__(self, sha: Optional[str] = None):
+        # sha256 del archivo si ya se conoce (evita volver a calcularlo para la caché)
+        self.sha = sha
     
-    def _chunk_meeting_document(self, doc: Document) -> List[Document]:
-        """Chunking especializado para actas de reuniones"""
-        text = doc.text
-        chunks = []
-        
-        # Dividir por puntos del día
-        point_patterns = [
-            r'(\d+[.\-\s]*[Pp]unto[:\s])',
-            r'(Punto\s+\d+[:\s])',
-            r'(\d+\.\s*[A-Z])'  # Patrón alternativo
-        ]
-        
-        for pattern in point_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                points = re.split(pattern, text, flags=re.IGNORECASE)
+    def load_data(self, file, extra_info: Optional[Dict] = None, **kwargs) -> List[Document]:
+        pages, stats = extract_pdf_pages(str(file), self.sha)
+        metadata = {
+            **(extra_info or {}),
+            "pdf_pages": stats["pages"],
+            "pdf_layout_pages": stats["layout_pages"]
+        }
+        return [Document(text="\n".join(pages), metadata=metadata)]
+
+def _file_extractor(sha: Optional[str] = None) -> Dict[str, Any]:
+    """Lectores específicos por tipo de archivo"""
+    return {
+        ".pdf": TieredPDFReader(sha),
+        ".docx": DocxReader(),
+        ".txt": None  # Usar lector por defecto
+    }
+
+# Extensiones sin caché de documentos: PDF tiene su propia caché por páginas
+# (pdf_extractor) y el texto plano es más barato de leer que de descomprimir
+_UNCACHED_EXTENSIONS = {".pdf", ".txt", ".md", ".csv"}
+
+def _load_file_documents(file_path: str, sha: Optional[str] = None) -> List[Document]:
+    """Lee un único archivo con SimpleDirectoryReader (también usado por los workers)"""
+    reader = SimpleDirectoryReader(
+        input_files=[file_path],
+        file_extractor=_file_extractor(sha),
+        filename_as_id=True
+    )
+    if Path(file_path).suffix.lower() in _UNCACHED_EXTENSIONS:
+        return reader.load_data()
+    
+    cache = get_parsed_text_cache()
+    payload = cache.get_or_extract(
+        file_path,
+        extractor_id("llamaindex", 1),
+        lambda: {"documents": [{"text": doc.text, "metadata": doc.metadata} for doc in reader.load_data()]},
+        sha=sha
+    )
+    # La misma versión del archivo puede estar en otra ruta: actualizar metadatos de ruta
+    return [
+        Document(
+            text=entry["text"],
+            metadata={**entry["metadata"], "file_path": file_path, "file_name": os.path.basename(file_path)}
+        )
+        for entry in payload["documents"]
+    ]
+
+# Tope de procesos de parseo automáticos: la ingesta corre dentro del
+# servidor web y no debe acaparar todos los núcleos
+MAX_DEFAULT_PARSE_WORKERS = 4
+
+def default_parse_workers() -> int:
+    """Procesos de parseo con "ingestion_parse_workers" = 0: la mitad de los núcleos, como máximo 4"""
+    return max(1, min(MAX_DEFAULT_PARSE_WORKERS, (os.cpu_count() or 1) // 2))
+
+def _parse_files_parallel(files: List[str], workers: int, file_timeout: float,
+                          file_hashes: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Parsea archivos en un pool de procesos con tiempo máximo por archivo
+    
+    Solo hay `workers` archivos en vuelo, así que cada uno empieza al
+    enviarse y su plazo se cuenta desde ese momento. Si un archivo supera
+    el plazo se descarta, se terminan los procesos del pool (un parser
+    bloqueado no se puede cancelar de otra forma) y los archivos que
+    seguían en vuelo se reenvían a un pool nuevo.
+    
+    Si un trabajador muere (segfault, OOM) el pool queda roto y no se sabe
+    qué archivo lo causó: los que estaban en vuelo se reintentan de uno en
+    uno en un pool nuevo y el que vuelva a romperlo se descarta.
+    
+    Los procesos se arrancan con spawn (como el pool de embeddings): el
+    parseo se lanza desde un hilo de un proceso Flask con torch, Chroma y
+    sqlite cargados, y un fork en ese estado puede bloquear a los hijos.
+    """
+    context = multiprocessing.get_context("spawn")
+    pending = deque(files)
+    # Archivos en vuelo cuando murió un trabajador: se reintentan en solitario
+    suspects = set()
+    start_time = time.time()
+    parsed = failed = 0
+    
+    while pending:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        in_flight = {}
+        restart = False
+        try:
+            while pending or in_flight:
+                broken = []
+                while pending and len(in_flight) < workers:
+                    if in_flight and (pending[0] in suspects or
+                                      any(path in suspects for path, _ in in_flight.values())):
+                        break
+                    file_path = pending.popleft()
+                    try:
+                        future = executor.submit(_load_file_documents, file_path,
+                                                 (file_hashes or {}).get(file_path))
+                    except BrokenProcessPool:
+                        pending.appendleft(file_path)
+                        break
+                    in_flight[future] = (file_path, time.time() + file_timeout)
                 
-                current_chunk = ""
-                point_number = None
+                if not in_flight:
+                    # El pool se rompió antes de aceptar trabajo: empezar con uno nuevo
+                    restart = True
+                    break
                 
-                for i, part in enumerate(points):
-                    if re.match(pattern, part, re.IGNORECASE):
-                        if current_chunk.strip():
-                            chunks.append(Document(
-                                text=current_chunk.strip(),
-                                metadata={
-                                    **doc.metadata, 
-                                    "section_type": "agenda_point",
-                                    "point_number": point_number
-                                }
-                            ))
-                        
-                        # Extraer número de punto
-                        match = re.search(r'(\d+)', part)
-                        point_number = match.group(1) if match else None
-                        current_chunk = part
-                    else:
-                        current_chunk += part
+                next_deadline = min(deadline for _, deadline in in_flight.values())
+                done, _ = wait(in_flight, timeout=max(0.0, next_deadline - time.time()),
+                               return_when=FIRST_COMPLETED)
                 
-                # Añadir último chunk
-                if current_chunk.strip():
-                    chunks.append(Document(
-                        text=current_chunk.strip(),
-                        metadata={
-                            **doc.metadata, 
-                            "section_type": "agenda_point",
-                            "point_number": point_number
-                        }
-                    ))
-                break
-        
-        return chunks if chunks else [doc]
-    
-    def _chunk_budget_document(self, doc: Document) -> List[Document]:
-        """Chunking especializado para documentos presupuestarios"""
-        text = doc.text
-        chunks = []
-        
-        # Dividir por capítulos o partidas presupuestarias
-        budget_pattern = r'(Capítulo\s+[IVXLC\d]+|Partida\s+\d+)'
-        sections = re.split(budget_pattern, text, flags=re.IGNORECASE)
-        
-        current_chunk = ""
-        section_id = None
-        
-        for i, part in enumerate(sections):
-            if re.match(budget_pattern, part, re.IGNORECASE):
-                if current_chunk.strip():
-                    chunks.append(Document(
-                        text=current_chunk.strip(),
-                        metadata={
-                            **doc.metadata, 
-                            "section_type": "budget_section",
-                            "section_id": section_id
-                        }
-                    ))
+                for future in done:
+                    file_path, _ = in_flight.pop(future)
+                    try:
+                        docs = future.result()
+                    except BrokenProcessPool:
+                        broken.append(file_path)
+                        continue
+                    except Exception as e:
+                        logger.error(f"❌ Error leyendo {file_path}: {e}")
+                        failed += 1
+                        continue
+                    parsed += 1
+                    yield file_path, docs
+                
+                if broken:
+                    broken.extend(path for path, _ in in_flight.values())
+                    in_flight.clear()
+                    if len(broken) == 1 and broken[0] in suspects:
+                        logger.error(f"💥 El proceso de parseo terminó de forma abrupta con {broken[0]}, se omite")
+                        failed += 1
+                    else:
+                        logger.warning(
+                            f"💥 Un proceso de parseo terminó de forma abrupta; "
+                            f"se reintentan {len(broken)} archivos de uno en uno"
+                        )
+                        suspects.update(broken)
+                        pending.extendleft(reversed(broken))
+                    restart = True
+                    break
                 
-                section_id = part.strip()
-                current_chunk = part
+                expired = [f for f, (_, deadline) in in_flight.items() if deadline <= time.time()]
+                if expired:
+                    for future in expired:
+                        file_path, _ = in_flight.pop(future)
+                        logger.error(f"⏱️ Tiempo máximo ({file_timeout}s) superado leyendo {file_path}, se omite")
+                        failed += 1
+                    # Reenviar lo que seguía en vuelo y reiniciar el pool
+                    pending.extendleft(reversed([path for path, _ in in_flight.values()]))
+                    restart = True
+                    break
+        finally:
+            # También si el consumidor abandona el generador (cancelación):
+            # no esperar a que terminen los archivos en vuelo
+            if restart or in_flight:
+                _terminate_executor(executor)
             else:
-                current_chunk += part
-        
-        # Añadir último chunk
-        if current_chunk.strip():
-            chunks.append(Document(
-                text=current_chunk.strip(),
-                metadata={
-                    **doc.metadata, 
-                    "section_type": "budget_section",
-                    "section_id": section_id
-                }
-            ))
-        
-        return chunks if chunks else [doc]
\ No newline at end of file
+                executor.shutdown(wait=True)
+    
+    duration = time.time() - start_time
+    logger.info(
+        f"📄 Parseados {parsed} archivos en {duration:.2f}s con {workers} procesos"
+        + (f" ({failed} con error o tiempo agotado)" if failed else "")
+    )
+
+def _terminate_executor(executor: ProcessPoolExecutor):
+    """
+    Termina a la fuerza los procesos de un ProcessPoolExecutor
+    
+    concurrent.futures no ofrece una forma pública de matar a los
+    trabajadores (shutdown solo cancela lo que no ha empezado), así que se
+    usa el atributo interno `_processes` de CPython (3.8-3.13). Si no
+    existe, se cancela lo pendiente y los procesos bloqueados terminan por
+    su cuenta: el pool nuevo no depende de ellos.
+    """
+    if not hasattr(executor, "_processes"):
+        logger.warning("⚠️ No se pueden terminar los procesos de parseo en esta versión de Python")
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout=5)
@@ -0,0 +1,123 @@
+"""
+Chunker estructural basado en offsets para documentos municipales
+Localiza las fronteras de sección (artículos, puntos del día, capítulos y
+partidas) con patrones compilados recorriendo el texto una sola vez y
+devuelve spans (inicio, fin, metadatos de sección) sin copiar texto ni metadatos
+"""
+import re
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+# Span de chunk: (inicio, fin, metadatos de la sección)
+Span = Tuple[int, int, Dict[str, Any]]
+
+_NUMBER = re.compile(r"\d+")
+
+# Ordenanzas y reglamentos: una sección por artículo
+LEGAL_BOUNDARY = re.compile(r"Artículo\s+\d+[.\-\s]*[.:]*", re.IGNORECASE)
+
+# Actas: puntos del día, por orden de prioridad (se usa el primero presente)
+MEETING_BOUNDARIES = [
+    re.compile(r"\d+[.\-\s]*[Pp]unto[:\s]", re.IGNORECASE),
+    re.compile(r"Punto\s+\d+[:\s]", re.IGNORECASE),
+    re.compile(r"\d+\.\s*[A-Z]", re.IGNORECASE),
+]
+
+# Presupuestos: capítulos y partidas presupuestarias
+BUDGET_BOUNDARY = re.compile(r"Capítulo\s+[IVXLC\d]+|Partida\s+\d+", re.IGNORECASE)
+
+def _label_number(label: str) -> Optional[str]:
+    match = _NUMBER.search(label)
+    return match.group(0) if match else None
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Ajusta el span para excluir espacios iniciales/finales (equivale a .strip())"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _section_spans(text: str, boundaries: List[Tuple[int, Dict[str, Any]]],
+                   preamble_meta: Dict[str, Any]) -> Iterator[Span]:
+    """Convierte posiciones de frontera en spans [frontera_i, frontera_i+1)"""
+    starts = [(0, preamble_meta)] + boundaries
+    for i, (start, meta) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        start, end = _strip_span(text, start, end)
+        if start < end:
+            yield start, end, meta
+
+def _split_oversized(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Subdivide un span largo en párrafos, frases o palabras (en ese orden de preferencia)"""
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = -1
+        for separator in ("\n\n", "\n", ". ", " "):
+            position = text.rfind(separator, start + max_chars // 2, limit)
+            if position != -1:
+                cut = position + len(separator)
+                break
+        if cut == -1:
+            cut = limit
+        piece_start, piece_end = _strip_span(text, start, cut)
+        if piece_start < piece_end:
+            yield piece_start, piece_end
+        start = cut
+    start, end = _strip_span(text, start, end)
+    if start < end:
+        yield start, end
+
+def legal_spans(text: str) -> Iterator[Span]:
+    """Secciones por artículo (el preámbulo previo al primer artículo va aparte)"""
+    boundaries = [
+        (match.start(), {"section_type": "article", "article_number": _label_number(match.group(0))})
+        for match in LEGAL_BOUNDARY.finditer(text)
+    ]
+    return _section_spans(text, boundaries, {"section_type": "article"})
+
+def meeting_spans(text: str) -> Iterator[Span]:
+    """Secciones por punto del día usando el patrón de mayor prioridad encontrado"""
+    for pattern in MEETING_BOUNDARIES:
+        # Un patrón ausente cuesta un recorrido; el elegido se recorre una sola vez
+        boundaries = [
+            (match.start(), {"section_type": "agenda_point", "point_number": _label_number(match.group(0))})
+            for match in pattern.finditer(text)
+        ]
+        if boundaries:
+            return _section_spans(text, boundaries, {"section_type": "agenda_point"})
+    return iter(())
+
+def budget_spans(text: str) -> Iterator[Span]:
+    """Secciones por capítulo o partida presupuestaria"""
+    boundaries = [
+        (match.start(), {"section_type": "budget_section", "section_id": match.group(0).strip()})
+        for match in BUDGET_BOUNDARY.finditer(text)
+    ]
+    return _section_spans(text, boundaries, {"section_type": "budget_section"})
+
+STRUCTURAL_SPANNERS = {
+    "ordenanza": legal_spans,
+    "acta": meeting_spans,
+    "presupuesto": budget_spans,
+}
+
+def structural_spans(text: str, doc_type: str, max_chars: int = 0) -> List[Span]:
+    """
+    Spans de un documento según su tipo
+
+    Las secciones más largas que `max_chars` se subdividen (la sección
+    conserva sus metadatos y se añade "section_part"). Devuelve [] si el tipo
+    no tiene chunking estructural o no se encontró ninguna sección.
+    """
+    spanner = STRUCTURAL_SPANNERS.get(doc_type)
+    if spanner is None or not text:
+        return []
+
+    spans = []
+    for start, end, meta in spanner(text):
+        if not max_chars or end - start <= max_chars:
+            spans.append((start, end, meta))
+            continue
+        for part, (part_start, part_end) in enumerate(_split_oversized(text, start, end, max_chars)):
+            spans.append((part_start, part_end, {**meta, "section_part": part}))
+    return spans
@@ -0,0 +1,151 @@
+"""
+Detección de texto repetido en todo el sitio (menús, pies, avisos de cookies)
+Cada página se divide en bloques de texto; un bloque cuya huella aparece en
+una fracción grande de las páginas del mismo host es plantilla y no se
+indexa. Las frecuencias se persisten por host, de modo que los recrawls
+filtran desde la primera página.
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+from bs4 import BeautifulSoup
+from bs4.element import Comment, Doctype, Declaration, CData, ProcessingInstruction
+
+logger = logging.getLogger(__name__)
+
+BOILERPLATE_STATS_PATH = os.path.join("vectorstore", "web", "boilerplate_stats.json")
+
+DEFAULT_BOILERPLATE_CONFIG = {
+    "enabled": True,
+    # Fracción de páginas del host en las que debe aparecer un bloque
+    "min_page_ratio": 0.3,
+    "min_pages": 3,
+    # Páginas que se acumulan antes de empezar a filtrar en un host sin historial
+    "warmup_pages": 10,
+    "max_fingerprints_per_host": 50000
+}
+
+_NON_TEXT_TAGS = ("script", "style", "noscript", "template", "svg")
+_BLOCK_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "dt", "dd", "blockquote",
+               "pre", "address", "figcaption", "caption", "label", "div", "section", "article",
+               "header", "footer", "nav", "aside", "main", "form", "table", "tr", "ul", "ol", "dl",
+               "body", "html", "button", "option"}
+_SKIPPED_STRINGS = (Comment, Doctype, Declaration, CData, ProcessingInstruction)
+_SPACES = re.compile(r"\s+")
+
+def _block_parent(node):
+    parent = node.parent
+    while parent is not None and parent.name not in _BLOCK_TAGS:
+        parent = parent.parent
+    return parent
+
+def extract_blocks(html: str) -> List[str]:
+    """
+    Bloques de texto visibles de la página
+
+    Los textos consecutivos con el mismo elemento de bloque más cercano forman
+    un bloque, así que los enlaces o negritas dentro de un párrafo no lo parten.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(_NON_TEXT_TAGS):
+        tag.decompose()
+
+    blocks, current, current_parent = [], [], None
+    for string in soup.find_all(string=True):
+        if isinstance(string, _SKIPPED_STRINGS):
+            continue
+        parent = _block_parent(string)
+        if parent is not current_parent and current:
+            blocks.append("".join(current))
+            current = []
+        current_parent = parent
+        current.append(str(string))
+    if current:
+        blocks.append("".join(current))
+
+    normalized = (_SPACES.sub(" ", block.replace("\xa0", " ")).strip() for block in blocks)
+    return [block for block in normalized if block]
+
+def block_fingerprint(block: str) -> str:
+    normalized = _SPACES.sub(" ", block.lower()).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+class SiteBoilerplate:
+    """Frecuencia de documento de cada huella de bloque, por host"""
+
+    def __init__(self, path: str = BOILERPLATE_STATS_PATH, config: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.config = {**DEFAULT_BOILERPLATE_CONFIG, **(config or {})}
+        self._lock = threading.Lock()
+        self.hosts: Dict[str, Dict[str, Any]] = self._load()
+        self.stats = {"blocks": 0, "boilerplate_blocks": 0, "characters": 0, "boilerplate_characters": 0}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Error cargando estadísticas de plantilla {self.path}: {e}")
+            return {}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.hosts, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _host(self, host: str) -> Dict[str, Any]:
+        return self.hosts.setdefault(host, {"pages": 0, "blocks": {}})
+
+    def observe(self, host: str, blocks: List[str]):
+        """Registra los bloques de una página (cada huella cuenta una vez por página)"""
+        with self._lock:
+            entry = self._host(host)
+            entry["pages"] += 1
+            counts = entry["blocks"]
+            for fingerprint in {block_fingerprint(block) for block in blocks}:
+                counts[fingerprint] = counts.get(fingerprint, 0) + 1
+            if len(counts) > self.config["max_fingerprints_per_host"]:
+                # Las huellas vistas una sola vez no pueden ser plantilla todavía
+                entry["blocks"] = {fp: n for fp, n in counts.items() if n > 1}
+
+    def warming_up(self, host: str) -> bool:
+        """Todavía no hay páginas suficientes del host para decidir qué es plantilla"""
+        return self._host(host)["pages"] < self.config["warmup_pages"]
+
+    def is_boilerplate(self, host: str, block: str) -> bool:
+        entry = self._host(host)
+        count = entry["blocks"].get(block_fingerprint(block), 0)
+        return count >= max(self.config["min_pages"], self.config["min_page_ratio"] * entry["pages"])
+
+    def strip(self, host: str, blocks: List[str]) -> List[str]:
+        """Bloques que no son plantilla del sitio"""
+        if not self.config["enabled"]:
+            return blocks
+        kept = [block for block in blocks if not self.is_boilerplate(host, block)]
+        with self._lock:
+            self.stats["blocks"] += len(blocks)
+            self.stats["boilerplate_blocks"] += len(blocks) - len(kept)
+            total_chars = sum(map(len, blocks))
+            self.stats["characters"] += total_chars
+            self.stats["boilerplate_characters"] += total_chars - sum(map(len, kept))
+        return kept
+
+_boilerplate_instance = None
+
+def get_site_boilerplate() -> SiteBoilerplate:
+    """Obtener instancia única (configuración "web_boilerplate" de settings.json)"""
+    global _boilerplate_instance
+    if _boilerplate_instance is None:
+        from app.config.settings import load_settings
+        _boilerplate_instance = SiteBoilerplate(config=load_settings().get("web_boilerplate", {}))
+    return _boilerplate_instance
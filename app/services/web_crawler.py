@@ -0,0 +1,403 @@
+"""
+Crawler web concurrente: HTTP primero, navegador solo para páginas JavaScript
+La mayoría de páginas municipales (onda.es, transparencia) se renderizan en el
+servidor: se descargan con una sesión HTTP con pool de conexiones y solo las
+que no traen texto útil en el HTML estático pasan por Chrome headless.
+Concurrencia global y por host acotadas, con espaciado mínimo entre peticiones
+al mismo host (o el Crawl-delay de robots.txt si es mayor).
+"""
+import time
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urlsplit
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+
+from app.services.crawl_frontier import CrawlFrontier, DEFAULT_FRONTIER_CONFIG, canonicalize_url, parse_sitemap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CRAWLER_CONFIG = {
+    "concurrency": 8,
+    "per_host_concurrency": 4,
+    "per_host_delay": 0.1,
+    "timeout": 15,
+    "min_text_chars": 200,
+    "browser_fallback": True,
+    # Páginas procesadas entre checkpoints (si se pasa `on_checkpoint`)
+    "checkpoint_pages": 25,
+    "user_agent": "Mozilla/5.0 (compatible; AsistenteMunicipalBot/1.0)"
+}
+
+_NON_TEXT_TAGS = ("script", "style", "noscript", "template")
+
+@dataclass
+class CrawledPage:
+    """Página descargada: HTML final y cómo se obtuvo"""
+    url: str
+    final_url: str
+    status: int
+    html: str
+    rendered: bool = False
+    seconds: float = 0.0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False  # 304: el contenido es el de la visita anterior
+    gone: bool = False          # 404/410: la página ya no existe
+    links: List[str] = field(default_factory=list)
+
+def crawler_config() -> Dict[str, Any]:
+    from app.config.settings import load_settings
+    return {**DEFAULT_CRAWLER_CONFIG, **load_settings().get("web_crawler", {})}
+
+def visible_text(html: str) -> str:
+    """Texto visible del HTML (sin scripts ni estilos), con espacios normalizados"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(_NON_TEXT_TAGS):
+        tag.decompose()
+    return " ".join(soup.get_text(separator=" ").split())
+
+def needs_browser(html: str, min_text_chars: int = 200) -> bool:
+    """El HTML estático no tiene texto útil: probablemente se renderiza con JavaScript"""
+    return len(visible_text(html)) < min_text_chars
+
+def extract_links(html: str, base_url: str) -> Set[str]:
+    """Enlaces al mismo host que `base_url`, sin fragmento"""
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a"))
+    host = urlparse(base_url).netloc
+    urls = set()
+    for tag in soup:
+        if tag.name == "a" and tag.get("href"):
+            href = urljoin(base_url, tag["href"])
+            parsed = urlparse(href)
+            if parsed.scheme in ("http", "https") and parsed.netloc == host:
+                urls.add(href.split("#")[0])
+    return urls
+
+def create_http_session(pool_size: int = 8, user_agent: Optional[str] = None) -> requests.Session:
+    """Sesión con conexiones keep-alive reutilizables por host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = user_agent or DEFAULT_CRAWLER_CONFIG["user_agent"]
+    return session
+
+class _HostLimiter:
+    """Concurrencia máxima y separación mínima entre peticiones a un mismo host"""
+
+    def __init__(self, concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self._lock:
+            wait = self._next_start - time.monotonic()
+            self._next_start = max(time.monotonic(), self._next_start) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+class AsyncCrawler:
+    """
+    Crawl de un dominio por prioridad (ver CrawlFrontier) con varias descargas en vuelo
+
+    Las descargas HTTP y el navegador se ejecutan en hilos (run_in_executor);
+    `on_page` se llama en un único hilo de procesamiento, en orden de llegada,
+    para no bloquear el bucle de eventos mientras se chunkea y embebe.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, browser_pool=None,
+                 session: Optional[requests.Session] = None, crawl_state=None):
+        self.config = {**DEFAULT_CRAWLER_CONFIG, **(config or {})}
+        self.session = session or create_http_session(self.config["concurrency"], self.config["user_agent"])
+        self._browser_pool = browser_pool
+        # Con estado del crawl las peticiones son condicionales (ETag / Last-Modified)
+        self.crawl_state = crawl_state
+        self._hosts: Dict[str, _HostLimiter] = {}
+        self.stats = {"pages": 0, "http_pages": 0, "rendered_pages": 0, "not_modified": 0,
+                      "gone": 0, "duplicates": 0, "errors": 0, "skipped_non_html": 0, "seconds": 0.0}
+        self.frontier_stats: Dict[str, Any] = {}
+
+    @property
+    def browser_pool(self):
+        if self._browser_pool is None:
+            from app.utils.browser_pool import get_browser_pool
+            self._browser_pool = get_browser_pool()
+        return self._browser_pool
+
+    def _limiter(self, url: str) -> _HostLimiter:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = _HostLimiter(self.config["per_host_concurrency"], self.config["per_host_delay"])
+        return self._hosts[host]
+
+    def fetch_page(self, url: str) -> Optional[CrawledPage]:
+        """Descarga HTTP y, si el HTML estático no tiene texto, render con navegador (bloqueante)"""
+        start = time.time()
+        headers = self.crawl_state.conditional_headers(url) if self.crawl_state is not None else {}
+        response = self.session.get(url, headers=headers, timeout=self.config["timeout"])
+        validators = {"etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified")}
+        if response.status_code == 304:
+            return CrawledPage(url=url, final_url=url, status=304, html="", not_modified=True,
+                               seconds=round(time.time() - start, 3), **validators)
+        if response.status_code in (404, 410):
+            return CrawledPage(url=url, final_url=url, status=response.status_code, html="", gone=True)
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            self.stats["skipped_non_html"] += 1
+            return None
+        response.raise_for_status()
+
+        page = CrawledPage(url=url, final_url=response.url, status=response.status_code,
+                           html=response.text, **validators)
+        if self.config["browser_fallback"] and needs_browser(page.html, self.config["min_text_chars"]):
+            logger.info(f"🌐 {url}: sin texto en el HTML estático, renderizando con navegador")
+            page.html = self.browser_pool.fetch(url)
+            page.rendered = True
+        page.seconds = round(time.time() - start, 3)
+        return page
+
+    async def fetch(self, url: str, executor: ThreadPoolExecutor) -> Optional[CrawledPage]:
+        """`fetch_page` en un hilo, respetando los límites del host"""
+        async with self._limiter(url):
+            return await asyncio.get_running_loop().run_in_executor(executor, self.fetch_page, url)
+
+    def _seed(self, frontier: CrawlFrontier, base_url: str,
+              sitemaps: bool = True) -> List[Tuple[str, Optional[float]]]:
+        """Descarga robots.txt (reglas y Crawl-delay) y las URLs de los sitemaps (bloqueante)"""
+        parts = urlsplit(base_url)
+        root = f"{parts.scheme}://{parts.netloc}"
+        frontier_config = frontier.config
+
+        robots_txt = None
+        if frontier_config["respect_robots"]:
+            try:
+                response = self.session.get(f"{root}/robots.txt", timeout=self.config["timeout"])
+                if response.status_code == 200:
+                    robots_txt = response.text
+            except Exception as e:
+                logger.debug(f"robots.txt no disponible en {root}: {e}")
+        frontier.load_robots(robots_txt, frontier_config["robots_user_agent"])
+
+        if not sitemaps or not frontier_config["use_sitemaps"]:
+            return []
+        pending = deque(frontier.robots_sitemaps() or [f"{root}/sitemap.xml"])
+        fetched, entries = set(), []
+        while pending and len(fetched) < 20 and len(entries) < frontier_config["max_sitemap_urls"]:
+            sitemap_url = pending.popleft()
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            try:
+                response = self.session.get(sitemap_url, timeout=self.config["timeout"])
+                if response.status_code != 200:
+                    continue
+                urls, children = parse_sitemap(response.content)
+            except Exception as e:
+                logger.debug(f"Sitemap {sitemap_url} no disponible: {e}")
+                continue
+            entries.extend(urls)
+            pending.extend(children)
+        return entries[:frontier_config["max_sitemap_urls"]]
+
+    async def crawl_async(self, base_url: str, max_pages: int,
+                          on_page: Callable[[CrawledPage], None],
+                          on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          resume: Optional[Dict[str, Any]] = None) -> Set[str]:
+        """
+        Recorre el dominio de `base_url` hasta `max_pages` páginas; devuelve las visitadas (canónicas)
+
+        Cada `checkpoint_pages` páginas se llama a `on_checkpoint` con una
+        instantánea serializable del crawl, en el hilo de `on_page` y después
+        de todas las páginas que recoge (las que estaban a medias vuelven a la
+        cola). Pasando esa instantánea como `resume` el crawl continúa donde
+        se quedó.
+        """
+        start = time.time()
+        loop = asyncio.get_running_loop()
+        base_url = canonicalize_url(base_url) or base_url
+        frontier = CrawlFrontier(urlsplit(base_url).netloc,
+                                 {**DEFAULT_FRONTIER_CONFIG, **self.config.get("frontier", {})})
+        visited: Set[str] = set()
+        content_hashes: Set[str] = set()
+        # URL -> (consume presupuesto, hash del HTML) de las páginas ya entregadas a
+        # on_page; solo se modifica en el hilo de procesamiento
+        handled: Dict[str, Tuple[bool, Optional[str]]] = {}
+        in_progress: Dict[str, Tuple[float, int, str, int]] = {}
+        redirected: Dict[str, str] = {}
+        if resume:
+            frontier.restore(resume["frontier"])
+            visited.update(resume["visited"])
+            content_hashes.update(resume["content_hashes"])
+            handled.update((url, (True, None)) for url in resume["visited"])
+            self.stats.update(resume["stats"])
+        resumed_hashes = set(content_hashes)
+        claimed = len(visited)
+        in_flight = 0
+        since_checkpoint = 0
+        condition = asyncio.Condition()
+
+        with ThreadPoolExecutor(max_workers=self.config["concurrency"]) as io_executor, \
+                ThreadPoolExecutor(max_workers=1) as page_executor:
+
+            sitemap_entries = await loop.run_in_executor(io_executor, self._seed, frontier, base_url,
+                                                         resume is None)
+            crawl_delay = frontier.robots_crawl_delay()
+            if crawl_delay:
+                limiter = self._limiter(base_url)
+                limiter.delay = max(limiter.delay, crawl_delay)
+            if resume is None:
+                frontier.add(base_url, 0, priority_adjustment=-1000)
+            for url, sitemap_priority in sitemap_entries:
+                # Prioridad del sitemap (0..1, 0.5 por defecto) como ajuste fino
+                adjustment = 0.5 - sitemap_priority if sitemap_priority is not None else 0.0
+                if frontier.add(url, 1, adjustment):
+                    frontier.stats["sitemap_urls"] += 1
+
+            async def next_url():
+                nonlocal claimed, in_flight
+                async with condition:
+                    while True:
+                        if claimed < max_pages and len(frontier):
+                            claimed += 1
+                            in_flight += 1
+                            entry = frontier.pop()
+                            in_progress[entry[2]] = entry
+                            return entry
+                        if in_flight == 0:
+                            condition.notify_all()
+                            return None
+                        await condition.wait()
+
+            def handle(page: CrawledPage, counted: bool, digest: Optional[str]):
+                on_page(page)
+                handled[page.url] = (counted, digest)
+
+            async def checkpoint():
+                """Instantánea de la frontera, completada en el hilo de procesamiento"""
+                frontier_snapshot = frontier.snapshot()
+                pending = list(in_progress.values())
+                redirects = dict(redirected)
+                stats = dict(self.stats)
+
+                def build():
+                    seen = set(frontier_snapshot["seen"])
+                    for entry in pending:
+                        if entry[2] not in handled:
+                            # Página a medias: se vuelve a descargar al reanudar
+                            frontier_snapshot["heap"].append(list(entry))
+                            seen.discard(redirects.get(entry[2]))
+                    frontier_snapshot["seen"] = sorted(seen)
+                    on_checkpoint({
+                        "base_url": base_url,
+                        "max_pages": max_pages,
+                        "frontier": frontier_snapshot,
+                        "visited": sorted(url for url, (counted, _) in handled.items() if counted),
+                        "content_hashes": sorted(resumed_hashes | {d for _, d in handled.values() if d}),
+                        "stats": stats
+                    })
+
+                await loop.run_in_executor(page_executor, build)
+
+            async def process(url: str, depth: int) -> bool:
+                """Descarga y procesa una URL; False si no consume presupuesto"""
+                try:
+                    page = await self.fetch(url, io_executor)
+                except Exception as e:
+                    logger.warning(f"❌ Error al acceder a {url}: {e}")
+                    self.stats["errors"] += 1
+                    return False
+                if page is None or page.gone:
+                    if page is not None:
+                        self.stats["gone"] += 1
+                        await loop.run_in_executor(page_executor, handle, page, False, None)
+                    return False
+
+                final_url = canonicalize_url(page.final_url) or url
+                if final_url != url:
+                    if not frontier.mark_seen(final_url):
+                        # Redirección a una página ya conocida
+                        self.stats["duplicates"] += 1
+                        return False
+                    redirected[url] = final_url
+                digest = None
+                if not page.not_modified:
+                    digest = hashlib.sha256(page.html.encode("utf-8")).hexdigest()
+                    if digest in content_hashes:
+                        self.stats["duplicates"] += 1
+                        return False
+                    content_hashes.add(digest)
+
+                visited.add(url)
+                self.stats["pages"] += 1
+                if page.not_modified:
+                    self.stats["not_modified"] += 1
+                    links = self.crawl_state.links(url)
+                else:
+                    self.stats["rendered_pages" if page.rendered else "http_pages"] += 1
+                    links = await loop.run_in_executor(io_executor, extract_links, page.html, page.final_url)
+                page.links = sorted({c for c in map(frontier.canonical, links) if c})
+                for link in page.links:
+                    frontier.add(link, depth + 1)
+                await loop.run_in_executor(page_executor, handle, page, True, digest)
+                return True
+
+            async def worker():
+                nonlocal claimed, in_flight, since_checkpoint
+                while True:
+                    entry = await next_url()
+                    if entry is None:
+                        return
+                    _, _, url, depth = entry
+                    counted = False
+                    try:
+                        counted = await process(url, depth)
+                    except Exception as e:
+                        logger.error(f"❌ Error procesando {url}: {e}")
+                        counted = True
+                    finally:
+                        async with condition:
+                            in_flight -= 1
+                            in_progress.pop(url, None)
+                            if not counted:
+                                claimed -= 1
+                            condition.notify_all()
+                    if on_checkpoint is not None and counted:
+                        since_checkpoint += 1
+                        if since_checkpoint >= self.config["checkpoint_pages"]:
+                            since_checkpoint = 0
+                            await checkpoint()
+
+            await asyncio.gather(*(worker() for _ in range(self.config["concurrency"])))
+
+        self.frontier_stats = dict(frontier.stats, pending=len(frontier))
+        self.stats["seconds"] = round(self.stats["seconds"] + time.time() - start, 2)
+        logger.info(
+            f"🕸️ Crawl de {base_url}: {len(visited)} páginas en {time.time() - start:.1f}s "
+            f"({self.stats['http_pages']} HTTP, {self.stats['rendered_pages']} con navegador, "
+            f"{self.stats['not_modified']} sin cambios, {self.stats['duplicates']} duplicadas, "
+            f"{self.stats['errors']} errores) | frontera: {frontier.stats['sitemap_urls']} desde sitemap, "
+            f"{frontier.stats['duplicates']} URLs duplicadas, {frontier.stats['excluded']} excluidas, "
+            f"{frontier.stats['robots_blocked']} bloqueadas por robots.txt"
+        )
+        return visited
+
+    def crawl(self, base_url: str, max_pages: int, on_page: Callable[[CrawledPage], None],
+              on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+              resume: Optional[Dict[str, Any]] = None) -> Set[str]:
+        """Versión síncrona de `crawl_async`"""
+        return asyncio.run(self.crawl_async(base_url, max_pages, on_page, on_checkpoint, resume))
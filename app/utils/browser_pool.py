@@ -0,0 +1,173 @@
+"""
+Pool de navegadores Chrome headless reutilizables para el crawler web
+Arrancar Chrome cuesta más que cargar la mayoría de páginas municipales: los
+drivers se mantienen vivos entre URLs, se reciclan cada N páginas (fugas de
+memoria de Chrome) o al fallar, y la espera es explícita (document.readyState)
+en lugar de un implicitly_wait fijo.
+"""
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROWSER_CONFIG = {
+    "size": 2,
+    "max_pages_per_driver": 50,
+    "page_load_timeout": 30,
+    "ready_timeout": 10
+}
+
+def create_chrome_driver(page_load_timeout: float = 30):
+    """Chrome headless con las opciones que usaba el crawler"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(page_load_timeout)
+    driver.implicitly_wait(0)
+    return driver
+
+class _PooledDriver:
+    """Driver del pool con su contador de páginas"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+class BrowserPool:
+    """
+    Pool acotado de drivers Selenium
+
+    Los drivers se crean bajo demanda hasta `size`; `fetch` bloquea si todos
+    están ocupados. Un driver que falla se descarta y la URL se reintenta una
+    vez con uno nuevo.
+    """
+
+    def __init__(self, size: int = 2, max_pages_per_driver: int = 50,
+                 page_load_timeout: float = 30, ready_timeout: float = 10,
+                 driver_factory: Optional[Callable[[], Any]] = None):
+        self.size = max(1, size)
+        self.max_pages_per_driver = max(1, max_pages_per_driver)
+        self.page_load_timeout = page_load_timeout
+        self.ready_timeout = ready_timeout
+        self._driver_factory = driver_factory or (lambda: create_chrome_driver(page_load_timeout))
+        self._idle: "queue.LifoQueue[Optional[_PooledDriver]]" = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(None)  # hueco libre: el driver se crea al usarlo
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"pages": 0, "drivers_started": 0, "drivers_recycled": 0,
+                      "driver_failures": 0, "startup_seconds": 0.0}
+
+    def _start_driver(self) -> _PooledDriver:
+        start = time.time()
+        driver = self._driver_factory()
+        with self._lock:
+            self.stats["drivers_started"] += 1
+            self.stats["startup_seconds"] = round(self.stats["startup_seconds"] + time.time() - start, 3)
+        logger.info(f"🌐 Navegador headless iniciado en {time.time() - start:.2f}s")
+        return _PooledDriver(driver)
+
+    @staticmethod
+    def _quit(slot: Optional[_PooledDriver]):
+        if slot is None:
+            return
+        try:
+            slot.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error cerrando navegador: {e}")
+
+    @contextmanager
+    def acquire(self):
+        """Presta un driver; al devolverlo se recicla si ha alcanzado su límite de páginas"""
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado")
+        slot = self._idle.get()
+        try:
+            if slot is None:
+                slot = self._start_driver()
+            yield slot
+        except Exception:
+            # Driver en estado desconocido (caído, colgado): no se reutiliza
+            self._quit(slot)
+            slot = None
+            with self._lock:
+                self.stats["driver_failures"] += 1
+            raise
+        finally:
+            if slot is not None and slot.pages >= self.max_pages_per_driver:
+                self._quit(slot)
+                slot = None
+                with self._lock:
+                    self.stats["drivers_recycled"] += 1
+            if self._closed:
+                self._quit(slot)
+                slot = None
+            self._idle.put(slot)
+
+    def wait_until_ready(self, driver, timeout: Optional[float] = None):
+        """Espera explícita a que el documento esté completo y tenga <body>"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        WebDriverWait(driver, timeout or self.ready_timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(
+                "return document.readyState === 'complete' && document.body !== null"
+            )
+        )
+
+    def fetch(self, url: str, retries: int = 1) -> str:
+        """HTML renderizado de `url`"""
+        for attempt in range(retries + 1):
+            try:
+                with self.acquire() as slot:
+                    slot.driver.get(url)
+                    self.wait_until_ready(slot.driver)
+                    slot.pages += 1
+                    with self._lock:
+                        self.stats["pages"] += 1
+                    return slot.driver.page_source
+            except Exception as e:
+                if attempt >= retries:
+                    raise
+                logger.warning(f"⚠️ Navegador falló en {url} ({e}), reintentando con uno nuevo")
+
+    def close(self):
+        """Cierra todos los drivers inactivos; los prestados se cierran al devolverse"""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "size": self.size, "max_pages_per_driver": self.max_pages_per_driver}
+
+_pool_instance = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    """Obtener instancia única (configuración "browser_pool" de settings.json)"""
+    global _pool_instance
+    with _pool_lock:
+        if _pool_instance is None:
+            from app.config.settings import load_settings
+            config = {**DEFAULT_BROWSER_CONFIG, **load_settings().get("browser_pool", {})}
+            _pool_instance = BrowserPool(
+                size=config["size"],
+                max_pages_per_driver=config["max_pages_per_driver"],
+                page_load_timeout=config["page_load_timeout"],
+                ready_timeout=config["ready_timeout"]
+            )
+            atexit.register(_pool_instance.close)
+    return _pool_instance
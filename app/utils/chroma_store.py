@@ -6,30 +6,144 @@ import chromadb
 from chromadb.config import Settings
 from langchain_chroma import Chroma
 from langchain.embeddings.base import Embeddings
-from sentence_transformers import SentenceTransformer
+from app.config.settings import load_settings
+from app.utils.embedding_registry import get_embedding_model, get_embedding_registry_stats
+from app.utils.lexical_index import BM25Index
+from app.utils.chunk_embedding_cache import get_chunk_embedding_cache, embedding_namespace
 import os
+import re
+import time
+import atexit
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
+import numpy as np
 from datetime import datetime
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def distance_to_similarity(distancia: float) -> float:
+    """
+    Convierte la distancia L2 al cuadrado de ChromaDB en similitud coseno
+    
+    all-MiniLM-L6-v2 produce vectores normalizados, por lo que
+    ||a - b||² = 2 - 2·cos(a, b).
+    """
+    return round(max(0.0, min(1.0, 1.0 - float(distancia) / 2.0)), 4)
+
+class QueryEmbeddingCache:
+    """Caché LRU acotada y thread-safe para embeddings de consultas"""
+    
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normaliza el texto de la consulta para usarlo como clave
+        
+        all-MiniLM-L6-v2 usa un tokenizer uncased, así que mayúsculas y
+        espacios redundantes no cambian el embedding.
+        """
+        text = unicodedata.normalize("NFC", text or "")
+        return re.sub(r"\s+", " ", text).strip().lower()
+    
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        """Devuelve el embedding cacheado o None"""
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            stored_at, vector = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+    
+    def put(self, model_name: str, text: str, vector: List[float]):
+        """Guarda un embedding, expulsando el menos usado si se supera el tamaño"""
+        if self.max_size <= 0:
+            return
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            self._data[key] = (time.time(), vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Vacía la caché (mantiene los contadores)"""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
 class SentenceTransformerEmbeddings(Embeddings):
     """Wrapper para integrar SentenceTransformers con LangChain"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 cache_size: int = 1024, cache_ttl: Optional[float] = 3600,
+                 backend: Optional[str] = None, batch_size: int = 64):
+        self.model = get_embedding_model(model_name, backend=backend)
+        # La clave de caché incluye el backend realmente cargado (no el de
+        # settings.json): torch y ONNX int8 no dan vectores idénticos
+        self.model_name = model_name
+        self._cache_namespace = embedding_namespace(model_name, backend)
+        self.backend = self._cache_namespace.split(":", 1)[1]
+        self.query_cache = QueryEmbeddingCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        self.batch_size = batch_size
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embebida múltiples documentos"""
-        return self.model.encode(texts).tolist()
+        """Embebida múltiples documentos (encode ya agrupa los lotes por longitud)"""
+        return self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False).tolist()
+    
+    def embed_chunks(self, texts: List[str]) -> List[List[float]]:
+        """Embebida chunks a indexar reutilizando la caché persistente de embeddings"""
+        return get_chunk_embedding_cache().embed(
+            self._cache_namespace, texts, self.embed_documents
+        ).tolist()
     
     def embed_query(self, text: str) -> List[float]:
-        """Embebida una consulta"""
-        return self.model.encode([text])[0].tolist()
+        """Embebida una consulta (con caché LRU)"""
+        cached = self.query_cache.get(self._cache_namespace, text)
+        if cached is not None:
+            return list(cached)
+        
+        vector = self.model.encode([text])[0].tolist()
+        self.query_cache.put(self._cache_namespace, text, vector)
+        return vector
 
 class ChromaVectorStore:
     """Vector store optimizado para administraciones locales con ChromaDB"""
@@ -37,7 +151,14 @@ class ChromaVectorStore:
     def __init__(self, collection_name: str = "admin_local_docs"):
         self.collection_name = collection_name
         self.persist_directory = "vectorstore/chroma"
+        # Versión de la colección: se incrementa en cada escritura o borrado
+        # para invalidar cachés de resultados de búsqueda. Además se toca un
+        # archivo junto a ChromaDB para que las escrituras de otros procesos
+        # (reindexaciones por CLI) también invaliden la caché del servidor
+        self._local_version = 0
+        self._version_lock = threading.Lock()
         os.makedirs(self.persist_directory, exist_ok=True)
+        self._version_path = os.path.join(self.persist_directory, f"{collection_name}.version")
         
         # Configurar ChromaDB con persistencia
         self.client = chromadb.PersistentClient(
@@ -48,29 +169,49 @@ class ChromaVectorStore:
             )
         )
         
-        # Embeddings
-        self.embeddings = SentenceTransformerEmbeddings()
+        # Embeddings (con caché de consultas configurable en settings.json)
+        settings = load_settings()
+        cache_config = settings.get("embedding_cache", {})
+        batching_config = settings.get("embedding_batching", {})
+        self.embeddings = SentenceTransformerEmbeddings(
+            cache_size=cache_config.get("max_size", 1024),
+            cache_ttl=cache_config.get("ttl_seconds", 3600),
+            batch_size=batching_config.get("batch_size", 64)
+        )
         
         # LangChain Chroma wrapper
+        self._init_vectorstore()
+        
+        # Índice léxico BM25 persistido junto a ChromaDB
+        self.lexical_index = BM25Index(
+            os.path.join(os.path.dirname(self.persist_directory), "bm25", f"{collection_name}.pkl")
+        )
+        self._load_lexical_index()
+    
+    def _init_vectorstore(self):
+        """Crea el wrapper LangChain (y la colección si no existe)"""
         try:
             self.vectorstore = Chroma(
                 client=self.client,
-                collection_name=collection_name,
+                collection_name=self.collection_name,
                 embedding_function=self.embeddings,
                 persist_directory=self.persist_directory
             )
-            logger.info(f"✅ ChromaDB inicializado: {collection_name}")
+            logger.info(f"✅ ChromaDB inicializado: {self.collection_name}")
         except Exception as e:
             logger.error(f"❌ Error inicializando ChromaDB: {e}")
             raise
     
-    def add_documents(self, texts: List[str], metadatas: List[Dict] = None) -> List[str]:
+    def add_documents(self, texts: List[str], metadatas: List[Dict] = None,
+                      embeddings: Optional[List[List[float]]] = None) -> List[str]:
         """
         Añadir documentos con metadatos enriquecidos
         
         Args:
             texts: Lista de textos a indexar
             metadatas: Lista de diccionarios con metadatos
+            embeddings: Embeddings ya calculados (ej: por el pool multiproceso);
+                si se omiten se calculan aquí, reutilizando la caché de chunks
             
         Returns:
             Lista de IDs de documentos añadidos
@@ -82,25 +223,89 @@ class ChromaVectorStore:
         # Generar metadatos por defecto si no se proporcionan
         if metadatas is None:
             metadatas = [{"added_at": datetime.now().isoformat()} for _ in texts]
-        else:
-            # Enriquecer metadatos existentes
-            for metadata in metadatas:
-                if "added_at" not in metadata:
-                    metadata["added_at"] = datetime.now().isoformat()
-                if "id" not in metadata:
-                    metadata["id"] = str(uuid.uuid4())
+        
+        # Enriquecer metadatos; el id de metadatos es también el id en ChromaDB
+        for metadata in metadatas:
+            if "added_at" not in metadata:
+                metadata["added_at"] = datetime.now().isoformat()
+            if "id" not in metadata:
+                metadata["id"] = str(uuid.uuid4())
         
         try:
-            ids = self.vectorstore.add_texts(
-                texts=texts,
+            ids = [metadata["id"] for metadata in metadatas]
+            if embeddings is None:
+                embeddings = self.embeddings.embed_chunks(texts)
+            collection = self.client.get_collection(self.collection_name)
+            collection.add(
+                ids=ids,
+                embeddings=[list(map(float, e)) for e in embeddings],
+                documents=texts,
                 metadatas=metadatas
             )
+            self._bump_version()
+            self._update_lexical_index(ids, texts)
             logger.info(f"✅ Añadidos {len(ids)} documentos a ChromaDB")
             return ids
         except Exception as e:
             logger.error(f"❌ Error añadiendo documentos: {e}")
             return []
     
+    def upsert_documents(self, texts: List[str], metadatas: List[Dict], ids: List[str],
+                         embeddings: Optional[List[List[float]]] = None) -> List[str]:
+        """
+        Insertar o reemplazar documentos con ids deterministas (idempotente)
+        
+        Args:
+            texts: Lista de textos a indexar
+            metadatas: Lista de diccionarios con metadatos
+            ids: Ids estables de los documentos
+            embeddings: Embeddings ya calculados; si se omiten se calculan aquí
+            
+        Returns:
+            Lista de IDs escritos
+        """
+        if not texts:
+            return []
+        
+        now = datetime.now().isoformat()
+        for doc_id, metadata in zip(ids, metadatas):
+            metadata.setdefault("added_at", now)
+            metadata["id"] = doc_id
+        
+        try:
+            if embeddings is None:
+                embeddings = self.embeddings.embed_chunks(texts)
+            
+            collection = self.client.get_collection(self.collection_name)
+            collection.upsert(
+                ids=ids,
+                embeddings=[list(map(float, e)) for e in embeddings],
+                documents=texts,
+                metadatas=metadatas
+            )
+            self._bump_version()
+            self._update_lexical_index(ids, texts)
+            logger.info(f"✅ Upsert de {len(ids)} documentos en ChromaDB")
+            return list(ids)
+        except Exception as e:
+            logger.error(f"❌ Error en upsert de documentos: {e}")
+            return []
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """Eliminar documentos por id (también del índice BM25)"""
+        if not ids:
+            return 0
+        try:
+            collection = self.client.get_collection(self.collection_name)
+            collection.delete(ids=list(ids))
+            self.lexical_index.remove(list(ids))
+            self._bump_version()
+            logger.info(f"🗑️ Eliminados {len(ids)} documentos de ChromaDB")
+            return len(ids)
+        except Exception as e:
+            logger.error(f"❌ Error eliminando documentos: {e}")
+            return 0
+    
     def similarity_search(self, query: str, k: int = 5, filter_metadata: Dict = None) -> List[Dict]:
         """
         Búsqueda por similitud con filtros avanzados
@@ -111,28 +316,25 @@ class ChromaVectorStore:
             filter_metadata: Filtros para metadatos
             
         Returns:
-            Lista de documentos encontrados con metadatos
+            Lista de documentos encontrados con metadatos y distancia real
         """
-        try:
-            if filter_metadata:
-                results = self.vectorstore.similarity_search(
-                    query=query,
-                    k=k,
-                    filter=filter_metadata
-                )
-            else:
-                results = self.vectorstore.similarity_search(query, k=k)
+        return self.similarity_search_with_score(query, k=k, filter_metadata=filter_metadata)
+    
+    def similarity_search_with_score(self, query: str, k: int = 5, filter_metadata: Dict = None) -> List[Dict]:
+        """
+        Búsqueda por similitud devolviendo la distancia real de ChromaDB
+        
+        Args:
+            query: Consulta de búsqueda
+            k: Número de resultados a devolver
+            filter_metadata: Filtros para metadatos
             
-            # Convertir a formato estándar del sistema
-            formatted_results = []
-            for doc in results:
-                formatted_results.append({
-                    "texto": doc.page_content,
-                    "metadata": doc.metadata,
-                    "fuente": doc.metadata.get("document_type", "general"),
-                    "origen": doc.metadata.get("origen", "unknown"),
-                    "distancia": 0.0  # ChromaDB no expone distancia directamente
-                })
+        Returns:
+            Lista de documentos con "distancia" (L2 al cuadrado) y "similitud" (coseno)
+        """
+        try:
+            query_embedding = self.embeddings.embed_query(query)
+            formatted_results = self._query_collection([query_embedding], k, filter_metadata)[0]
             
             logger.info(f"🔍 Búsqueda completada: {len(formatted_results)} resultados")
             return formatted_results
@@ -141,6 +343,194 @@ class ChromaVectorStore:
             logger.error(f"❌ Error en búsqueda: {e}")
             return []
     
+    def similarity_search_batch(self, queries: List[str], k: int = 5, filter_metadata: Dict = None) -> List[List[Dict]]:
+        """
+        Búsqueda por similitud para varias consultas a la vez
+        
+        Calcula todos los embeddings en una sola pasada del modelo y lanza
+        una única consulta multi-query contra ChromaDB.
+        
+        Args:
+            queries: Lista de consultas de búsqueda
+            k: Número de resultados por consulta
+            filter_metadata: Filtros para metadatos (comunes a todas las consultas)
+            
+        Returns:
+            Lista de resultados por consulta, en el mismo orden que `queries`
+        """
+        if not queries:
+            return []
+        
+        try:
+            query_embeddings = self.embeddings.embed_documents(list(queries))
+            batch_results = self._query_collection(query_embeddings, k, filter_metadata)
+            
+            total = sum(len(r) for r in batch_results)
+            logger.info(f"🔍 Búsqueda por lotes completada: {len(queries)} consultas, {total} resultados")
+            return batch_results
+            
+        except Exception as e:
+            logger.error(f"❌ Error en búsqueda por lotes: {e}")
+            return [[] for _ in queries]
+    
+    def lexical_search(self, query: str, k: int = 5, filter_metadata: Dict = None,
+                       with_similarity: bool = False) -> List[Dict]:
+        """
+        Búsqueda léxica BM25 (no calcula embeddings salvo `with_similarity`)
+        
+        Args:
+            query: Consulta de búsqueda
+            k: Número de resultados a devolver
+            filter_metadata: Filtros para metadatos
+            with_similarity: Recupera los embeddings de los candidatos y calcula
+                su "distancia"/"similitud" con la consulta (búsqueda híbrida)
+            
+        Returns:
+            Lista de documentos con "bm25_score" (y "similitud" si se pide)
+        """
+        try:
+            # Con filtros se piden más candidatos porque parte se descartará
+            candidates = self.lexical_index.search(query, k=k * 4 if filter_metadata else k)
+            if not candidates:
+                return []
+            
+            scores = dict(candidates)
+            include = ["documents", "metadatas"] + (["embeddings"] if with_similarity else [])
+            collection = self.client.get_collection(self.collection_name)
+            results = collection.get(
+                ids=[doc_id for doc_id, _ in candidates],
+                where=filter_metadata if filter_metadata else None,
+                include=include
+            )
+            
+            distances = {}
+            embeddings = results.get("embeddings") if with_similarity else None
+            if embeddings is not None and len(embeddings):
+                query_vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+                matrix = np.asarray(embeddings, dtype="float32")
+                distances = dict(zip(results["ids"], ((matrix - query_vector) ** 2).sum(axis=1).tolist()))
+            
+            found = {}
+            for i, doc_id in enumerate(results.get("ids", [])):
+                metadatas = results.get("metadatas") or []
+                found[doc_id] = {
+                    **self._format_result(
+                        results["documents"][i] if results.get("documents") else "",
+                        metadatas[i] if i < len(metadatas) else {},
+                        distances.get(doc_id),
+                        doc_id
+                    ),
+                    "bm25_score": scores[doc_id]
+                }
+            
+            formatted_results = [found[doc_id] for doc_id, _ in candidates if doc_id in found][:k]
+            logger.info(f"🔤 Búsqueda léxica completada: {len(formatted_results)} resultados")
+            return formatted_results
+            
+        except Exception as e:
+            logger.error(f"❌ Error en búsqueda léxica: {e}")
+            return []
+    
+    def _query_collection(self, query_embeddings: List[List[float]], k: int,
+                          filter_metadata: Dict = None) -> List[List[Dict]]:
+        """Lanza una consulta (multi-query) sobre la colección y formatea los resultados"""
+        collection = self.client.get_collection(self.collection_name)
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=filter_metadata if filter_metadata else None,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        batch_results = []
+        for i in range(len(query_embeddings)):
+            ids = results.get("ids", [[]])[i] or []
+            documents = results.get("documents", [[]])[i] or []
+            metadatas = results.get("metadatas", [[]])[i] or []
+            distances = results.get("distances", [[]])[i] or []
+            
+            batch_results.append([
+                self._format_result(
+                    documents[j],
+                    metadatas[j] if j < len(metadatas) and metadatas[j] else {},
+                    distances[j] if j < len(distances) else 0.0,
+                    ids[j] if j < len(ids) else None
+                )
+                for j in range(len(documents))
+            ])
+        
+        return batch_results
+    
+    @staticmethod
+    def _format_result(texto: str, metadata: Dict, distancia: Optional[float],
+                       doc_id: Optional[str] = None) -> Dict:
+        """Convierte un resultado de ChromaDB al formato estándar del sistema"""
+        metadata = metadata or {}
+        return {
+            "id": doc_id or metadata.get("id"),
+            "texto": texto,
+            "metadata": metadata,
+            "fuente": metadata.get("document_type", "general"),
+            "origen": metadata.get("origen", "unknown"),
+            "distancia": float(distancia) if distancia is not None else None,
+            "similitud": distance_to_similarity(distancia) if distancia is not None else None
+        }
+    
+    def _load_lexical_index(self):
+        """
+        Carga el índice BM25 o lo reconstruye si no existe o no cuadra con la colección
+        
+        El índice se persiste al final de cada ingesta; si el proceso terminó
+        antes de guardarlo, el número de fragmentos no coincide y se reconstruye.
+        """
+        loaded = self.lexical_index.load()
+        try:
+            count = self.client.get_collection(self.collection_name).count()
+            if count != len(self.lexical_index):
+                if loaded:
+                    logger.warning(
+                        f"⚠️ Índice BM25 desactualizado ({len(self.lexical_index)} de {count} fragmentos)"
+                    )
+                self.rebuild_lexical_index()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo construir el índice BM25: {e}")
+        atexit.register(self.flush_lexical_index)
+    
+    def _update_lexical_index(self, ids: List[str], texts: List[str]):
+        """
+        Actualización incremental del índice BM25 tras añadir documentos
+        
+        Solo en memoria: la ingesta llama a flush_lexical_index al terminar.
+        """
+        try:
+            self.lexical_index.add(ids, texts)
+        except Exception as e:
+            logger.error(f"❌ Error actualizando índice BM25: {e}")
+    
+    def flush_lexical_index(self) -> bool:
+        """Persiste el índice BM25 si tiene cambios pendientes"""
+        try:
+            if self.lexical_index.flush():
+                logger.info(f"💾 Índice BM25 guardado: {len(self.lexical_index)} fragmentos")
+                return True
+        except Exception as e:
+            logger.error(f"❌ Error guardando índice BM25: {e}")
+        return False
+    
+    def rebuild_lexical_index(self, batch_size: int = 1000) -> int:
+        """Reconstruye el índice BM25 completo a partir de la colección"""
+        collection = self.client.get_collection(self.collection_name)
+        total = collection.count()
+        
+        self.lexical_index.clear()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(limit=batch_size, offset=offset, include=["documents"])
+            self.lexical_index.add(batch.get("ids", []), batch.get("documents") or [])
+        self.lexical_index.save()
+        
+        logger.info(f"📚 Índice BM25 reconstruido: {len(self.lexical_index)} fragmentos")
+        return len(self.lexical_index)
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Obtener estadísticas de la colección"""
         try:
@@ -159,7 +549,11 @@ class ChromaVectorStore:
                 "total_documents": count,
                 "collection_name": self.collection_name,
                 "metadata_fields": list(metadata_fields),
-                "persist_directory": self.persist_directory
+                "persist_directory": self.persist_directory,
+                "query_embedding_cache": self.embeddings.query_cache.stats(),
+                "chunk_embedding_cache": get_chunk_embedding_cache().stats(),
+                "lexical_index": self.lexical_index.stats(),
+                "embedding_models": get_embedding_registry_stats()
             }
             
             logger.info(f"📊 Estadísticas: {count} documentos, {len(metadata_fields)} campos metadata")
@@ -181,6 +575,38 @@ class ChromaVectorStore:
             logger.info(f"🗑️ Colección {self.collection_name} eliminada")
         except Exception as e:
             logger.error(f"❌ Error eliminando colección: {e}")
+        finally:
+            self.lexical_index.clear()
+            self.lexical_index.save()
+            self._bump_version()
+        
+        # Recrear colección vacía para que la instancia siga siendo utilizable
+        self._init_vectorstore()
+    
+    @property
+    def collection_version(self) -> Tuple[int, int]:
+        """
+        Versión de la colección: (escrituras en este proceso, marca del archivo de versión)
+
+        La marca es el mtime en ns del archivo que actualiza cada escritura,
+        de cualquier proceso; consultarla cuesta un stat por búsqueda.
+        """
+        try:
+            stamp = os.stat(self._version_path).st_mtime_ns
+        except OSError:
+            stamp = 0
+        return self._local_version, stamp
+
+    def _bump_version(self) -> Tuple[int, int]:
+        """Incrementa la versión de la colección (invalida cachés de búsqueda, también en otros procesos)"""
+        with self._version_lock:
+            self._local_version += 1
+            try:
+                with open(self._version_path, "w", encoding="utf-8") as f:
+                    f.write(f"{self._local_version} {os.getpid()} {datetime.now().isoformat()}\n")
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo actualizar la versión persistida de la colección: {e}")
+        return self.collection_version
     
     def search_by_metadata(self, metadata_filter: Dict, limit: int = 50) -> List[Dict]:
         """Buscar documentos solo por metadatos (sin query semántica)"""
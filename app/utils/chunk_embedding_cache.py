@@ -0,0 +1,171 @@
+"""
+Caché persistente de embeddings de chunks
+Clave: (modelo:backend, sha256 del texto del chunk) -> vector float32 en SQLite,
+para que un chunk sin cambios no se vuelva a embeber nunca (reindexaciones,
+migraciones FAISS -> ChromaDB, crawler web)
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join("vectorstore", "embedding_cache.sqlite")
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def embedding_namespace(model_name: str, backend: Optional[str] = None) -> str:
+    """
+    Espacio de claves del modelo: torch y ONNX int8 no dan vectores idénticos
+
+    Si el modelo ya está cargado en este proceso se usa el backend con el que
+    se cargó de verdad (el registro cae a torch si ONNX no está disponible):
+    cargar el modelo antes de pedir el namespace.
+    """
+    from app.utils.embedding_registry import embedding_registry
+    loaded = embedding_registry.loaded_backend(model_name, backend)
+    if loaded:
+        return f"{model_name}:{loaded}"
+    if backend is None:
+        from app.config.settings import get_embedding_backend
+        backend = get_embedding_backend()
+    return f"{model_name}:{backend}"
+
+class ChunkEmbeddingCache:
+    """Almacén SQLite (modo WAL) de vectores por (namespace, sha256 del texto)"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " namespace TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, text_hash))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, namespace: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Vectores encontrados para los hashes dados"""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connection()
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE namespace = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [namespace, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+        return found
+
+    def put_many(self, namespace: str, hashes: List[str], vectors: np.ndarray):
+        now = time.time()
+        rows = [
+            (namespace, key, int(vector.shape[0]), np.asarray(vector, dtype="float32").tobytes(), now)
+            for key, vector in zip(hashes, vectors)
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def embed(self, namespace: str, texts: List[str],
+              embed_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embeddings de `texts` en orden, calculando con `embed_fn` solo los que faltan
+
+        Los textos repetidos dentro del lote también se embeben una sola vez.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        if not self.enabled:
+            return np.asarray(embed_fn(texts), dtype="float32")
+
+        hashes = [text_hash(text) for text in texts]
+        try:
+            cached = self.get_many(namespace, hashes)
+        except Exception as e:
+            logger.warning(f"⚠️ Caché de embeddings no disponible: {e}")
+            cached = {}
+
+        missing = list(dict.fromkeys(key for key in hashes if key not in cached))
+        if missing:
+            first_text = dict(zip(reversed(hashes), reversed(texts)))
+            computed = np.asarray(embed_fn([first_text[key] for key in missing]), dtype="float32")
+            cached.update(zip(missing, computed))
+            try:
+                self.put_many(namespace, missing, computed)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudieron guardar embeddings en caché: {e}")
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        logger.info(f"🧠 Caché de embeddings: {len(texts) - len(missing)}/{len(texts)} chunks reutilizados")
+        return np.vstack([cached[key] for key in hashes])
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            conn = self._connection()
+            if namespace:
+                conn.execute("DELETE FROM embeddings WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM embeddings")
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        try:
+            with self._lock:
+                entries = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer la caché de embeddings: {e}")
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "size_mb": round(os.path.getsize(self.path) / (1024 * 1024), 2) if os.path.exists(self.path) else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+_cache_instance = None
+
+def get_chunk_embedding_cache() -> ChunkEmbeddingCache:
+    """Obtener instancia única (configuración "chunk_embedding_cache" de settings.json)"""
+    global _cache_instance
+    if _cache_instance is None:
+        from app.config.settings import load_settings
+        config = load_settings().get("chunk_embedding_cache", {})
+        _cache_instance = ChunkEmbeddingCache(
+            path=config.get("path", DEFAULT_CACHE_PATH),
+            enabled=config.get("enabled", True)
+        )
+    return _cache_instance
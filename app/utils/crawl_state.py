@@ -0,0 +1,157 @@
+"""
+Estado persistido del crawl web por URL (ETag, Last-Modified, hash del texto, chunks)
+Permite recrawls condicionales: las páginas que responden 304 o cuyo texto no
+ha cambiado no se vuelven a trocear ni embeber, y las eliminadas del sitio
+pierden sus vectores
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+CRAWL_STATE_PATH = os.path.join("vectorstore", "web", "crawl_state.json")
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def web_chunk_id(url: str, content_sha: str, chunk_offset: int) -> str:
+    """Id determinista de un fragmento web: URL + hash del texto + posición"""
+    url_sha = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return f"web-{url_sha[:12]}-{content_sha[:12]}-{chunk_offset:05d}"
+
+class CrawlState:
+    """Estado por URL persistido en JSON (mismo esquema de guardado que el manifiesto de documentos)"""
+
+    def __init__(self, path: str = CRAWL_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.existed = os.path.exists(path)
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Error cargando estado del crawl {self.path}: {e}")
+            return {}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+        self.save()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para la última versión vista"""
+        entry = self.entries.get(url)
+        if not entry or not entry.get("chunk_ids") or entry.get("reindex"):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def links(self, url: str) -> List[str]:
+        """Enlaces guardados de la página (para seguir el crawl tras un 304)"""
+        entry = self.entries.get(url)
+        return list(entry.get("links", [])) if entry else []
+
+    def update(self, url: str, content_sha: str, chunk_ids: List[str], links: List[str],
+               etag: Optional[str] = None, last_modified: Optional[str] = None,
+               suppressed_by: Optional[List[str]] = None):
+        """
+        Registra la versión indexada de una página
+
+        `suppressed_by`: ids de fragmentos de otras páginas contra los que se
+        descartaron fragmentos de esta por casi duplicados; si se eliminan,
+        la página debe reindexarse (ver `dependents`).
+        """
+        with self._lock:
+            self.entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content_sha256": content_sha,
+                "last_visit": datetime.now().isoformat(),
+                "num_fragmentos": len(chunk_ids),
+                "chunk_ids": chunk_ids,
+                "suppressed_by": sorted(set(suppressed_by or [])),
+                "links": sorted(links)
+            }
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+              links: Optional[List[str]] = None):
+        """Página visitada sin cambios: solo se actualizan la visita y los validadores"""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            entry["last_visit"] = datetime.now().isoformat()
+            if etag:
+                entry["etag"] = etag
+            if last_modified:
+                entry["last_modified"] = last_modified
+            if links is not None:
+                entry["links"] = sorted(links)
+
+    def remove(self, url: str) -> List[str]:
+        """Elimina la entrada y devuelve los ids de sus fragmentos"""
+        with self._lock:
+            entry = self.entries.pop(url, None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    def dependents(self, chunk_ids: Iterable[str]) -> List[str]:
+        """URLs con fragmentos descartados como casi duplicados de alguno de `chunk_ids`"""
+        chunk_ids = set(chunk_ids)
+        if not chunk_ids:
+            return []
+        return [url for url, entry in self.entries.items()
+                if chunk_ids.intersection(entry.get("suppressed_by", ()))]
+
+    def invalidate(self, url: str):
+        """Fuerza la reindexación de la página: sin validadores HTTP ni hash de contenido"""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            entry.update({"etag": None, "last_modified": None, "content_sha256": None, "reindex": True})
+
+    def pending_reindex(self, host: Optional[str] = None) -> List[str]:
+        """Páginas invalidadas que aún no se han vuelto a indexar"""
+        return [url for url, entry in self.entries.items()
+                if entry.get("reindex") and (host is None or urlparse(url).netloc == host)]
+
+    def urls_for_host(self, host: str) -> List[str]:
+        return [url for url in self.entries if urlparse(url).netloc == host]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+_state_instance = None
+
+def get_crawl_state() -> CrawlState:
+    """Obtener instancia única del estado del crawl"""
+    global _state_instance
+    if _state_instance is None:
+        _state_instance = CrawlState()
+    return _state_instance
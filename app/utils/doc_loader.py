@@ -1,10 +1,10 @@
 import os
 import json
 from pathlib import Path
-from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.docx import partition_docx
 from unstructured.partition.html import partition_html
-from PyPDF2 import PdfReader
+from app.utils.pdf_extractor import extract_pdf_text
+from app.utils.parsed_text_cache import get_parsed_text_cache, extractor_id
 
 SETTINGS_PATH = os.path.join("app", "config", "settings.json")
 
@@ -19,40 +19,45 @@ def leer_docx(path):
     return "\n".join([str(el) for el in elements])
 
 def leer_pdf(path):
+    # Capa de texto primero; unstructured solo para páginas vacías o ilegibles
     try:
-        elements = partition_pdf(filename=path)
-        return "\n".join([str(el) for el in elements])
+        return extract_pdf_text(str(path))
     except Exception as e:
-        print(f"⚠️ unstructured falló en {path}, usando PyPDF2: {e}")
-        try:
-            reader = PdfReader(path)
-            texto = ""
-            for pagina in reader.pages:
-                texto += pagina.extract_text() + "\n"
-            return texto
-        except Exception as e2:
-            print(f"❌ PyPDF2 también falló en {path}: {e2}")
-            return ""
+        print(f"❌ No se pudo extraer texto de {path}: {e}")
+        return ""
 
 def leer_html(path):
     elements = partition_html(filename=path)
     return "\n".join([str(el) for el in elements])
 
+def leer_con_cache(path, lector):
+    """Texto extraído con `lector`, reutilizando la caché persistente si el archivo no cambió"""
+    extractor = extractor_id(f"doc_loader-{lector.__name__}", 1)
+    return get_parsed_text_cache().get_or_extract(str(path), extractor, lambda: {"text": lector(path)})["text"]
+
 # --- Utilidad: partir texto en bloques ---
 
-def partir_en_bloques(texto, max_caracteres=500):
-    palabras = texto.split()
+def partir_en_bloques(texto, max_caracteres=500, chunker=None):
+    """
+    Divide el texto en bloques de hasta `max_caracteres`, o en ventanas de
+    tokens del modelo de embeddings si se pasa un TokenChunker
+    """
+    if chunker is not None:
+        return chunker.split_text(texto)
+
     bloques = []
-    bloque_actual = ""
-
-    for palabra in palabras:
-        if len(bloque_actual) + len(palabra) + 1 <= max_caracteres:
-            bloque_actual += " " + palabra
-        else:
-            bloques.append(bloque_actual.strip())
-            bloque_actual = palabra
+    bloque_actual = []
+    longitud = 0
+
+    for palabra in texto.split():
+        if bloque_actual and longitud + len(palabra) + 1 > max_caracteres:
+            bloques.append(" ".join(bloque_actual))
+            bloque_actual = []
+            longitud = 0
+        longitud += len(palabra) + (1 if bloque_actual else 0)
+        bloque_actual.append(palabra)
     if bloque_actual:
-        bloques.append(bloque_actual.strip())
+        bloques.append(" ".join(bloque_actual))
 
     return bloques
 
@@ -64,7 +69,7 @@ def cargar_config():
 
 # --- Función principal ---
 
-def cargar_documentos(carpetas):
+def cargar_documentos(carpetas, chunker=None):
     documentos = []
     for carpeta in carpetas:
         carpeta_path = Path(carpeta)
@@ -80,15 +85,15 @@ def cargar_documentos(carpetas):
                 if ruta.suffix.lower() == ".txt":
                     texto = leer_txt(ruta)
                 elif ruta.suffix.lower() == ".docx":
-                    texto = leer_docx(ruta)
+                    texto = leer_con_cache(ruta, leer_docx)
                 elif ruta.suffix.lower() == ".pdf":
-                    texto = leer_pdf(ruta)
+                    texto = leer_pdf(ruta)  # la caché la gestiona pdf_extractor
                 elif ruta.suffix.lower() == ".html":
-                    texto = leer_html(ruta)
+                    texto = leer_con_cache(ruta, leer_html)
                 else:
                     continue
 
-                bloques = partir_en_bloques(texto)
+                bloques = partir_en_bloques(texto, chunker=chunker)
                 documentos.append({
                     "nombre": ruta.name,
                     "ruta": str(ruta),
@@ -98,4 +103,5 @@ def cargar_documentos(carpetas):
                 print(f"❌ Error al procesar {ruta.name}: {e}")
                 continue
 
+    get_parsed_text_cache().enforce_limits()
     return documentos
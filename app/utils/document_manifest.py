@@ -0,0 +1,145 @@
+"""
+Manifiesto de documentos ingestados (ruta, mtime, tamaño, sha256, chunks)
+Permite reindexaciones incrementales e idempotentes: solo se procesan
+archivos nuevos o modificados y se eliminan los chunks de los borrados
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join("vectorstore", "document_manifest.json")
+
+# Estados de un archivo respecto al manifiesto
+FILE_NEW = "nuevo"
+FILE_CHANGED = "modificado"
+FILE_UNCHANGED = "sin_cambios"
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 del contenido del archivo (lectura por bloques)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(path: str, file_hash: str, chunk_offset: int) -> str:
+    """
+    Id determinista de un chunk: ruta normalizada + hash del archivo + posición
+
+    La ruta forma parte del id: dos copias idénticas en rutas distintas no
+    comparten chunks, así que borrar o editar una no afecta a la otra.
+    """
+    path_sha = hashlib.sha256(os.path.normcase(os.path.abspath(path)).encode("utf-8")).hexdigest()
+    return f"doc-{path_sha[:12]}-{file_hash[:24]}-{chunk_offset:05d}"
+
+class DocumentManifest:
+    """
+    Manifiesto persistido en JSON
+
+    Mantiene los campos de los antiguos document_checksums.json
+    (checksum, fecha_procesamiento, num_fragmentos) y añade mtime, tamaño
+    e ids de los chunks en ChromaDB.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Error cargando manifiesto {self.path}: {e}")
+            return {}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+        self.save()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def check(self, path: str) -> Tuple[str, Optional[str]]:
+        """
+        Compara un archivo con el manifiesto
+
+        mtime + tamaño iguales evitan recalcular el hash; si cambian, se
+        compara el sha256 (un `touch` no provoca reindexación).
+
+        Returns:
+            (estado, sha256 o None si no hizo falta calcularlo)
+        """
+        entry = self.entries.get(self._key(path))
+        stat = os.stat(path)
+
+        if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            return FILE_UNCHANGED, entry.get("sha256")
+
+        sha = file_sha256(path)
+        if entry is None:
+            return FILE_NEW, sha
+        if entry.get("sha256") == sha:
+            with self._lock:
+                entry["mtime"] = stat.st_mtime
+                entry["size"] = stat.st_size
+            return FILE_UNCHANGED, sha
+        return FILE_CHANGED, sha
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(self._key(path))
+
+    def update(self, path: str, sha: str, chunk_ids: List[str]):
+        stat = os.stat(path)
+        with self._lock:
+            self.entries[self._key(path)] = {
+                "checksum": sha,
+                "sha256": sha,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "fecha_procesamiento": datetime.now().isoformat(),
+                "num_fragmentos": len(chunk_ids),
+                "chunk_ids": chunk_ids
+            }
+
+    def remove(self, path: str) -> List[str]:
+        """Elimina la entrada y devuelve los ids de sus chunks"""
+        with self._lock:
+            entry = self.entries.pop(self._key(path), None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    def paths_under(self, folder_path: str) -> List[str]:
+        """Rutas registradas dentro de una carpeta"""
+        prefix = os.path.join(os.path.abspath(folder_path), "")
+        return [path for path in self.entries if path.startswith(prefix)]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+_manifest_instance = None
+
+def get_document_manifest() -> DocumentManifest:
+    """Obtener instancia única del manifiesto"""
+    global _manifest_instance
+    if _manifest_instance is None:
+        _manifest_instance = DocumentManifest()
+    return _manifest_instance
@@ -0,0 +1,158 @@
+"""
+Pool multiproceso de embeddings para reindexaciones grandes
+Reparte los chunks entre procesos trabajadores arrancados con spawn:
+el proceso padre tiene hilos (Flask, trabajos de ingesta) y torch/OpenMP
+cargados, y un fork en ese estado puede bloquear a los hijos
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+from app.utils.embedding_registry import get_embedding_model, embedding_registry
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada proceso trabajador
+_worker_model = None
+_worker_batch_size = 64
+_worker_backend = None
+
+def _init_worker(model_name: str, backend: Optional[str], threads: int, batch_size: int):
+    """Inicializa un trabajador: limita hilos de torch y obtiene el modelo del registro"""
+    global _worker_model, _worker_batch_size, _worker_backend
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+
+    # Cada trabajador carga su propia copia del modelo (proceso limpio con spawn)
+    _worker_model = get_embedding_model(model_name, device="cpu", backend=backend)
+    _worker_batch_size = batch_size
+    _worker_backend = embedding_registry.loaded_backend(model_name, backend)
+
+def _loaded_backend() -> Optional[str]:
+    """Tarea del trabajador: backend con el que cargó el modelo (torch si ONNX no está disponible)"""
+    return _worker_backend
+
+def _embed_chunk(texts: List[str]) -> np.ndarray:
+    """Tarea del trabajador: embebe un bloque de textos"""
+    embeddings = _worker_model.encode(texts, batch_size=_worker_batch_size, show_progress_bar=False)
+    return np.asarray(embeddings, dtype="float32")
+
+class EmbeddingProcessPool:
+    """Pool de procesos con cola de chunks acotada"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", workers: Optional[int] = None,
+                 chunk_size: int = 256, max_pending: Optional[int] = None,
+                 backend: Optional[str] = None, batch_size: int = 64):
+        self.model_name = model_name
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.chunk_size = chunk_size
+        # Bloques en vuelo como máximo: acota la memoria de la cola
+        self.max_pending = max_pending or self.workers * 2
+        self.backend = backend
+        self.batch_size = batch_size
+        self._executor = None
+        self._loaded_backend = None
+        self.stats: Dict[str, Any] = {"chunks": 0, "seconds": 0.0, "chunks_per_second": 0.0}
+
+    def start(self):
+        if self._executor is not None:
+            return self
+
+        # Nunca fork: el padre es multihilo y ya tiene torch/OpenMP inicializados
+        context = multiprocessing.get_context("spawn")
+
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.backend, threads, self.batch_size)
+        )
+        logger.info(
+            f"🚀 Pool de embeddings iniciado: {self.workers} procesos "
+            f"({context.get_start_method()}, {threads} hilos/proceso)"
+        )
+        return self
+
+    @property
+    def loaded_backend(self) -> str:
+        """
+        Backend con el que cargaron el modelo los trabajadores
+
+        Es el que debe formar el namespace de la caché de embeddings: puede
+        ser torch aunque se pidiera ONNX. Espera a que arranque un trabajador.
+        """
+        if self._loaded_backend is None:
+            self.start()
+            self._loaded_backend = self._executor.submit(_loaded_backend).result()
+        return self._loaded_backend
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def imap(self, texts: List[str], block_size: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Embebe `texts` en bloques y los entrega en orden a medida que terminan
+
+        Args:
+            texts: Textos a embeber
+            block_size: Textos por tarea; None = chunk_size
+
+        Yields:
+            (offset del bloque en `texts`, embeddings del bloque)
+        """
+        self.start()
+        start_time = time.time()
+        pending = deque()
+        block_size = block_size or self.chunk_size
+
+        for offset in range(0, len(texts), block_size):
+            if len(pending) >= self.max_pending:
+                done_offset, future = pending.popleft()
+                yield done_offset, future.result()
+            pending.append((offset, self._executor.submit(_embed_chunk, texts[offset:offset + block_size])))
+
+        while pending:
+            done_offset, future = pending.popleft()
+            yield done_offset, future.result()
+
+        self._record(len(texts), time.time() - start_time)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embebe todos los textos y devuelve la matriz completa en orden
+
+        Los bloques se reducen para que incluso un lote de escritura pequeño
+        (ingestion_flush_batch) se reparta entre todos los trabajadores.
+        """
+        block_size = max(1, min(self.chunk_size, -(-len(texts) // self.workers)))
+        parts = [embeddings for _, embeddings in self.imap(texts, block_size)]
+        parts = [p for p in parts if len(p)]
+        return np.vstack(parts) if parts else np.zeros((0, 0), dtype="float32")
+
+    def _record(self, chunks: int, seconds: float):
+        self.stats["chunks"] += chunks
+        self.stats["seconds"] = round(self.stats["seconds"] + seconds, 3)
+        if self.stats["seconds"] > 0:
+            self.stats["chunks_per_second"] = round(self.stats["chunks"] / self.stats["seconds"], 1)
+        logger.info(
+            f"⚡ Pool de embeddings: {chunks} chunks en {seconds:.2f}s "
+            f"({chunks / seconds if seconds > 0 else 0:.1f} chunks/s)"
+        )
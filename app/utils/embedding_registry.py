@@ -0,0 +1,205 @@
+"""
+Registro de modelos de embeddings compartido por todo el proceso
+Evita cargar varias copias de los mismos pesos (chat, ingesta, crawler)
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Backends soportados: PyTorch, ONNX Runtime y ONNX cuantizado a int8
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Directorio donde se cachean los modelos exportados a ONNX
+ONNX_EXPORT_DIR = os.path.join("models", "embeddings")
+
+class EmbeddingModelRegistry:
+    """Registro perezoso y thread-safe de SentenceTransformer por (modelo, dispositivo, backend)"""
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str, str], Any] = {}
+        self._info: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+    @staticmethod
+    def _resolve_device(device: Optional[str]) -> str:
+        if device:
+            return device
+        try:
+            import torch
+            return "cuda" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            return "cpu"
+
+    @staticmethod
+    def _resolve_backend(backend: Optional[str]) -> str:
+        if backend is None:
+            from app.config.settings import get_embedding_backend
+            backend = get_embedding_backend()
+        if backend not in EMBEDDING_BACKENDS:
+            logger.warning(f"⚠️ Backend de embeddings desconocido '{backend}', usando torch")
+            return "torch"
+        return backend
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL, device: Optional[str] = None,
+            backend: Optional[str] = None):
+        """Devuelve la instancia compartida, cargándola la primera vez"""
+        key = (model_name, self._resolve_device(device), self._resolve_backend(backend))
+
+        model = self._models.get(key)
+        if model is not None:
+            self._info[key]["requests"] += 1
+            return model
+
+        # Un lock por modelo: cargas de modelos distintos no se bloquean entre sí
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                logger.info(f"🔄 Cargando modelo de embeddings: {key[0]} ({key[1]}, {key[2]})")
+                start = time.time()
+                model, backend_used, model_path = self._load_model(*key)
+                load_time = time.time() - start
+
+                memory = self._model_memory_bytes(model) or self._onnx_file_bytes(model_path)
+                self._info[key] = {
+                    "model_name": key[0],
+                    "device": key[1],
+                    "backend": backend_used,
+                    "load_time_seconds": round(load_time, 3),
+                    "memory_mb": round(memory / (1024 * 1024), 2),
+                    "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "requests": 0
+                }
+                self._models[key] = model
+                logger.info(
+                    f"✅ Modelo {key[0]} cargado en {load_time:.2f}s "
+                    f"({self._info[key]['memory_mb']} MB)"
+                )
+
+            self._info[key]["requests"] += 1
+            return model
+
+    def _load_model(self, model_name: str, device: str, backend: str):
+        """
+        Carga el modelo con el backend pedido
+        
+        Los modelos ONNX se exportan una sola vez y se cachean en
+        models/embeddings/; si ONNX Runtime no está disponible se usa torch.
+        
+        Returns:
+            (modelo, backend usado, ruta del modelo exportado o None)
+        """
+        from sentence_transformers import SentenceTransformer
+
+        if backend == "torch":
+            return SentenceTransformer(model_name, device=device), "torch", None
+
+        export_dir = os.path.join(ONNX_EXPORT_DIR, f"{model_name.replace('/', '__')}-{backend}")
+        try:
+            if backend == "onnx":
+                if os.path.isdir(export_dir):
+                    return SentenceTransformer(export_dir, device=device, backend="onnx"), backend, export_dir
+
+                model = SentenceTransformer(model_name, device=device, backend="onnx")
+                model.save(export_dir)
+                logger.info(f"💾 Modelo ONNX exportado en {export_dir}")
+                return model, backend, export_dir
+
+            # onnx-int8: cuantización dinámica con la configuración de settings.json
+            from app.config.settings import get_embedding_onnx_quantization
+            quantization = get_embedding_onnx_quantization()
+            file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+            if not os.path.exists(os.path.join(export_dir, file_name)):
+                from sentence_transformers import export_dynamic_quantized_onnx_model
+
+                model = SentenceTransformer(model_name, device=device, backend="onnx")
+                model.save(export_dir)
+                export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+                logger.info(f"💾 Modelo ONNX int8 ({quantization}) exportado en {export_dir}")
+
+            model = SentenceTransformer(
+                export_dir, device=device, backend="onnx",
+                model_kwargs={"file_name": file_name}
+            )
+            return model, backend, os.path.join(export_dir, file_name)
+
+        except Exception as e:
+            logger.warning(f"⚠️ Backend {backend} no disponible ({e}), usando torch")
+            return SentenceTransformer(model_name, device=device), "torch", None
+
+    @staticmethod
+    def _onnx_file_bytes(model_path: Optional[str]) -> int:
+        """Tamaño en disco del modelo ONNX (aproxima su huella en memoria)"""
+        if not model_path:
+            return 0
+        if os.path.isfile(model_path):
+            return os.path.getsize(model_path)
+        onnx_file = os.path.join(model_path, "onnx", "model.onnx")
+        return os.path.getsize(onnx_file) if os.path.exists(onnx_file) else 0
+
+    @staticmethod
+    def _model_memory_bytes(model) -> int:
+        """Memoria ocupada por parámetros y buffers del modelo"""
+        try:
+            params = sum(p.numel() * p.element_size() for p in model.parameters())
+            buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+            return params + buffers
+        except Exception:
+            return 0
+
+    def loaded_backend(self, model_name: str, backend: Optional[str] = None) -> Optional[str]:
+        """
+        Backend con el que se cargó realmente el modelo pedido con `backend`
+
+        Puede diferir del pedido (torch si ONNX Runtime no está disponible);
+        None si el modelo aún no se ha cargado en este proceso.
+        """
+        backend = self._resolve_backend(backend)
+        for (name, _, requested), info in list(self._info.items()):
+            if name == model_name and requested == backend:
+                return info["backend"]
+        return None
+
+    def unload(self, model_name: str, device: Optional[str] = None, backend: Optional[str] = None) -> bool:
+        """Libera un modelo del registro"""
+        key = (model_name, self._resolve_device(device), self._resolve_backend(backend))
+        with self._lock:
+            self._info.pop(key, None)
+            return self._models.pop(key, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Modelos cargados, huella de memoria y tiempos de carga"""
+        models = [dict(info) for info in self._info.values()]
+        return {
+            "loaded_models": len(models),
+            "total_memory_mb": round(sum(m["memory_mb"] for m in models), 2),
+            "models": models
+        }
+
+# Instancia global (patrón singleton)
+embedding_registry = EmbeddingModelRegistry()
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL, device: Optional[str] = None,
+                        backend: Optional[str] = None):
+    """
+    Obtener el SentenceTransformer compartido para (modelo, dispositivo, backend)
+    
+    backend: "torch", "onnx" u "onnx-int8"; None = "embedding_backend" de settings.json
+    """
+    return embedding_registry.get(model_name, device, backend)
+
+def get_embedding_registry_stats() -> Dict[str, Any]:
+    """Estadísticas del registro de modelos de embeddings"""
+    return embedding_registry.stats()
@@ -5,8 +5,10 @@ import pickle
 import numpy as np
 import faiss
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
 from app.utils import doc_loader
+from app.utils.embedding_registry import get_embedding_model
+from app.utils.token_chunker import get_token_chunker
+from app.utils.chunk_embedding_cache import get_chunk_embedding_cache, embedding_namespace
 
 CONFIG_PATH = os.path.join("app", "config", "settings.json")
 VECTOR_DIR = os.path.join("vectorstore", "documents")
@@ -35,8 +37,10 @@ def main():
         logging.warning("⚠️ No hay carpetas configuradas en settings.json")
         return
 
-    modelo = SentenceTransformer(modelo_nombre)
-    documentos = doc_loader.cargar_documentos(carpetas)
+    modelo = get_embedding_model(modelo_nombre)
+    cache = get_chunk_embedding_cache()
+    namespace = embedding_namespace(modelo_nombre)
+    documentos = doc_loader.cargar_documentos(carpetas, chunker=get_token_chunker(modelo_nombre))
 
     if not documentos:
         logging.warning("⚠️ No se cargaron documentos desde las carpetas configuradas")
@@ -54,7 +58,8 @@ def main():
             logging.warning(f"⚠️ Documento sin fragmentos: {doc['nombre']}")
             continue
 
-        embeddings = modelo.encode(bloques, show_progress_bar=False)
+        embeddings = cache.embed(namespace, bloques,
+                                 lambda textos: modelo.encode(textos, show_progress_bar=False))
         all_embeddings.extend(embeddings)
 
         metadatos.extend([{
@@ -78,7 +83,12 @@ def main():
     with open(os.path.join(VECTOR_DIR, "metadatos.pkl"), "wb") as f:
         pickle.dump(metadatos, f)
 
+    cache_stats = cache.stats()
     logging.info(f"✅ Ingesta completada. Total fragmentos: {total_fragmentos}")
+    logging.info(
+        f"🧠 Caché de embeddings: {cache_stats['hits']} reutilizados, "
+        f"{cache_stats['misses']} calculados (hit ratio {cache_stats['hit_ratio']})"
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
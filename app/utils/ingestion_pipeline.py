@@ -0,0 +1,145 @@
+"""
+Pipeline de ingesta en streaming con memoria acotada
+descubrir → parsear → clasificar → chunkear → embeber → escribir
+
+Las etapas se conectan con colas acotadas y la escritura se hace en lotes
+de tamaño fijo, de modo que la memoria no crece con el tamaño del corpus
+y los primeros fragmentos son buscables antes de terminar la carpeta.
+"""
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+from app.utils.chunk_embedding_cache import get_chunk_embedding_cache, embedding_namespace
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()
+
+def background_iter(iterable: Iterable, maxsize: int = 8) -> Iterator:
+    """
+    Consume `iterable` en un hilo productor y entrega sus elementos por una cola acotada
+
+    El productor se bloquea cuando la cola está llena (contrapresión) y las
+    excepciones se relanzan en el consumidor. Si el consumidor abandona el
+    iterador, el productor se detiene en el siguiente elemento.
+    """
+    items = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+            _put(_FIN)
+        except BaseException as e:
+            _put(e)
+
+    thread = threading.Thread(target=_producer, name="ingestion-producer", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _FIN:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+@dataclass
+class FileChunks:
+    """Chunks de un archivo listos para escribir"""
+    path: str
+    sha256: str
+    texts: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+
+class IngestionWriter:
+    """
+    Etapa final: acumula chunks de varios archivos y los escribe en lotes
+
+    Un archivo solo se registra en el manifiesto cuando todos sus chunks se
+    han escrito, y sus chunks antiguos se borran después del upsert (el
+    contenido previo sigue siendo buscable hasta que llega el nuevo).
+    """
+
+    def __init__(self, store, manifest, flush_size: int = 256, pool=None):
+        self.store = store
+        self.manifest = manifest
+        self.flush_size = max(1, flush_size)
+        self.pool = pool
+        self._pending: List[FileChunks] = []
+        self._pending_chunks = 0
+        self.stats = {"fragmentos": 0, "lotes": 0, "archivos_procesados": 0,
+                      "archivos_con_error": 0, "chunks_eliminados": 0}
+
+    def add(self, file_chunks: FileChunks):
+        self._pending.append(file_chunks)
+        self._pending_chunks += len(file_chunks.ids)
+        if self._pending_chunks >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Escribe los chunks pendientes y actualiza el manifiesto"""
+        if not self._pending:
+            return
+
+        files, self._pending, self._pending_chunks = self._pending, [], 0
+        texts = [text for f in files for text in f.texts]
+        metadatas = [metadata for f in files for metadata in f.metadatas]
+        ids = [doc_id for f in files for doc_id in f.ids]
+
+        written = 0
+        try:
+            embeddings = None
+            if self.pool is not None:
+                # Solo los chunks que no están en la caché persistente van al pool,
+                # repartidos entre todos sus trabajadores
+                namespace = embedding_namespace(self.pool.model_name, self.pool.loaded_backend)
+                embeddings = get_chunk_embedding_cache().embed(namespace, texts, self.pool.embed)
+            for start in range(0, len(texts), self.flush_size):
+                end = start + self.flush_size
+                written += len(self.store.upsert_documents(
+                    texts[start:end], metadatas[start:end], ids[start:end],
+                    embeddings=embeddings[start:end] if embeddings is not None else None
+                ))
+        except Exception as e:
+            logger.error(f"❌ Error escribiendo lote de {len(ids)} fragmentos: {e}")
+
+        self.stats["fragmentos"] += written
+        self.stats["lotes"] += 1
+
+        if written != len(ids):
+            # No se registran en el manifiesto: se reintentarán en la próxima ingesta
+            self.stats["archivos_con_error"] += len(files)
+            logger.warning(f"⚠️ Lote incompleto ({written}/{len(ids)} fragmentos), {len(files)} archivos pendientes")
+            return
+
+        for f in files:
+            previous = self.manifest.get(f.path)
+            if previous:
+                obsolete = set(previous.get("chunk_ids", [])) - set(f.ids)
+                self.stats["chunks_eliminados"] += self.store.delete_documents(list(obsolete))
+            self.manifest.update(f.path, f.sha256, f.ids)
+            self.stats["archivos_procesados"] += 1
+        self.manifest.save()
+
+        logger.info(
+            f"💾 Lote escrito: {written} fragmentos de {len(files)} archivos "
+            f"(total {self.stats['fragmentos']})"
+        )
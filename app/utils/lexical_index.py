@@ -0,0 +1,261 @@
+"""
+Índice léxico BM25 en memoria sobre los fragmentos de ChromaDB
+Permite responder consultas exactas (artículos, expedientes, referencias)
+sin calcular embeddings y fusionar rankings léxicos y vectoriales
+"""
+import os
+import re
+import math
+import heapq
+import pickle
+import logging
+import threading
+import unicodedata
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Palabras vacías frecuentes en español (no aportan a la relevancia léxica)
+SPANISH_STOPWORDS = {
+    "a", "al", "ante", "con", "de", "del", "desde", "el", "en", "entre", "es",
+    "la", "las", "lo", "los", "o", "para", "por", "que", "se", "sin", "sobre",
+    "su", "sus", "un", "una", "uno", "unos", "unas", "y", "e", "u", "como",
+    "mi", "me", "le", "les", "cual", "cuales", "donde", "cuando", "esta", "este"
+}
+
+# Tokens que conservan separadores internos (ej: "2023/0045", "12.345", "b-12")
+TOKEN_PATTERN = re.compile(r"[a-z0-9ñ]+(?:[./\-][a-z0-9ñ]+)*")
+
+# Consultas identificadoras: número de expediente, artículo, referencia normativa
+IDENTIFIER_PATTERN = re.compile(
+    r"^\s*(?:(?:exp(?:ediente)?\.?|art(?:[íi]culo)?\.?|ref(?:erencia)?\.?|n[º°o]\.?|"
+    r"decreto|resoluci[óo]n|ley)\s*)?[a-z]{0,4}[\-\s]?\d+(?:[./\-]\d+)*\s*$",
+    re.IGNORECASE
+)
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes (conserva la ñ)"""
+    text = (text or "").lower().replace("ñ", "\x00")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.replace("\x00", "ñ")
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza texto para BM25"""
+    return [
+        token for token in TOKEN_PATTERN.findall(normalize_text(text))
+        if token not in SPANISH_STOPWORDS
+    ]
+
+def is_identifier_query(query: str) -> bool:
+    """Detecta consultas que son un identificador exacto (vía rápida léxica)"""
+    return bool(IDENTIFIER_PATTERN.match(query or ""))
+
+class BM25Index:
+    """Índice invertido BM25 compacto, persistido junto a ChromaDB"""
+
+    def __init__(self, index_path: str, k1: float = 1.5, b: float = 0.75):
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # Postings: término -> {posición_doc: frecuencia}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_lengths: List[int] = []
+        # Términos de cada documento: el borrado solo toca sus postings
+        self.doc_terms: List[Tuple[str, ...]] = []
+        self.id_to_pos: Dict[str, int] = {}
+        self.total_length = 0
+        self.active_docs = 0
+        # Cambios sin persistir (se guardan una vez al final de la ingesta)
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return self.active_docs
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.active_docs if self.active_docs else 0.0
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Añade (o reemplaza) documentos al índice"""
+        with self._lock:
+            replaced = [doc_id for doc_id in ids if doc_id in self.id_to_pos]
+            if replaced:
+                self.remove(replaced)
+
+            for doc_id, text in zip(ids, texts):
+                tokens = tokenize(text)
+                pos = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.doc_lengths.append(len(tokens))
+                self.id_to_pos[doc_id] = pos
+                self.total_length += len(tokens)
+                self.active_docs += 1
+
+                frequencies: Dict[str, int] = {}
+                for token in tokens:
+                    frequencies[token] = frequencies.get(token, 0) + 1
+                for token, tf in frequencies.items():
+                    self.postings.setdefault(token, {})[pos] = tf
+                self.doc_terms.append(tuple(frequencies))
+
+            if ids:
+                self.dirty = True
+
+    def remove(self, ids: List[str]):
+        """Elimina documentos del índice (la posición queda vacía hasta compactar)"""
+        with self._lock:
+            positions = [self.id_to_pos.pop(doc_id) for doc_id in ids if doc_id in self.id_to_pos]
+            if not positions:
+                return
+
+            for pos in positions:
+                self.total_length -= self.doc_lengths[pos]
+                self.doc_lengths[pos] = 0
+                self.doc_ids[pos] = None
+                self.active_docs -= 1
+
+                for term in self.doc_terms[pos]:
+                    docs = self.postings.get(term)
+                    if docs is None:
+                        continue
+                    docs.pop(pos, None)
+                    if not docs:
+                        del self.postings[term]
+                self.doc_terms[pos] = ()
+
+            self.dirty = True
+
+    def compact(self):
+        """Renumera las posiciones activas eliminando las que dejó `remove`"""
+        with self._lock:
+            if len(self.doc_ids) == self.active_docs:
+                return
+
+            new_pos: Dict[int, int] = {}
+            doc_ids, doc_lengths, doc_terms = [], [], []
+            for pos, doc_id in enumerate(self.doc_ids):
+                if doc_id is None:
+                    continue
+                new_pos[pos] = len(doc_ids)
+                doc_ids.append(doc_id)
+                doc_lengths.append(self.doc_lengths[pos])
+                doc_terms.append(self.doc_terms[pos])
+
+            self.postings = {
+                term: {new_pos[pos]: tf for pos, tf in docs.items()}
+                for term, docs in self.postings.items()
+            }
+            self.doc_ids = doc_ids
+            self.doc_lengths = doc_lengths
+            self.doc_terms = doc_terms
+            self.id_to_pos = {doc_id: pos for pos, doc_id in enumerate(doc_ids)}
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Devuelve [(id, puntuación BM25)] ordenado de mayor a menor"""
+        terms = tokenize(query)
+        if not terms or not self.active_docs:
+            return []
+
+        with self._lock:
+            avg_length = self.avg_length or 1.0
+            scores: Dict[int, float] = {}
+
+            for term in set(terms):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+
+                df = len(docs)
+                idf = math.log(1 + (self.active_docs - df + 0.5) / (df + 0.5))
+
+                for pos, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[pos] / avg_length)
+                    scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self.doc_ids[pos], round(score, 4)) for pos, score in best]
+
+    def save(self):
+        """Compacta y persiste el índice en disco"""
+        with self._lock:
+            self.compact()
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({
+                    "postings": self.postings,
+                    "doc_ids": self.doc_ids,
+                    "doc_lengths": self.doc_lengths,
+                    "doc_terms": self.doc_terms,
+                    "total_length": self.total_length,
+                    "active_docs": self.active_docs
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+    def flush(self) -> bool:
+        """Persiste el índice solo si ha cambiado desde el último guardado"""
+        with self._lock:
+            if not self.dirty:
+                return False
+            self.save()
+            return True
+
+    def load(self) -> bool:
+        """Carga el índice desde disco; False si no existe o está corrupto"""
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "rb") as f:
+                data = pickle.load(f)
+            with self._lock:
+                self.postings = data["postings"]
+                self.doc_ids = data["doc_ids"]
+                self.doc_lengths = data["doc_lengths"]
+                self.total_length = data["total_length"]
+                self.active_docs = data["active_docs"]
+                self.doc_terms = data.get("doc_terms") or self._terms_from_postings()
+                self.id_to_pos = {
+                    doc_id: pos for pos, doc_id in enumerate(self.doc_ids) if doc_id is not None
+                }
+                self.dirty = False
+            logger.info(f"📚 Índice BM25 cargado: {self.active_docs} fragmentos, {len(self.postings)} términos")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error cargando índice BM25: {e}")
+            self.clear()
+            return False
+
+    def _terms_from_postings(self) -> List[Tuple[str, ...]]:
+        """Reconstruye los términos por documento (índices guardados sin "doc_terms")"""
+        terms: List[List[str]] = [[] for _ in self.doc_ids]
+        for term, docs in self.postings.items():
+            for pos in docs:
+                terms[pos].append(term)
+        return [tuple(t) for t in terms]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.active_docs,
+            "terms": len(self.postings),
+            "avg_length": round(self.avg_length, 1),
+            "index_path": self.index_path
+        }
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fusiona varios rankings de ids con Reciprocal Rank Fusion"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -96,7 +96,8 @@ class MetricsEvaluator:
                                  query_text: str, 
                                  model_name: str,
                                  rag_function,
-                                 llm_function) -> QueryMetrics:
+                                 llm_function,
+                                 fragmentos_precalculados: Optional[List[Dict]] = None) -> QueryMetrics:
         """Mide el rendimiento de una consulta completa"""
         
         query_id = self.generate_query_id(query_text, model_name)
@@ -105,8 +106,11 @@ class MetricsEvaluator:
         error_message = None
         
         try:
-            # Recuperar fragmentos RAG
-            fragmentos = rag_function(query_text, k=5)
+            # Recuperar fragmentos RAG (o reutilizar los obtenidos por lotes)
+            if fragmentos_precalculados is not None:
+                fragmentos = fragmentos_precalculados
+            else:
+                fragmentos = rag_function(query_text, k=5)
             fragments_retrieved = len(fragmentos)
             fragments_sources = [f.get('fuente', 'unknown') for f in fragmentos]
             document_types_used = list(set([f.get('document_type', 'unknown') for f in fragmentos]))
@@ -214,6 +218,41 @@ Respuesta:"""
         self._save_comparison(comparison)
         return comparison
     
+    def evaluate_queries_batch(self,
+                               queries: List[str],
+                               model_name: str,
+                               llm_function,
+                               batch_rag_function=None,
+                               k: int = 5) -> List[QueryMetrics]:
+        """
+        Evalúa un conjunto de consultas recuperando todos los fragmentos en un lote
+        
+        La recuperación RAG se hace con una única llamada por lotes que aplica
+        el mismo modo, corte de similitud y caché que /chat (en modo "vector",
+        un solo encode y una sola petición a ChromaDB); después se mide cada
+        consulta.
+        """
+        if batch_rag_function is None:
+            from app.utils.rag_utils import buscar_fragmentos_batch
+            batch_rag_function = buscar_fragmentos_batch
+        
+        batch_start = time.time()
+        batch_fragmentos = batch_rag_function(queries, k=k)
+        retrieval_share = (time.time() - batch_start) / len(queries) if queries else 0.0
+        
+        results = []
+        for query_text, fragmentos in zip(queries, batch_fragmentos):
+            metrics = self.measure_query_performance(
+                query_text, model_name, None, llm_function,
+                fragmentos_precalculados=fragmentos
+            )
+            # Imputar la parte proporcional del tiempo de recuperación por lotes
+            metrics.latency_seconds += retrieval_share
+            self._save_metrics(metrics)
+            results.append(metrics)
+        
+        return results
+    
     def _save_comparison(self, comparison: ComparisonResult):
         """Guarda comparación en la base de datos"""
         conn = sqlite3.connect(self.db_path)
@@ -0,0 +1,174 @@
+"""
+Caché persistente de texto extraído (PDF, DOCX, HTML...)
+Clave: sha256 del contenido del archivo + versión del extractor, de modo que
+cambiar el chunking no obliga a volver a parsear todo el corpus
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+from app.utils.document_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join("vectorstore", "parsed_cache")
+
+def extractor_id(name: str, version: int, config: Optional[Dict[str, Any]] = None) -> str:
+    """Identificador del extractor; incluye un hash de la configuración que afecta al texto"""
+    if not config:
+        return f"{name}-v{version}"
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"{name}-v{version}-{digest}"
+
+class ParsedTextCache:
+    """
+    Entradas JSON comprimidas con gzip en <cache_dir>/<sha[:2]>/<sha>-<extractor>.json.gz
+
+    La escritura es atómica (archivo temporal + rename), así que varios
+    procesos de ingesta pueden compartir la caché. Los aciertos actualizan el
+    mtime de la entrada; la limpieza elimina primero las menos usadas.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_mb: float = 2048,
+                 max_age_days: float = 0, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _entry_path(self, sha: str, extractor: str) -> str:
+        return os.path.join(self.cache_dir, sha[:2], f"{sha}-{extractor}.json.gz")
+
+    def get(self, sha: str, extractor: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        path = self._entry_path(sha, extractor)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(path)  # marca de uso para la limpieza LRU
+            with self._lock:
+                self.hits += 1
+            return payload
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada de caché ilegible {path}: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, sha: str, extractor: str, payload: Dict[str, Any]):
+        if not self.enabled:
+            return
+        path = self._entry_path(sha, extractor)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.writes += 1
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar en caché {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_or_extract(self, path: str, extractor: str, extract: Callable[[], Dict[str, Any]],
+                       sha: Optional[str] = None) -> Dict[str, Any]:
+        """Devuelve el contenido cacheado o lo extrae con `extract()` y lo guarda"""
+        if not self.enabled:
+            return extract()
+        sha = sha or file_sha256(path)
+        payload = self.get(sha, extractor)
+        if payload is None:
+            payload = extract()
+            self.put(sha, extractor, payload)
+        return payload
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def enforce_limits(self) -> int:
+        """Elimina entradas caducadas y, si se supera el tamaño máximo, las menos usadas"""
+        entries = sorted(self._entries())
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+            if not expired and total <= self.max_size_bytes:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            logger.info(f"🧹 Caché de texto: {removed} entradas eliminadas ({total / (1024 * 1024):.1f} MB)")
+        return removed
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(entries),
+                "size_mb": round(sum(size for _, size, _ in entries) / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+_cache_instance = None
+
+def get_parsed_text_cache() -> ParsedTextCache:
+    """Obtener instancia única de la caché (configuración "parsed_text_cache" de settings.json)"""
+    global _cache_instance
+    if _cache_instance is None:
+        from app.config.settings import load_settings
+        config = load_settings().get("parsed_text_cache", {})
+        _cache_instance = ParsedTextCache(
+            cache_dir=config.get("path", DEFAULT_CACHE_DIR),
+            max_size_mb=config.get("max_size_mb", 2048),
+            max_age_days=config.get("max_age_days", 0),
+            enabled=config.get("enabled", True)
+        )
+    return _cache_instance
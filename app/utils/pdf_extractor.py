@@ -0,0 +1,225 @@
+"""
+Extracción de texto de PDF por niveles
+1) Capa de texto con PyPDF2, página a página (rápida; en paralelo para PDFs grandes)
+2) Parser de maquetación de unstructured solo para las páginas cuyo texto
+   sale vacío (escaneadas) o ilegible (codificaciones rotas, (cid:NN), sin espacios)
+"""
+import os
+import time
+import logging
+import tempfile
+import importlib.util
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.utils.document_manifest import file_sha256
+from app.utils.parsed_text_cache import get_parsed_text_cache, extractor_id
+
+logger = logging.getLogger(__name__)
+
+# Incrementar al cambiar la lógica de extracción (invalida la caché de texto)
+PDF_EXTRACTOR_VERSION = 1
+
+PAGE_OK = "ok"
+PAGE_EMPTY = "vacia"
+PAGE_GARBLED = "ilegible"
+
+DEFAULT_PDF_CONFIG = {
+    "min_chars_per_page": 20,
+    "min_alnum_ratio": 0.5,
+    "max_word_length": 25,
+    "parallel_min_pages": 40,
+    "workers": 0
+}
+
+def _pdf_config() -> Dict[str, Any]:
+    from app.config.settings import load_settings
+    return {**DEFAULT_PDF_CONFIG, **load_settings().get("pdf_extraction", {})}
+
+def _layout_parser_available() -> bool:
+    """unstructured instalado (sin él las páginas problemáticas se quedan en el nivel 1)"""
+    return importlib.util.find_spec("unstructured") is not None
+
+def page_quality(text: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Clasifica el texto extraído de una página: ok, vacía o ilegible"""
+    config = config or DEFAULT_PDF_CONFIG
+    visible = len(text) - sum(map(str.isspace, text))
+    if visible < config["min_chars_per_page"]:
+        return PAGE_EMPTY
+
+    # Glifos sin mapeo Unicode: "(cid:12)" o carácter de reemplazo
+    broken = text.count("\ufffd") + 6 * text.count("(cid:")
+    alnum = sum(map(str.isalnum, text))
+    words = len(text.split())
+    if (broken / visible > 0.05
+            or alnum / visible < config["min_alnum_ratio"]
+            or visible / max(1, words) > config["max_word_length"]):
+        return PAGE_GARBLED
+    return PAGE_OK
+
+def _extract_pages_fast(path: str, start: int, end: int) -> List[str]:
+    """Nivel 1: capa de texto de las páginas [start, end)"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    pages = []
+    for number in range(start, end):
+        try:
+            pages.append(reader.pages[number].extract_text() or "")
+        except Exception as e:
+            logger.debug(f"Página {number + 1} de {path} sin capa de texto: {e}")
+            pages.append("")
+    return pages
+
+def _extract_pages_layout(path: str, page_numbers: List[int], total_pages: int) -> Dict[int, str]:
+    """
+    Nivel 2: parser de maquetación (unstructured) solo sobre las páginas indicadas
+
+    Las páginas se copian a un PDF temporal para no procesar el documento entero.
+    """
+    from unstructured.partition.pdf import partition_pdf
+
+    temp_path = None
+    try:
+        if len(page_numbers) == total_pages:
+            elements = partition_pdf(filename=path)
+        else:
+            from PyPDF2 import PdfReader, PdfWriter
+            reader = PdfReader(path)
+            writer = PdfWriter()
+            for number in page_numbers:
+                writer.add_page(reader.pages[number])
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                writer.write(tmp)
+                temp_path = tmp.name
+            elements = partition_pdf(filename=temp_path)
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    texts = defaultdict(list)
+    for element in elements:
+        page = getattr(element.metadata, "page_number", None) or 1
+        if 1 <= page <= len(page_numbers):
+            texts[page_numbers[page - 1]].append(str(element))
+    return {number: "\n".join(parts) for number, parts in texts.items()}
+
+def _fast_pass(path: str, total_pages: int, config: Dict[str, Any]) -> Tuple[List[str], bool]:
+    """Nivel 1 completo; reparte rangos de páginas entre procesos si el PDF es grande"""
+    workers = config["workers"] or os.cpu_count() or 1
+    # Dentro de un worker de ingesta ya se usan todos los núcleos: no anidar pools
+    nested = multiprocessing.parent_process() is not None
+    if total_pages < config["parallel_min_pages"] or workers <= 1 or nested:
+        return _extract_pages_fast(path, 0, total_pages), False
+
+    workers = min(workers, total_pages)
+    step = -(-total_pages // workers)
+    ranges = [(start, min(total_pages, start + step)) for start in range(0, total_pages, step)]
+    try:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            parts = executor.map(_extract_pages_fast, [path] * len(ranges),
+                                 [r[0] for r in ranges], [r[1] for r in ranges])
+            return [page for part in parts for page in part], True
+    except Exception as e:
+        logger.warning(f"⚠️ Extracción paralela fallida en {path} ({e}), usando un solo proceso")
+        return _extract_pages_fast(path, 0, total_pages), False
+
+def extract_pdf_pages(path: str, sha: Optional[str] = None) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Texto por página con escalado por niveles
+    
+    Consulta primero la caché de texto extraído (clave: sha256 del PDF +
+    versión y configuración del extractor)
+
+    Returns:
+        (texto de cada página, estadísticas con páginas y segundos por nivel)
+    """
+    config = _pdf_config()
+    cache = get_parsed_text_cache()
+    # La disponibilidad del parser de maquetación forma parte de la clave:
+    # al instalar unstructured las páginas que no pudo escalar se reprocesan
+    layout_available = _layout_parser_available()
+    extractor = extractor_id("pdf-tiered", PDF_EXTRACTOR_VERSION, {**config, "layout": layout_available})
+    sha = sha or (file_sha256(path) if cache.enabled else None)
+
+    cached = cache.get(sha, extractor) if sha else None
+    if cached is not None:
+        logger.info(f"📄 PDF {os.path.basename(path)}: {len(cached['pages'])} páginas desde caché")
+        return cached["pages"], {**cached["stats"], "cached": True}
+
+    pages, stats = _extract_pdf_pages_uncached(path, config, layout_available)
+    # Solo los errores del parser impiden cachear (se reintentan en la próxima
+    # ingesta); una página que sigue vacía tras escalarla es un resultado válido
+    if sha and not stats["failed_pages"]:
+        cache.put(sha, extractor, {"pages": pages, "stats": stats})
+    return pages, stats
+
+def _extract_pdf_pages_uncached(path: str, config: Dict[str, Any],
+                                layout_available: bool = True) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Extracción por niveles sin caché
+
+    En las estadísticas, "empty_pages" son páginas escaladas que siguen sin
+    texto (en blanco, o sin parser de maquetación) y "failed_pages" las que
+    no se pudieron procesar por un error.
+    """
+    stats = {"pages": 0, "fast_pages": 0, "layout_pages": 0, "empty_pages": 0, "failed_pages": 0,
+             "fast_seconds": 0.0, "layout_seconds": 0.0, "parallel": False, "cached": False}
+
+    start = time.time()
+    try:
+        from PyPDF2 import PdfReader
+        total_pages = len(PdfReader(path).pages)
+        pages, stats["parallel"] = _fast_pass(path, total_pages, config)
+    except Exception as e:
+        # PDF que PyPDF2 no puede abrir: todo al parser de maquetación
+        logger.warning(f"⚠️ Capa de texto no disponible en {path}: {e}")
+        total_pages, pages = 0, []
+    stats["fast_seconds"] = round(time.time() - start, 3)
+
+    escalate = [number for number, text in enumerate(pages) if page_quality(text, config) != PAGE_OK]
+    stats["pages"] = total_pages
+    stats["fast_pages"] = total_pages - len(escalate)
+
+    if not layout_available:
+        if escalate or not total_pages:
+            logger.warning(f"⚠️ unstructured no instalado: {len(escalate) or 'todas las'} páginas de {path} sin escalar")
+        if total_pages:
+            stats["empty_pages"] = len(escalate)
+        else:
+            stats["failed_pages"] = 1
+    elif escalate or not total_pages:
+        start = time.time()
+        try:
+            if total_pages:
+                layout = _extract_pages_layout(path, escalate, total_pages)
+                for number in escalate:
+                    if layout.get(number, "").strip():
+                        pages[number] = layout[number]
+                        stats["layout_pages"] += 1
+                    else:
+                        stats["empty_pages"] += 1
+            else:
+                from unstructured.partition.pdf import partition_pdf
+                pages = ["\n".join(str(element) for element in partition_pdf(filename=path))]
+                stats["pages"] = stats["layout_pages"] = 1
+        except Exception as e:
+            logger.error(f"❌ Parser de maquetación falló en {path}: {e}")
+            stats["failed_pages"] = len(escalate) or 1
+        stats["layout_seconds"] = round(time.time() - start, 3)
+
+    logger.info(
+        f"📄 PDF {os.path.basename(path)}: {stats['pages']} páginas | "
+        f"capa de texto {stats['fast_pages']} en {stats['fast_seconds']}s"
+        f"{' (paralelo)' if stats['parallel'] else ''} | "
+        f"maquetación {stats['layout_pages']} en {stats['layout_seconds']}s"
+        + (f" | {stats['empty_pages']} sin texto" if stats["empty_pages"] else "")
+        + (f" | {stats['failed_pages']} con error" if stats["failed_pages"] else "")
+    )
+    return pages, stats
+
+def extract_pdf_text(path: str, sha: Optional[str] = None) -> str:
+    """Texto completo del PDF (páginas separadas por salto de línea)"""
+    pages, _ = extract_pdf_pages(path, sha)
+    return "\n".join(pages)
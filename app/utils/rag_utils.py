@@ -3,15 +3,145 @@ RAG Utils - Actualizado con ChromaDB + LlamaIndex
 Mantiene compatibilidad con el sistema existente
 """
 import os
+import sys
+import copy
+import json
+import time
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from app.utils.chroma_store import get_chroma_store
+from app.utils.lexical_index import is_identifier_query, reciprocal_rank_fusion
+from app.utils.document_manifest import get_document_manifest, file_sha256, chunk_id, FILE_UNCHANGED
+from app.utils.ingestion_pipeline import background_iter, FileChunks, IngestionWriter
+from app.utils.parsed_text_cache import get_parsed_text_cache
+from app.utils.chunk_embedding_cache import get_chunk_embedding_cache
 from app.services.llamaindex_ingestor import MunicipalDocumentIngestor
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ============================================================================
+# CACHÉ DE RESULTADOS DE RECUPERACIÓN
+# ============================================================================
+
+class RetrievalResultCache:
+    """
+    Caché LRU de resultados de búsqueda versionada por colección
+    
+    Cada entrada se asocia a la versión de la colección en que se calculó;
+    cuando ChromaVectorStore incrementa su versión (add_documents,
+    delete_collection, también desde otro proceso como una reindexación por
+    CLI) la caché se vacía y nunca devuelve resultados obsoletos.
+    """
+    
+    def __init__(self, max_size: int = 512, ttl_seconds: Optional[float] = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(consulta: str, k: int, filtros: Optional[Dict], *extra) -> Tuple:
+        """Clave estable para una búsqueda (filtros serializados de forma ordenada)"""
+        filtros_key = json.dumps(filtros, sort_keys=True, ensure_ascii=False, default=str) if filtros else ""
+        return (consulta.strip(), k, filtros_key) + tuple(extra)
+    
+    def _sync_version(self, version: Any):
+        """Vacía la caché si la colección ha cambiado de versión"""
+        if self._version != version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+    
+    def get(self, key: Tuple, version: Any) -> Optional[List[Dict]]:
+        with self._lock:
+            self._sync_version(version)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            stored_at, results = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            # Copia profunda: los metadatos anidados no deben compartirse con la entrada cacheada
+            return copy.deepcopy(results)
+    
+    def put(self, key: Tuple, version: Any, results: List[Dict]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._sync_version(version)
+            self._data[key] = (time.time(), copy.deepcopy(results))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def memory_bytes(self) -> int:
+        """Estimación del uso de memoria de las entradas cacheadas"""
+        with self._lock:
+            return sum(_estimar_bytes(k) + _estimar_bytes(v) for k, v in self._data.items())
+    
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory_bytes()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "collection_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "memory_kb": round(memory / 1024, 2)
+            }
+
+def _estimar_bytes(obj: Any) -> int:
+    """Tamaño aproximado en bytes de estructuras anidadas (dict/list/tuple/str)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_estimar_bytes(k) + _estimar_bytes(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_estimar_bytes(item) for item in obj)
+    return size
+
+_retrieval_cache = None
+
+def get_retrieval_cache() -> RetrievalResultCache:
+    """Obtener instancia única de la caché de resultados"""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        from app.config.settings import load_settings
+        cache_config = load_settings().get("retrieval_cache", {})
+        _retrieval_cache = RetrievalResultCache(
+            max_size=cache_config.get("max_size", 512),
+            ttl_seconds=cache_config.get("ttl_seconds", 600)
+        )
+    return _retrieval_cache
+
+def get_retrieval_cache_stats() -> Dict[str, Any]:
+    """Estadísticas de la caché de resultados (para dimensionarla)"""
+    return get_retrieval_cache().stats()
+
 # ============================================================================
 # FUNCIONES PRINCIPALES RAG
 # ============================================================================
@@ -20,125 +150,506 @@ def buscar_fragmentos_combinados(
     consulta: str, 
     k: int = 5, 
     filtros: Optional[Dict] = None,
-    fuente_especifica: Optional[str] = None
+    fuente_especifica: Optional[str] = None,
+    min_similitud: Optional[float] = None,
+    margen_adaptativo: Optional[float] = None,
+    modo: Optional[str] = None
 ) -> List[Dict]:
     """
     Búsqueda mejorada con ChromaDB y filtros avanzados
     
     Args:
         consulta: Texto de la consulta
-        k: Número de fragmentos a recuperar
+        k: Número máximo de fragmentos a recuperar
         filtros: Filtros de metadatos (ej: {"document_type": "ordenanza"})
         fuente_especifica: Filtrar por fuente específica
+        min_similitud: Similitud coseno mínima; None = valor de settings.json
+        margen_adaptativo: k adaptativo, descarta fragmentos cuya similitud quede
+            más de este margen por debajo del mejor; None = valor de settings.json
+        modo: "vector", "hybrid" (BM25 + vectorial) o "lexical";
+            None = valor de settings.json ("rag_search_mode")
     
     Returns:
         Lista de fragmentos con metadatos enriquecidos
     """
     try:
         store = get_chroma_store()
+        search_filters = _construir_filtros(filtros, fuente_especifica)
         
-        # Construir filtros
-        search_filters = {}
-        if filtros:
-            search_filters.update(filtros)
-        if fuente_especifica:
-            search_filters["fuente"] = fuente_especifica
-        
-        # Realizar búsqueda
-        results = store.similarity_search(
-            query=consulta,
-            k=k,
-            filter_metadata=search_filters if search_filters else None
+        # Parámetros efectivos (la clave de caché debe reflejar los valores de settings)
+        min_similitud, margen_adaptativo, modo = _resolver_parametros_busqueda(
+            min_similitud, margen_adaptativo, modo
         )
         
-        logger.info(f"🔍 Búsqueda '{consulta[:50]}...': {len(results)} fragmentos encontrados")
-        
-        # Enriquecer resultados con información adicional
-        fragmentos_enriquecidos = []
-        for i, fragmento in enumerate(results):
-            fragmento_enriquecido = {
-                **fragmento,
-                "ranking": i + 1,
-                "relevancia_score": round(1.0 - (i * 0.1), 2),  # Score simulado
-                "fragmento_id": fragmento.get("metadata", {}).get("id", f"frag_{i}"),
-                "tipo_documento": fragmento.get("metadata", {}).get("document_type", "general")
-            }
-            fragmentos_enriquecidos.append(fragmento_enriquecido)
+        # Consultar caché de resultados (invalidada por versión de colección)
+        cache = get_retrieval_cache()
+        cache_key = cache.make_key(consulta, k, search_filters, min_similitud, margen_adaptativo, modo)
+        version = store.collection_version
+        cached = cache.get(cache_key, version)
+        if cached is not None:
+            logger.info(f"⚡ Búsqueda '{consulta[:50]}...': {len(cached)} fragmentos desde caché")
+            return cached
+        
+        results = []
         
-        return fragmentos_enriquecidos
+        # Vía rápida léxica: identificadores exactos sin calcular embeddings
+        if modo == "lexical" or (modo == "hybrid" and is_identifier_query(consulta)):
+            results = _normalizar_bm25(store.lexical_search(consulta, k=k, filter_metadata=search_filters))
+            logger.info(f"🔤 Búsqueda léxica '{consulta[:50]}...': {len(results)} fragmentos")
+        
+        if not results and modo != "lexical":
+            # Realizar búsqueda vectorial (en modo híbrido, candidatos para la fusión)
+            vectoriales = store.similarity_search_with_score(
+                query=consulta,
+                k=_candidatos_por_modo(k, modo),
+                filter_metadata=search_filters
+            )
+            results = _seleccionar_resultados(
+                store, consulta, vectoriales, k, search_filters, min_similitud, margen_adaptativo, modo
+            )
+        
+        fragmentos = _enriquecer_resultados(results)
+        cache.put(cache_key, version, fragmentos)
+        return fragmentos
         
     except Exception as e:
         logger.error(f"❌ Error en búsqueda combinada: {e}")
         return []
 
-def ingest_documents_with_llamaindex(folder_paths: List[str]) -> int:
+def buscar_fragmentos_batch(
+    consultas: List[str], 
+    k: int = 5, 
+    filtros: Optional[Dict] = None,
+    fuente_especifica: Optional[str] = None,
+    min_similitud: Optional[float] = None,
+    margen_adaptativo: Optional[float] = None,
+    modo: Optional[str] = None
+) -> List[List[Dict]]:
     """
-    Ingesta documentos usando LlamaIndex + ChromaDB
+    Búsqueda de varias consultas en un único lote
+    
+    Devuelve lo mismo que buscar_fragmentos_combinados para cada consulta
+    (corte de similitud, k adaptativo, modo y caché de resultados), de modo
+    que la evaluación mide los fragmentos que recibiría /chat. En modo
+    "vector" las consultas no cacheadas se embeben en una sola pasada del
+    modelo y se resuelven con una única petición multi-query a ChromaDB;
+    en los modos "hybrid" y "lexical" cada consulta sigue la ruta normal.
+    
+    Args:
+        consultas: Lista de textos de consulta
+        k: Número máximo de fragmentos por consulta
+        filtros: Filtros de metadatos comunes a todas las consultas
+        fuente_especifica: Filtrar por fuente específica
+        min_similitud, margen_adaptativo, modo: Como en buscar_fragmentos_combinados
+    
+    Returns:
+        Lista de listas de fragmentos enriquecidos, en el orden de `consultas`
+    """
+    if not consultas:
+        return []
+    
+    min_similitud, margen_adaptativo, modo = _resolver_parametros_busqueda(
+        min_similitud, margen_adaptativo, modo
+    )
+    if modo != "vector":
+        return [
+            buscar_fragmentos_combinados(consulta, k, filtros, fuente_especifica,
+                                         min_similitud, margen_adaptativo, modo)
+            for consulta in consultas
+        ]
+    
+    try:
+        store = get_chroma_store()
+        search_filters = _construir_filtros(filtros, fuente_especifica)
+        cache = get_retrieval_cache()
+        version = store.collection_version
+        claves = [cache.make_key(consulta, k, search_filters, min_similitud, margen_adaptativo, modo)
+                  for consulta in consultas]
+        
+        resultados = [cache.get(clave, version) for clave in claves]
+        pendientes = [i for i, cached in enumerate(resultados) if cached is None]
+        
+        if pendientes:
+            batch_results = store.similarity_search_batch(
+                queries=[consultas[i] for i in pendientes],
+                k=k,
+                filter_metadata=search_filters
+            )
+            for i, results in zip(pendientes, batch_results):
+                results = _aplicar_corte_similitud(results, min_similitud, margen_adaptativo)
+                resultados[i] = _enriquecer_resultados(results)
+                cache.put(claves[i], version, resultados[i])
+        
+        logger.info(
+            f"🔍 Búsqueda por lotes: {len(consultas)} consultas "
+            f"({len(consultas) - len(pendientes)} desde caché)"
+        )
+        return resultados
+        
+    except Exception as e:
+        logger.error(f"❌ Error en búsqueda por lotes: {e}")
+        return [[] for _ in consultas]
+
+def _construir_filtros(filtros: Optional[Dict], fuente_especifica: Optional[str]) -> Optional[Dict]:
+    """Combina filtros de metadatos y fuente en un único filtro (o None)"""
+    search_filters = {}
+    if filtros:
+        search_filters.update(filtros)
+    if fuente_especifica:
+        search_filters["fuente"] = fuente_especifica
+    return search_filters if search_filters else None
+
+def _resolver_parametros_busqueda(
+    min_similitud: Optional[float],
+    margen_adaptativo: Optional[float],
+    modo: Optional[str]
+) -> Tuple[Optional[float], Optional[float], str]:
+    """Sustituye los parámetros no indicados por los de settings.json (copia en memoria)"""
+    if min_similitud is None or margen_adaptativo is None or modo is None:
+        from app.config.settings import get_cached_settings
+        settings = get_cached_settings()
+        if min_similitud is None:
+            min_similitud = settings.get("rag_min_similarity", 0.25)
+        if margen_adaptativo is None:
+            margen_adaptativo = settings.get("rag_adaptive_margin", 0.2)
+        if modo is None:
+            modo = settings.get("rag_search_mode", "hybrid")
+    return min_similitud, margen_adaptativo, modo
+
+def _aplicar_corte_similitud(
+    results: List[Dict],
+    min_similitud: Optional[float] = None,
+    margen_adaptativo: Optional[float] = None
+) -> List[Dict]:
+    """
+    Descarta fragmentos poco relevantes antes de construir el prompt
+    
+    Aplica un umbral absoluto de similitud y, si hay margen adaptativo,
+    un corte relativo al mejor fragmento (k adaptativo).
+    """
+    if not results:
+        return results
+    
+    if min_similitud is None or margen_adaptativo is None:
+        min_similitud, margen_adaptativo, _ = _resolver_parametros_busqueda(
+            min_similitud, margen_adaptativo, "vector"
+        )
+    
+    filtrados = [r for r in results if (r.get("similitud") or 0.0) >= (min_similitud or 0.0)]
+    
+    if filtrados and margen_adaptativo is not None:
+        mejor = max(r.get("similitud") or 0.0 for r in filtrados)
+        filtrados = [r for r in filtrados if (r.get("similitud") or 0.0) >= mejor - margen_adaptativo]
+    
+    return filtrados
+
+def _normalizar_bm25(results: List[Dict]) -> List[Dict]:
+    """Añade "relevancia_lexica" (BM25 normalizado al mejor resultado, 0-1)"""
+    if not results:
+        return results
+    mejor = max(r.get("bm25_score", 0.0) for r in results) or 1.0
+    return [{**r, "relevancia_lexica": round(r.get("bm25_score", 0.0) / mejor, 4)} for r in results]
+
+# Candidatos por consulta y ranking (vectorial y BM25) que entran en la fusión híbrida
+HYBRID_CANDIDATE_FACTOR = 4
+
+def _candidatos_por_modo(k: int, modo: str) -> int:
+    return k * HYBRID_CANDIDATE_FACTOR if modo == "hybrid" else k
+
+def _seleccionar_resultados(
+    store,
+    consulta: str,
+    vectoriales: List[Dict],
+    k: int,
+    search_filters: Optional[Dict],
+    min_similitud: Optional[float],
+    margen_adaptativo: Optional[float],
+    modo: str
+) -> List[Dict]:
+    """
+    Fusión híbrida (si procede), corte de similitud y truncado a k
+    
+    En modo híbrido se fusionan los top-N vectorial y BM25 completos: un
+    fragmento que solo encuentra BM25 (artículo o expediente citado en una
+    consulta mixta) entra con la similitud de su embedding, y el corte se
+    aplica al conjunto fusionado antes de quedarse con los k primeros.
+    """
+    candidatos = vectoriales
+    if modo == "hybrid":
+        lexicos = _normalizar_bm25(store.lexical_search(
+            consulta, k=_candidatos_por_modo(k, modo), filter_metadata=search_filters, with_similarity=True
+        ))
+        candidatos = _fusionar_rankings(vectoriales, lexicos)
+    
+    results = _aplicar_corte_similitud(candidatos, min_similitud, margen_adaptativo)[:k]
+    logger.info(
+        f"🔍 Búsqueda '{consulta[:50]}...': {len(results)}/{len(candidatos)} fragmentos tras corte de similitud"
+    )
+    return results
+
+def _fusionar_rankings(vectoriales: List[Dict], lexicos: List[Dict], k: Optional[int] = None) -> List[Dict]:
+    """
+    Fusiona rankings vectorial y léxico con Reciprocal Rank Fusion
+    
+    Incluye los aciertos de ambos rankings; k = None devuelve la fusión completa.
+    """
+    por_id = {}
+    for fragmento in lexicos + vectoriales:
+        doc_id = fragmento.get("id")
+        por_id[doc_id] = {**por_id.get(doc_id, {}), **fragmento}
+    
+    fusion = reciprocal_rank_fusion([
+        [f.get("id") for f in vectoriales],
+        [f.get("id") for f in lexicos]
+    ])
+    if k is not None:
+        fusion = fusion[:k]
+    
+    return [{**por_id[doc_id], "rrf_score": round(score, 6)} for doc_id, score in fusion]
+
+def _enriquecer_resultados(results: List[Dict]) -> List[Dict]:
+    """Enriquecer resultados con información adicional"""
+    fragmentos_enriquecidos = []
+    for i, fragmento in enumerate(results):
+        relevancia = fragmento.get("similitud")
+        if relevancia is None:
+            relevancia = fragmento.get("relevancia_lexica", 0.0)
+        fragmento_enriquecido = {
+            **fragmento,
+            "ranking": i + 1,
+            "relevancia_score": round(relevancia, 4),
+            "fragmento_id": fragmento.get("metadata", {}).get("id", f"frag_{i}"),
+            "tipo_documento": fragmento.get("metadata", {}).get("document_type", "general")
+        }
+        fragmentos_enriquecidos.append(fragmento_enriquecido)
+    
+    return fragmentos_enriquecidos
+
+# Estadísticas de la última ingesta (throughput para CLI y /config)
+_ultima_ingesta_stats: Dict[str, Any] = {}
+
+def ingest_documents_with_llamaindex(
+    folder_paths: List[str],
+    embedding_workers: Optional[int] = None,
+    forzar: bool = False,
+    progreso: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelar: Optional[threading.Event] = None
+) -> int:
+    """
+    Ingesta incremental de documentos usando LlamaIndex + ChromaDB
+    
+    Consulta el manifiesto de documentos: los archivos sin cambios se omiten,
+    los modificados reemplazan solo sus chunks y los borrados se eliminan.
+    Los ids de chunk son deterministas (ruta + hash del archivo + posición), así que
+    repetir la ingesta no duplica fragmentos.
+    
+    Los archivos fluyen en streaming (parseo → chunking en un hilo productor,
+    embeddings y escritura en lotes de "ingestion_flush_batch"), por lo que la
+    memoria no depende del tamaño de la carpeta.
     
     Args:
         folder_paths: Lista de rutas de carpetas a procesar
+        embedding_workers: Procesos para calcular embeddings; 0/1 = en el
+            propio proceso, None = "embedding_workers" de settings.json
+        forzar: Reprocesar todos los archivos aunque no hayan cambiado
+        progreso: Callback con contadores de archivos, fragmentos y
+            embeddings por segundo (ej: trabajos en segundo plano)
+        cancelar: Evento de cancelación; se atiende entre archivos y los
+            archivos ya escritos quedan en el manifiesto
     
     Returns:
-        Número total de documentos procesados
+        Número total de fragmentos escritos
     """
+    global _ultima_ingesta_stats
+    
     if not folder_paths:
         logger.warning("⚠️ No se proporcionaron carpetas para ingestar")
         return 0
     
+    from app.config.settings import load_settings
+    settings = load_settings()
+    if embedding_workers is None:
+        embedding_workers = settings.get("embedding_workers", 0)
+    
     ingestor = MunicipalDocumentIngestor()
     store = get_chroma_store()
+    manifest = get_document_manifest()
+    embedding_cache = get_chunk_embedding_cache()
+    hits_previos, misses_previos = embedding_cache.hits, embedding_cache.misses
     
-    total_docs = 0
+    # Si la colección está vacía el manifiesto no es fiable (ej: tras borrarla)
+    if len(manifest) and store.get_collection_stats().get("total_documents", 0) == 0:
+        logger.warning("⚠️ Colección vacía: se descarta el manifiesto de documentos")
+        manifest.clear()
     
-    for folder_path in folder_paths:
-        if not os.path.exists(folder_path):
-            logger.warning(f"⚠️ Carpeta no encontrada: {folder_path}")
-            continue
-            
-        try:
-            logger.info(f"📁 Procesando carpeta: {folder_path}")
-            
-            # Procesar con LlamaIndex
-            docs = ingestor.process_municipal_folder(folder_path)
-            
-            if not docs:
-                logger.warning(f"⚠️ No se encontraron documentos en: {folder_path}")
+    pool = None
+    if embedding_workers and embedding_workers > 1:
+        from app.utils.embedding_pool import EmbeddingProcessPool
+        batching = settings.get("embedding_batching", {})
+        pool = EmbeddingProcessPool(
+            model_name=store.embeddings.model_name,
+            workers=embedding_workers,
+            chunk_size=settings.get("embedding_pool_chunk_size", 256),
+            backend=store.embeddings.backend,
+            batch_size=batching.get("batch_size", 64)
+        )
+    
+    writer = IngestionWriter(
+        store, manifest,
+        flush_size=settings.get("ingestion_flush_batch", 256),
+        pool=pool
+    )
+    queue_size = settings.get("ingestion_queue_size", 8)
+    resumen = {"archivos_sin_cambios": 0, "archivos_eliminados": 0, "carpetas_con_error": []}
+    archivos_pendientes = 0
+    cancelada = False
+    start_time = time.time()
+    
+    def _reportar_progreso():
+        if progreso is None:
+            return
+        elapsed = time.time() - start_time
+        calculados = embedding_cache.misses - misses_previos
+        progreso({
+            "archivos_pendientes": archivos_pendientes,
+            "archivos_procesados": writer.stats["archivos_procesados"],
+            "archivos_con_error": writer.stats["archivos_con_error"],
+            "archivos_sin_cambios": resumen["archivos_sin_cambios"],
+            "fragmentos": writer.stats["fragmentos"],
+            "embeddings_calculados": calculados,
+            "chunks_por_segundo": round(writer.stats["fragmentos"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "embeddings_por_segundo": round(calculados / elapsed, 1) if elapsed > 0 else 0.0
+        })
+    
+    try:
+        for folder_path in folder_paths:
+            if cancelar is not None and cancelar.is_set():
+                cancelada = True
+                break
+            if not os.path.exists(folder_path):
+                logger.warning(f"⚠️ Carpeta no encontrada: {folder_path}")
                 continue
-            
-            # Crear chunks especializados
-            chunks = ingestor.create_specialized_chunks(docs)
-            
-            if chunks:
-                # Preparar textos y metadatos para ChromaDB
-                texts = []
-                metadatas = []
                 
-                for chunk in chunks:
-                    texts.append(chunk.text)
-                    
-                    # Enriquecer metadatos con información de la carpeta
-                    metadata = chunk.metadata.copy()
-                    metadata.update({
-                        "fuente": "documentos",
-                        "carpeta_origen": folder_path,
-                        "metodo_ingesta": "llamaindex_v2"
-                    })
-                    metadatas.append(metadata)
+            try:
+                logger.info(f"📁 Procesando carpeta: {folder_path}")
                 
-                # Añadir a ChromaDB
-                ids = store.add_documents(texts, metadatas)
-                docs_added = len(ids)
-                total_docs += docs_added
+                # Comparar archivos con el manifiesto
+                files = ingestor.list_folder_files(folder_path)
+                pendientes = {}
+                for path in files:
+                    estado, sha = manifest.check(path)
+                    if estado == FILE_UNCHANGED and not forzar:
+                        resumen["archivos_sin_cambios"] += 1
+                    else:
+                        pendientes[os.path.abspath(path)] = sha or file_sha256(path)
                 
-                logger.info(f"✅ Carpeta {folder_path}: {docs_added} fragmentos ingestados")
-            
-        except Exception as e:
-            logger.error(f"❌ Error procesando carpeta {folder_path}: {e}")
-            continue
+                # Archivos borrados: eliminar sus chunks
+                existentes = {os.path.abspath(path) for path in files}
+                for path in manifest.paths_under(folder_path):
+                    if path not in existentes:
+                        writer.stats["chunks_eliminados"] += store.delete_documents(manifest.remove(path))
+                        resumen["archivos_eliminados"] += 1
+                manifest.save()
+                
+                logger.info(
+                    f"🧾 {folder_path}: {len(pendientes)} archivos nuevos/modificados, "
+                    f"{len(files) - len(pendientes)} sin cambios"
+                )
+                archivos_pendientes += len(pendientes)
+                _reportar_progreso()
+                
+                if not pendientes:
+                    continue
+                
+                # Parseo + chunking en un hilo productor; embeddings + escritura aquí
+                chunk_stream = _iterar_chunks_por_archivo(ingestor, folder_path, pendientes)
+                for file_chunks in background_iter(chunk_stream, maxsize=queue_size):
+                    writer.add(file_chunks)
+                    _reportar_progreso()
+                    if cancelar is not None and cancelar.is_set():
+                        cancelada = True
+                        break
+                writer.flush()
+                _reportar_progreso()
+                if cancelada:
+                    logger.warning(f"🛑 Ingesta cancelada en {folder_path}")
+                    break
+                
+                logger.info(f"✅ Carpeta {folder_path}: {writer.stats['fragmentos']} fragmentos ingestados en total")
+                
+            except Exception as e:
+                logger.error(f"❌ Error procesando carpeta {folder_path}: {e}")
+                resumen["carpetas_con_error"].append({"carpeta": folder_path, "error": str(e)})
+                continue
+    finally:
+        if pool is not None:
+            pool.close()
+        # El índice BM25 se actualiza en memoria por lote y se persiste una sola vez
+        store.flush_lexical_index()
+        get_parsed_text_cache().enforce_limits()
     
-    logger.info(f"🎯 Ingesta completada: {total_docs} fragmentos totales")
+    total_docs = writer.stats["fragmentos"]
+    duration = time.time() - start_time
+    _ultima_ingesta_stats = {
+        "fragmentos": total_docs,
+        "segundos": round(duration, 2),
+        "chunks_por_segundo": round(total_docs / duration, 1) if duration > 0 else 0.0,
+        "procesos_embedding": embedding_workers if pool is not None else 1,
+        "lotes_escritos": writer.stats["lotes"],
+        "archivos_procesados": writer.stats["archivos_procesados"],
+        "archivos_con_error": writer.stats["archivos_con_error"],
+        "chunks_eliminados": writer.stats["chunks_eliminados"],
+        "embeddings_reutilizados": embedding_cache.hits - hits_previos,
+        "embeddings_calculados": embedding_cache.misses - misses_previos,
+        "cancelada": cancelada,
+        **resumen
+    }
+    
+    logger.info(
+        f"🎯 Ingesta completada: {total_docs} fragmentos escritos, "
+        f"{resumen['archivos_sin_cambios']} archivos sin cambios, "
+        f"{resumen['archivos_eliminados']} eliminados, "
+        f"{_ultima_ingesta_stats['embeddings_reutilizados']} embeddings reutilizados de caché "
+        f"({_ultima_ingesta_stats['chunks_por_segundo']} chunks/s)"
+    )
     return total_docs
 
+def _iterar_chunks_por_archivo(
+    ingestor: MunicipalDocumentIngestor,
+    folder_path: str,
+    pendientes: Dict[str, str]
+):
+    """Parsea, clasifica y chunkea archivo a archivo, con ids deterministas por archivo"""
+    for path, docs in ingestor.iter_municipal_folder(folder_path, input_files=list(pendientes),
+                                                     file_hashes=pendientes):
+        path = os.path.abspath(path)
+        sha = pendientes[path]
+        file_chunks = FileChunks(path=path, sha256=sha)
+        
+        for chunk_offset, (text, doc_metadata, section_metadata) in enumerate(ingestor.iter_chunks(docs)):
+            doc_id = chunk_id(path, sha, chunk_offset)
+            
+            # Enriquecer metadatos con información de la carpeta (una sola copia por chunk)
+            metadata = {
+                **doc_metadata,
+                **section_metadata,
+                "fuente": "documentos",
+                "carpeta_origen": folder_path,
+                "metodo_ingesta": "llamaindex_v2",
+                "source_path": path,
+                "file_sha256": sha,
+                "chunk_index": chunk_offset
+            }
+            file_chunks.texts.append(text)
+            file_chunks.metadatas.append(metadata)
+            file_chunks.ids.append(doc_id)
+        
+        yield file_chunks
+
+def obtener_estadisticas_ultima_ingesta() -> Dict[str, Any]:
+    """Throughput de la última ingesta de documentos"""
+    return dict(_ultima_ingesta_stats)
+
 def get_vectorstore_stats() -> Dict[str, Any]:
     """Obtener estadísticas del vectorstore actual"""
     try:
@@ -149,6 +660,7 @@ def get_vectorstore_stats() -> Dict[str, Any]:
         stats.update({
             "vectorstore_type": "ChromaDB",
             "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
+            "retrieval_cache": get_retrieval_cache_stats(),
             "status": "activo"
         })
         
@@ -234,6 +746,7 @@ def migrate_from_faiss_to_chroma(config_path: str = "app/config/settings.json")
         store = get_chroma_store()
         try:
             store.delete_collection()
+            get_document_manifest().clear()
             store = get_chroma_store()  # Recrear
         except:
             pass  # La colección puede no existir
@@ -263,6 +776,7 @@ def cleanup_vectorstore():
     try:
         store = get_chroma_store()
         store.delete_collection()
+        get_document_manifest().clear()
         logger.info("🗑️ Vectorstore limpiado completamente")
         return True
     except Exception as e:
@@ -336,37 +850,40 @@ def test_search_performance(test_queries: List[str], k: int = 5) -> Dict[str, An
     performance_data = {
         "queries_tested": len(test_queries),
         "average_response_time": 0,
+        "batch_response_time_ms": 0,
         "queries_results": []
     }
     
-    total_time = 0
+    if not test_queries:
+        return performance_data
+    
+    start_time = time.time()
     
-    for query in test_queries:
-        start_time = time.time()
+    try:
+        # Un único lote: una pasada del modelo y una petición a ChromaDB
+        batch_results = buscar_fragmentos_batch(test_queries, k)
+        total_time = time.time() - start_time
+        per_query_time = total_time / len(test_queries)
         
-        try:
-            results = buscar_fragmentos_combinados(query, k)
-            response_time = time.time() - start_time
-            
+        for query, results in zip(test_queries, batch_results):
             performance_data["queries_results"].append({
                 "query": query,
-                "response_time_ms": round(response_time * 1000, 2),
+                "response_time_ms": round(per_query_time * 1000, 2),
                 "results_count": len(results),
                 "success": True
             })
-            
-            total_time += response_time
-            
-        except Exception as e:
+        
+        performance_data["batch_response_time_ms"] = round(total_time * 1000, 2)
+        performance_data["average_response_time"] = round(per_query_time * 1000, 2)
+        
+    except Exception as e:
+        for query in test_queries:
             performance_data["queries_results"].append({
                 "query": query,
                 "error": str(e),
                 "success": False
             })
     
-    if len(test_queries) > 0:
-        performance_data["average_response_time"] = round(total_time / len(test_queries) * 1000, 2)
-    
     return performance_data
 def obtener_estadisticas_vectorstore() -> Dict[str, Any]:
     """Obtener estadísticas completas del vectorstore"""
@@ -376,6 +893,7 @@ def obtener_estadisticas_vectorstore() -> Dict[str, Any]:
         stats = store.get_collection_stats()
         stats["status"] = "active"
         stats["backend"] = "ChromaDB"
+        stats["retrieval_cache"] = get_retrieval_cache_stats()
         return stats
     except Exception as e:
         return {"total_documents": 0, "status": "error", "backend": "ChromaDB", "error": str(e)}
@@ -398,20 +916,25 @@ def buscar_fragmentos_avanzado(consulta: str, filtros_avanzados: Dict = None, in
     """Búsqueda avanzada - versión simplificada"""
     return buscar_fragmentos_combinados(consulta, k=10 if incluir_similares else 5)
 
+# Fuentes que se pueden reindexar desde la API de configuración
+FUENTES_REINDEXABLES = ("documents",)
+
 def reindexar_fuente(tipo_fuente: str, config_path: str = "app/config/settings.json") -> int:
-    """Reindexar una fuente específica"""
-    try:
-        import json
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        if tipo_fuente == "documents":
-            folders = config.get("document_folders", [])
-            return ingest_documents_with_llamaindex(folders)
-        
-        return 0
-    except Exception as e:
-        return 0
+    """
+    Reindexar una fuente específica
+    
+    Raises:
+        ValueError: si la fuente no es reindexable; los errores de la
+            ingesta se propagan para que el trabajo conste como fallido
+    """
+    if tipo_fuente not in FUENTES_REINDEXABLES:
+        raise ValueError(f"Fuente no reindexable: {tipo_fuente}")
+    
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    
+    folders = config.get("document_folders", [])
+    return ingest_documents_with_llamaindex(folders)
 
 def buscar_por_tipo_documento(consulta: str, tipo_documento: str, k: int = 5) -> List[Dict]:
     """Búsqueda por tipo de documento"""
@@ -0,0 +1,87 @@
+"""
+SimHash de 64 bits para detectar fragmentos casi duplicados
+Índice por bandas: con 4 bandas de 16 bits, dos huellas a distancia de
+Hamming <= 3 coinciden por fuerza en al menos una banda (palomar), así que
+la búsqueda solo compara contra los candidatos de esas bandas
+"""
+import re
+import hashlib
+from collections import defaultdict
+from typing import List, Dict, Optional, Iterable
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MASK64 = (1 << 64) - 1
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(text: str, shingle_size: int = 1) -> int:
+    """
+    Huella SimHash del texto sobre palabras (o shingles de n palabras) en minúsculas
+
+    Con palabras sueltas, cambiar una fecha o un nombre en un fragmento de
+    ~80 palabras mueve la huella 1-3 bits; con shingles más largos cada
+    cambio toca n rasgos y la distancia crece.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    if not shingles:
+        return 0
+
+    weights = [0] * 64
+    for shingle in shingles:
+        value = _token_hash(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK64).count("1")
+
+class SimHashIndex:
+    """Índice de huellas con búsqueda de vecinos a distancia <= max_distance"""
+
+    def __init__(self, max_distance: int = 3, bands: int = 4):
+        if max_distance >= bands:
+            raise ValueError("max_distance debe ser menor que el número de bandas")
+        self.max_distance = max_distance
+        self.bands = bands
+        self._band_bits = 64 // bands
+        self._tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self._keys: Dict[int, List[str]] = defaultdict(list)
+
+    def _band_values(self, fingerprint: int) -> Iterable[int]:
+        mask = (1 << self._band_bits) - 1
+        for band in range(self.bands):
+            yield (fingerprint >> (band * self._band_bits)) & mask
+
+    def add(self, fingerprint: int, key: str):
+        if fingerprint not in self._keys:
+            for band, value in enumerate(self._band_values(fingerprint)):
+                self._tables[band][value].append(fingerprint)
+        self._keys[fingerprint].append(key)
+
+    def find(self, fingerprint: int, exclude: Optional[set] = None) -> Optional[str]:
+        """Clave de una huella cercana (ignorando las claves de `exclude`) o None"""
+        checked = set()
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for candidate in self._tables[band].get(value, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if hamming_distance(candidate, fingerprint) > self.max_distance:
+                    continue
+                for key in self._keys[candidate]:
+                    if not exclude or key not in exclude:
+                        return key
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
@@ -0,0 +1,248 @@
+"""
+Vectorstore FAISS escrito por lotes, con checkpoints para ingestas reanudables
+Los fragmentos nuevos se vuelcan a disco en lotes (checkpoint/batch_NNNNN.pkl)
+en lugar de acumularse en memoria. El vectorstore definitivo (index.faiss,
+fragmentos.pkl, metadatos.pkl, embeddings.npy) solo se reescribe al terminar,
+combinando los fragmentos conservados del anterior con los lotes, así que las
+consultas nunca ven una ingesta a medias. Los cuatro archivos se sustituyen
+como una sola generación: se escriben con nombres temporales, se registra un
+marcador de commit y, si el proceso muere durante los renombrados, la
+siguiente apertura los completa.
+"""
+import os
+import json
+import pickle
+import shutil
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIRNAME = "checkpoint"
+COMMIT_MARKER = "consolidate.commit"
+
+def _atomic_pickle(obj, path: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+class StagedFaissStore:
+    """Lotes de fragmentos pendientes de consolidar en un vectorstore FAISS (fragmentos.pkl + metadatos.pkl)"""
+
+    def __init__(self, vector_dir: str, batch_size: int = 256, dim: int = 384):
+        self.vector_dir = vector_dir
+        self.staging_dir = os.path.join(vector_dir, CHECKPOINT_DIRNAME)
+        self.checkpoint_path = os.path.join(self.staging_dir, "checkpoint.pkl")
+        self.index_path = os.path.join(vector_dir, "index.faiss")
+        self.fragmentos_path = os.path.join(vector_dir, "fragmentos.pkl")
+        self.metadatos_path = os.path.join(vector_dir, "metadatos.pkl")
+        self.embeddings_path = os.path.join(vector_dir, "embeddings.npy")
+        self.commit_path = os.path.join(vector_dir, COMMIT_MARKER)
+        self.batch_size = max(1, batch_size)
+        self.dim = dim
+        self.batches = 0
+        # Fragmentos escritos en esta ingesta (en lotes o pendientes de volcar)
+        self.rows = 0
+        self._fragmentos: List[str] = []
+        self._metadatos: List[Dict[str, Any]] = []
+        self._vectores: List[np.ndarray] = []
+        self._recover_commit()
+
+    def _generation_files(self) -> List[Tuple[str, str]]:
+        """(temporal, definitivo) de los archivos que forman una generación del vectorstore"""
+        return [(path + ".tmp", path) for path in
+                (self.index_path, self.fragmentos_path, self.metadatos_path, self.embeddings_path)]
+
+    def _recover_commit(self):
+        """
+        Completa o descarta una consolidación interrumpida
+
+        Con marcador, los temporales están completos y se terminan de
+        renombrar; sin él, la escritura no llegó a confirmarse y se borran.
+        Así nunca conviven metadatos de una generación con vectores de otra.
+        """
+        if os.path.exists(self.commit_path):
+            self._apply_commit()
+            logger.warning("⚠️ Consolidación interrumpida completada al reabrir el vectorstore")
+            return
+        for tmp_path, _ in self._generation_files():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _apply_commit(self):
+        """Sustituye los archivos definitivos por los temporales confirmados y borra el marcador"""
+        for tmp_path, path in self._generation_files():
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, path)
+        os.remove(self.commit_path)
+
+    def _batch_path(self, number: int) -> str:
+        return os.path.join(self.staging_dir, f"batch_{number:05d}.pkl")
+
+    def _read_batch(self, number: int) -> Dict[str, Any]:
+        with open(self._batch_path(number), "rb") as f:
+            return pickle.load(f)
+
+    def reset(self):
+        """Descarta lotes y checkpoint (ingesta nueva o terminada)"""
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.batches = 0
+        self.rows = 0
+        self._fragmentos, self._metadatos, self._vectores = [], [], []
+
+    def add(self, fragmentos: List[str], vectores, metadatos: List[Dict[str, Any]]):
+        vectores = np.asarray(vectores, dtype="float32")
+        if len(vectores):
+            self.dim = vectores.shape[1]
+        self._fragmentos.extend(fragmentos)
+        self._metadatos.extend(metadatos)
+        self._vectores.append(vectores)
+        self.rows += len(fragmentos)
+        if len(self._fragmentos) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Escribe a disco el lote en curso"""
+        if not self._fragmentos:
+            return
+        os.makedirs(self.staging_dir, exist_ok=True)
+        _atomic_pickle({
+            "fragmentos": self._fragmentos,
+            "metadatos": self._metadatos,
+            "vectores": np.concatenate(self._vectores).astype("float32")
+        }, self._batch_path(self.batches))
+        self.batches += 1
+        self._fragmentos, self._metadatos, self._vectores = [], [], []
+
+    def save_checkpoint(self, state: Dict[str, Any]):
+        """Vuelca el lote en curso y guarda `state` junto con los lotes que lo respaldan"""
+        self.flush()
+        _atomic_pickle({**state, "batches": self.batches, "rows": self.rows, "dim": self.dim,
+                        "saved_at": datetime.now().isoformat()}, self.checkpoint_path)
+        logger.info(f"💾 Checkpoint guardado: {self.batches} lotes, {self.rows} fragmentos")
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.error(f"❌ Error cargando checkpoint {self.checkpoint_path}: {e}")
+            return None
+
+    def resume(self, checkpoint: Dict[str, Any]):
+        """Continúa desde un checkpoint, descartando los lotes escritos después de él"""
+        self.batches = checkpoint["batches"]
+        self.rows = checkpoint["rows"]
+        self.dim = checkpoint.get("dim", self.dim)
+        self._fragmentos, self._metadatos, self._vectores = [], [], []
+        number = self.batches
+        while os.path.exists(self._batch_path(number)):
+            os.remove(self._batch_path(number))
+            number += 1
+
+    def staged_rows(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        """(fragmento, metadatos) de los lotes ya escritos"""
+        for number in range(self.batches):
+            batch = self._read_batch(number)
+            yield from zip(batch["fragmentos"], batch["metadatos"])
+
+    def has_previous(self) -> bool:
+        return os.path.exists(self.embeddings_path)
+
+    def previous_rows(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Fragmentos y metadatos del vectorstore actual (sin vectores)"""
+        with open(self.fragmentos_path, "rb") as f:
+            fragmentos = pickle.load(f)
+        with open(self.metadatos_path, "rb") as f:
+            metadatos = pickle.load(f)
+        return fragmentos, metadatos
+
+    def consolidate(self, keep_previous: bool = True, removed_ids: Optional[set] = None) -> Dict[str, int]:
+        """
+        Reescribe el vectorstore definitivo: fragmentos conservados del actual + lotes
+
+        Los vectores se copian por tramos a un .npy en disco (memmap) y al
+        índice, sin reunirlos antes en una lista. Es idempotente: los
+        fragmentos del vectorstore actual cuyo chunk_id está en los lotes se
+        sustituyen, y los cuatro archivos se confirman juntos (marcador de
+        commit), así que repetirla tras una interrupción nunca combina
+        metadatos y vectores de generaciones distintas.
+        """
+        self._recover_commit()
+        self.flush()
+        removed_ids = removed_ids or set()
+        fragmentos: List[str] = []
+        metadatos: List[Dict[str, Any]] = []
+        staged_ids = set()
+        for frag, meta in self.staged_rows():
+            fragmentos.append(frag)
+            metadatos.append(meta)
+            staged_ids.add(meta.get("chunk_id"))
+        staged_ids.discard(None)
+
+        previous_keep: List[int] = []
+        previous_vectors = None
+        removed = 0
+        if keep_previous and self.has_previous():
+            prev_fragmentos, prev_metadatos = self.previous_rows()
+            previous_vectors = np.load(self.embeddings_path, mmap_mode="r")
+            if len(previous_vectors) != len(prev_metadatos):
+                raise RuntimeError(
+                    f"Vectorstore inconsistente en {self.vector_dir}: "
+                    f"{len(prev_metadatos)} metadatos y {len(previous_vectors)} vectores"
+                )
+            if previous_vectors.ndim == 2 and not self.rows:
+                self.dim = previous_vectors.shape[1]
+            for i, meta in enumerate(prev_metadatos):
+                chunk_id = meta.get("chunk_id")
+                if chunk_id in removed_ids:
+                    removed += 1
+                elif chunk_id not in staged_ids:
+                    previous_keep.append(i)
+            fragmentos = [prev_fragmentos[i] for i in previous_keep] + fragmentos
+            metadatos = [prev_metadatos[i] for i in previous_keep] + metadatos
+            del prev_fragmentos, prev_metadatos
+
+        tmp_index, tmp_fragmentos, tmp_metadatos, tmp_embeddings = [tmp for tmp, _ in self._generation_files()]
+        # np.lib.format.open_memmap no añade extensión: el temporal es "embeddings.npy.tmp"
+        matrix = np.lib.format.open_memmap(tmp_embeddings, mode="w+", dtype="float32",
+                                           shape=(len(fragmentos), self.dim))
+        index = faiss.IndexFlatL2(self.dim)
+        offset = 0
+
+        def _append(block):
+            nonlocal offset
+            block = np.array(block, dtype="float32")
+            if not len(block):
+                return
+            matrix[offset:offset + len(block)] = block
+            index.add(block)
+            offset += len(block)
+
+        for start in range(0, len(previous_keep), self.batch_size):
+            _append(previous_vectors[previous_keep[start:start + self.batch_size]])
+        previous_vectors = None
+        for number in range(self.batches):
+            _append(self._read_batch(number)["vectores"])
+        matrix.flush()
+        del matrix
+
+        faiss.write_index(index, tmp_index)
+        for obj, tmp_path in ((fragmentos, tmp_fragmentos), (metadatos, tmp_metadatos)):
+            with open(tmp_path, "wb") as f:
+                pickle.dump(obj, f)
+
+        # Punto de commit: a partir de aquí la nueva generación es la válida
+        with open(self.commit_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"fragmentos": len(fragmentos), "saved_at": datetime.now().isoformat()}, f)
+        os.replace(self.commit_path + ".tmp", self.commit_path)
+        self._apply_commit()
+        return {"fragmentos": len(fragmentos), "conservados": len(previous_keep),
+                "nuevos": len(fragmentos) - len(previous_keep), "eliminados": removed}
@@ -0,0 +1,161 @@
+"""
+Chunking por tokens alineado con la longitud máxima del modelo de embeddings
+all-MiniLM-L6-v2 trunca a 256 word pieces: todo lo que exceda ese límite
+se parsea y almacena pero nunca llega al embedding
+"""
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.utils.embedding_registry import get_embedding_model, DEFAULT_EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\S+")
+
+class TokenChunker:
+    """
+    Divide texto en ventanas de como máximo `max_tokens` tokens del modelo
+
+    El texto se tokeniza una sola vez con offsets de caracteres y las
+    ventanas se cortan sobre esos offsets (tiempo lineal, sin concatenar
+    strings). Los cortes no parten palabras en word pieces y las ventanas
+    consecutivas comparten `overlap` tokens. En tramos sin espacios (URLs,
+    tablas, texto de PDF corrupto) se corta a la fuerza: una ventana nunca
+    retrocede más allá del solapamiento.
+    """
+
+    def __init__(self, tokenizer=None, max_seq_length: int = 256, max_tokens: int = 0, overlap: int = 32):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        special = 0
+        if tokenizer is not None and hasattr(tokenizer, "num_special_tokens_to_add"):
+            special = tokenizer.num_special_tokens_to_add(pair=False)
+        # Presupuesto de contenido: [CLS] y [SEP] también ocupan posiciones
+        limit = max_seq_length - special
+        self.max_tokens = min(max_tokens, limit) if max_tokens else limit
+        self.overlap = max(0, min(overlap, self.max_tokens // 2))
+        self._has_offsets = bool(getattr(tokenizer, "is_fast", False))
+
+    def _token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Offsets (inicio, fin) de cada token; aproximación de ~4 caracteres por token sin tokenizer rápido"""
+        if self._has_offsets:
+            encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+            return [tuple(offset) for offset in encoded["offset_mapping"]]
+
+        offsets = []
+        for word in _WORD.finditer(text):
+            start, end = word.span()
+            pieces = max(1, (end - start) // 4)
+            step = (end - start) / pieces
+            offsets.extend((start + int(i * step), start + int((i + 1) * step)) for i in range(pieces))
+        return offsets
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens de contenido del texto (sin tokens especiales ni truncado)"""
+        return len(self._token_offsets(text))
+
+    def split(self, text: str) -> List[Tuple[int, int]]:
+        """Spans (inicio, fin) de caracteres de cada chunk"""
+        if not text or not text.strip():
+            return []
+
+        offsets = self._token_offsets(text)
+        if len(offsets) <= self.max_tokens:
+            return [_strip(text, 0, len(text))]
+
+        spans = []
+        total = len(offsets)
+        start = 0
+        while start < total:
+            end = min(total, start + self.max_tokens)
+            # No cortar dentro de una palabra (continuación de word piece),
+            # salvo que la palabra ocupe más de media ventana
+            if end < total:
+                min_end = start + self.max_tokens // 2
+                cut = end
+                while cut > min_end and offsets[cut][0] == offsets[cut - 1][1]:
+                    cut -= 1
+                if cut > min_end:
+                    end = cut
+            spans.append(_strip(text, offsets[start][0], offsets[end - 1][1]))
+            if end >= total:
+                break
+
+            # Siguiente ventana: primer inicio de palabra dentro del solapamiento;
+            # si no lo hay, corte duro en end - overlap
+            floor = max(end - self.overlap, start + 1)
+            next_start = floor
+            while next_start < end and offsets[next_start][0] == offsets[next_start - 1][1]:
+                next_start += 1
+            start = next_start if next_start < end else floor
+        return [span for span in spans if span[0] < span[1]]
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split(text)]
+
+    def truncation_report(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Cuánto texto queda fuera del embedding por truncado del modelo
+
+        Returns:
+            chunks, chunks truncados y tokens/caracteres descartados
+        """
+        report = {"max_seq_length": self.max_seq_length, "chunks": 0, "truncated_chunks": 0,
+                  "tokens": 0, "truncated_tokens": 0, "characters": 0, "truncated_characters": 0}
+        for text in texts:
+            offsets = self._token_offsets(text or "")
+            report["chunks"] += 1
+            report["tokens"] += len(offsets)
+            report["characters"] += len(text or "")
+            if len(offsets) > self.max_tokens:
+                report["truncated_chunks"] += 1
+                report["truncated_tokens"] += len(offsets) - self.max_tokens
+                report["truncated_characters"] += len(text) - offsets[self.max_tokens][0]
+
+        report["truncated_chunks_ratio"] = round(report["truncated_chunks"] / report["chunks"], 4) if report["chunks"] else 0.0
+        report["truncated_tokens_ratio"] = round(report["truncated_tokens"] / report["tokens"], 4) if report["tokens"] else 0.0
+        return report
+
+def _strip(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+_chunkers: Dict[str, TokenChunker] = {}
+
+def get_token_chunker(model_name: Optional[str] = None) -> TokenChunker:
+    """
+    Chunker con el tokenizer y max_seq_length del modelo de embeddings configurado
+
+    Configuración en settings.json: "token_chunking" {max_tokens (0 = límite
+    del modelo), overlap_tokens}
+    """
+    from app.config.settings import load_settings
+    settings = load_settings()
+    model_name = model_name or settings.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+
+    if model_name not in _chunkers:
+        config = settings.get("token_chunking", {})
+        tokenizer = None
+        max_seq_length = 256
+        try:
+            model = get_embedding_model(model_name)
+            tokenizer = getattr(model, "tokenizer", None)
+            max_seq_length = getattr(model, "max_seq_length", None) or max_seq_length
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo cargar el tokenizer de {model_name} ({e}), usando aproximación por caracteres")
+
+        _chunkers[model_name] = TokenChunker(
+            tokenizer=tokenizer,
+            max_seq_length=max_seq_length,
+            max_tokens=config.get("max_tokens", 0),
+            overlap=config.get("overlap_tokens", 32)
+        )
+        logger.info(
+            f"✂️ Chunker por tokens para {model_name}: {_chunkers[model_name].max_tokens} tokens, "
+            f"solapamiento {_chunkers[model_name].overlap}"
+        )
+    return _chunkers[model_name]
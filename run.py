@@ -1,8 +1,12 @@
 import os
 from app import create_app
 
-app = create_app()
+# La app se crea solo al ejecutar este archivo: los procesos de los pools
+# (spawn) vuelven a importar el módulo principal y no deben montar Flask,
+# ChromaDB ni los trabajos de ingesta. Para WSGI usar la factoría:
+# gunicorn "app:create_app()"
 
 if __name__ == "__main__":
+    app = create_app()
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=False)
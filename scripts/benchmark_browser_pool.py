@@ -0,0 +1,94 @@
+"""
+Benchmark del pool de navegadores frente a un Chrome nuevo por URL
+Sirve páginas estáticas generadas desde un servidor HTTP local, las descarga
+con ambos métodos y comprueba que el texto obtenido es el mismo
+Ejecutar desde la raíz del proyecto: python scripts/benchmark_browser_pool.py --pages 30
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from app.utils.browser_pool import BrowserPool, create_chrome_driver
+
+class _SilentHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def generar_sitio(directorio: str, paginas: int):
+    """Páginas enlazadas entre sí, con contenido añadido por JavaScript al cargar"""
+    for i in range(paginas):
+        enlaces = "".join(f'<a href="/pagina_{j}.html">Página {j}</a> ' for j in range(paginas) if j != i)
+        html = (
+            f"<html><head><title>Página {i}</title></head><body>"
+            f"<h1>Ayuntamiento - sección {i}</h1>"
+            f"<p>Trámite municipal número {i}: solicitud de licencia y documentación requerida.</p>"
+            f"<div id='dinamico'></div>{enlaces}"
+            f"<script>document.getElementById('dinamico').textContent = 'Contenido dinámico {i}';</script>"
+            f"</body></html>"
+        )
+        with open(os.path.join(directorio, f"pagina_{i}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+def fetch_por_url(url: str) -> str:
+    """Comportamiento anterior del crawler: un Chrome por URL + implicitly_wait(8)"""
+    driver = create_chrome_driver()
+    try:
+        driver.get(url)
+        driver.implicitly_wait(8)
+        return driver.page_source
+    finally:
+        driver.quit()
+
+def texto(html: str) -> str:
+    return BeautifulSoup(html, "html.parser").get_text(separator="\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de navegadores headless")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--size", type=int, default=1, help="Tamaño del pool")
+    parser.add_argument("--max-pages-per-driver", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        generar_sitio(directorio, args.pages)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_SilentHandler, directory=directorio))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/pagina_{i}.html" for i in range(args.pages)]
+
+        print(f"🌐 BENCHMARK POOL DE NAVEGADORES ({args.pages} páginas en {base})")
+        print("=" * 50)
+
+        start = time.time()
+        referencia = [texto(fetch_por_url(url)) for url in urls]
+        segundos_por_url = time.time() - start
+        print(f"🐢 Chrome por URL: {segundos_por_url:.2f}s ({segundos_por_url / args.pages:.3f}s/página)")
+
+        pool = BrowserPool(size=args.size, max_pages_per_driver=args.max_pages_per_driver)
+        try:
+            start = time.time()
+            resultado = [texto(pool.fetch(url)) for url in urls]
+            segundos_pool = time.time() - start
+        finally:
+            pool.close()
+        stats = pool.get_stats()
+        print(f"⚡ Pool: {segundos_pool:.2f}s ({segundos_pool / args.pages:.3f}s/página), "
+              f"{stats['drivers_started']} arranques, {stats['drivers_recycled']} reciclados")
+        print(f"🚀 Aceleración: x{segundos_por_url / max(segundos_pool, 1e-9):.1f}")
+
+        iguales = resultado == referencia
+        dinamico = all(f"Contenido dinámico {i}" in t for i, t in enumerate(resultado))
+        print(f"{'✅' if iguales else '❌'} Texto idéntico al método anterior: {iguales}")
+        print(f"{'✅' if dinamico else '❌'} Contenido generado por JavaScript presente: {dinamico}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark del chunker estructural (ordenanzas, actas y presupuestos)
+Compara la implementación original (re.split + concatenación de strings)
+con el chunker por offsets y comprueba que produce los mismos chunks
+Ejecutar desde la raíz del proyecto: python scripts/benchmark_chunker.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.structural_chunker import structural_spans
+
+def _split_referencia(text, pattern, section_type, key, label):
+    """Algoritmo original de _chunk_*_document: split + current_chunk += part"""
+    chunks = []
+    current_chunk = ""
+    value = None
+    for part in re.split(pattern, text, flags=re.IGNORECASE):
+        if re.match(pattern, part, re.IGNORECASE):
+            if current_chunk.strip():
+                chunks.append((current_chunk.strip(), {"section_type": section_type, key: value}))
+            value = label(part)
+            current_chunk = part
+        else:
+            current_chunk += part
+    if current_chunk.strip():
+        chunks.append((current_chunk.strip(), {"section_type": section_type, key: value}))
+    return chunks
+
+def _numero(part):
+    match = re.search(r'(\d+)', part)
+    return match.group(1) if match else None
+
+def chunks_referencia(text, doc_type):
+    if doc_type == "ordenanza":
+        return _split_referencia(text, r'(Artículo\s+\d+[.\-\s]*[.:]*)', "article", "article_number", _numero)
+    if doc_type == "presupuesto":
+        return _split_referencia(text, r'(Capítulo\s+[IVXLC\d]+|Partida\s+\d+)', "budget_section",
+                                 "section_id", lambda part: part.strip())
+    for pattern in [r'(\d+[.\-\s]*[Pp]unto[:\s])', r'(Punto\s+\d+[:\s])', r'(\d+\.\s*[A-Z])']:
+        if re.search(pattern, text, re.IGNORECASE):
+            return _split_referencia(text, pattern, "agenda_point", "point_number", _numero)
+    return []
+
+def chunks_offsets(text, doc_type, max_chars=0):
+    return [(text[start:end], meta) for start, end, meta in structural_spans(text, doc_type, max_chars)]
+
+def _sin_nulos(meta):
+    return {k: v for k, v in meta.items() if v is not None}
+
+def documento_sintetico(doc_type, secciones):
+    """Documento largo con la estructura típica de cada tipo"""
+    relleno = ("el presente texto regula las condiciones de uso de los espacios públicos municipales "
+               "y las obligaciones de las personas titulares de licencias. ").split(" ")
+    cuerpo = lambda: " ".join(random.choice(relleno) for _ in range(random.randint(40, 400)))
+    if doc_type == "ordenanza":
+        return "ORDENANZA MUNICIPAL\n\n" + "\n\n".join(f"Artículo {i}. {cuerpo()}" for i in range(1, secciones + 1))
+    if doc_type == "acta":
+        return "ACTA DE LA SESIÓN\n\n" + "\n\n".join(f"Punto {i}: {cuerpo()}" for i in range(1, secciones + 1))
+    return "PRESUPUESTO GENERAL\n\n" + "\n\n".join(
+        f"Capítulo {i}\n" + "\n".join(f"Partida {i}{j:02d} {cuerpo()}" for j in range(5))
+        for i in range(1, secciones // 5 + 1)
+    )
+
+def medir(funcion, documentos, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultados = [funcion(texto, doc_type) for texto, doc_type in documentos]
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del chunker estructural")
+    parser.add_argument("--sections", type=int, default=2000, help="Secciones por documento sintético")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-chars", type=int, default=4000, help="Longitud máxima de chunk a evaluar")
+    args = parser.parse_args()
+
+    print("🚀 BENCHMARK DEL CHUNKER ESTRUCTURAL")
+    print("=" * 50)
+
+    random.seed(42)
+    documentos = [(documento_sintetico(t, args.sections), t) for t in ("ordenanza", "acta", "presupuesto")]
+
+    resultados = {"timestamp": datetime.now().isoformat(), "sections": args.sections, "documents": []}
+    for texto, doc_type in documentos:
+        t_ref, ref = medir(chunks_referencia, [(texto, doc_type)], args.repeat)
+        t_new, new = medir(chunks_offsets, [(texto, doc_type)], args.repeat)
+        identicos = [(t, _sin_nulos(m)) for t, m in ref[0]] == [(t, _sin_nulos(m)) for t, m in new[0]]
+        limitados = chunks_offsets(texto, doc_type, args.max_chars)
+
+        resultado = {
+            "doc_type": doc_type,
+            "characters": len(texto),
+            "chunks": len(new[0]),
+            "reference_s": round(t_ref, 4),
+            "offsets_s": round(t_new, 4),
+            "speedup": round(t_ref / t_new, 2) if t_new else None,
+            "identical_chunks": identicos,
+            "chunks_with_max_chars": len(limitados),
+            "longest_chunk_with_max_chars": max((len(t) for t, _ in limitados), default=0),
+        }
+        resultados["documents"].append(resultado)
+
+        print(f"\n📄 {doc_type}")
+        for clave, valor in resultado.items():
+            print(f"   {clave}: {valor}")
+
+    os.makedirs("reports", exist_ok=True)
+    report_path = f"reports/chunker_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Reporte guardado en: {report_path}")
+
+if __name__ == "__main__":
+    main()
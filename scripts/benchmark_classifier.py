@@ -0,0 +1,124 @@
+"""
+Micro-benchmark del clasificador de tipos de documento
+Compara el recuento original (str.count + re.findall por patrón) con el
+clasificador de una sola pasada y comprueba que la salida es idéntica
+Ejecutar desde la raíz del proyecto: python scripts/benchmark_classifier.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.document_classifier import DocumentTypeClassifier, DOCUMENT_TYPE_PATTERNS
+
+def clasificar_referencia(text: str):
+    """Implementación original: un recorrido del texto por cada keyword y regex"""
+    if not text:
+        return "documento_vacio", {}
+    text_lower = text.lower()
+    scores = {}
+    for doc_type, pattern_info in DOCUMENT_TYPE_PATTERNS.items():
+        score = 0
+        for keyword in pattern_info["keywords"]:
+            score += text_lower.count(keyword)
+        for regex_pattern in pattern_info["regex"]:
+            score += len(re.findall(regex_pattern, text_lower)) * 3
+        scores[doc_type] = score
+    if max(scores.values()) > 0:
+        return max(scores, key=scores.get), scores
+    return "documento_general", scores
+
+def cargar_corpus(carpeta: str, limite: int):
+    """Textos de documentos reales (carpeta) o corpus sintético con vocabulario municipal"""
+    if carpeta:
+        from app.services.llamaindex_ingestor import MunicipalDocumentIngestor, _load_file_documents
+        textos = []
+        for path in MunicipalDocumentIngestor().list_folder_files(carpeta)[:limite]:
+            try:
+                textos.extend(doc.text for doc in _load_file_documents(path))
+            except Exception as e:
+                print(f"⚠️ No se pudo leer {path}: {e}")
+        print(f"📚 Corpus: {len(textos)} documentos de {carpeta}")
+        return textos
+
+    random.seed(42)
+    vocabulario = [w for info in DOCUMENT_TYPE_PATTERNS.values() for w in info["keywords"]]
+    vocabulario += ["artículo 12", "punto 3", "partida 1200", "1.234,56 €", "capítulo iv", "por tanto"]
+    relleno = ("el ayuntamiento informa a la ciudadanía sobre los servicios públicos "
+               "municipales y la atención en las oficinas del registro general").split()
+    textos = []
+    for _ in range(limite):
+        palabras = random.randint(200, 60000)  # de una página a un presupuesto de cientos
+        textos.append(" ".join(
+            random.choice(vocabulario) if random.random() < 0.05 else random.choice(relleno)
+            for _ in range(palabras)
+        ))
+    print(f"📚 Corpus sintético: {len(textos)} documentos")
+    return textos
+
+def medir(funcion, textos, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultados = [funcion(texto) for texto in textos]
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del clasificador de tipos de documento")
+    parser.add_argument("--folder", default="", help="Carpeta con documentos reales (por defecto corpus sintético)")
+    parser.add_argument("--limit", type=int, default=50, help="Número máximo de documentos")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se toma el mejor tiempo)")
+    parser.add_argument("--max-chars", type=int, default=200000, help="Tope de muestreo a evaluar además del texto completo")
+    args = parser.parse_args()
+
+    print("🚀 BENCHMARK DEL CLASIFICADOR DE DOCUMENTOS")
+    print("=" * 50)
+
+    textos = cargar_corpus(args.folder, args.limit)
+    caracteres = sum(len(t) for t in textos)
+
+    completo = DocumentTypeClassifier()
+    muestreado = DocumentTypeClassifier(max_chars=args.max_chars)
+
+    t_ref, ref = medir(clasificar_referencia, textos, args.repeat)
+    t_new, new = medir(completo.classify, textos, args.repeat)
+    t_sample, sample = medir(muestreado.classify, textos, args.repeat)
+
+    identicos = sum(1 for (tipo_r, scores_r), texto in zip(ref, textos)
+                    if tipo_r == completo.classify(texto)[0] and (not scores_r or scores_r == completo.scores(texto)))
+    coincidencias_muestra = sum(1 for (tipo_r, _), (tipo_s, _) in zip(ref, sample) if tipo_r == tipo_s)
+
+    resultado = {
+        "timestamp": datetime.now().isoformat(),
+        "documents": len(textos),
+        "characters": caracteres,
+        "reference_s": round(t_ref, 4),
+        "single_pass_s": round(t_new, 4),
+        "single_pass_speedup": round(t_ref / t_new, 2) if t_new else None,
+        "identical_output": f"{identicos}/{len(textos)}",
+        "sampled_max_chars": args.max_chars,
+        "sampled_s": round(t_sample, 4),
+        "sampled_speedup": round(t_ref / t_sample, 2) if t_sample else None,
+        "sampled_same_type": f"{coincidencias_muestra}/{len(textos)}",
+    }
+
+    for clave, valor in resultado.items():
+        print(f"   {clave}: {valor}")
+
+    os.makedirs("reports", exist_ok=True)
+    report_path = f"reports/classifier_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Reporte guardado en: {report_path}")
+
+if __name__ == "__main__":
+    main()
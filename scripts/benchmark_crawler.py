@@ -0,0 +1,112 @@
+"""
+Benchmark del crawler web concurrente frente al recorrido secuencial
+Sirve un sitio generado desde un servidor HTTP local con latencia simulada
+(algunas páginas solo tienen contenido generado con JavaScript) y compara
+un crawl página a página con AsyncCrawler
+Ejecutar desde la raíz del proyecto: python scripts/benchmark_crawler.py --pages 100
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from app.services.web_crawler import AsyncCrawler, extract_links, needs_browser
+
+class _SlowHandler(SimpleHTTPRequestHandler):
+    """Servidor estático con latencia fija por petición (como un servidor municipal lento)"""
+    latency = 0.1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+class _FakeBrowserPool:
+    """Sustituye al navegador: devuelve el HTML estático y cuenta las páginas renderizadas"""
+
+    def __init__(self):
+        self.pages = 0
+
+    def fetch(self, url):
+        self.pages += 1
+        return requests.get(url).text
+
+def generar_sitio(directorio: str, paginas: int, cada_js: int):
+    texto = "Información municipal sobre trámites, licencias, ayudas y servicios al ciudadano. " * 5
+    for i in range(paginas):
+        enlaces = "".join(f'<a href="pagina_{j}.html">Página {j}</a> '
+                          for j in (i + 1, i + 2, (i * 7) % paginas) if j < paginas)
+        cuerpo = (f"<div id='app'></div><script>document.getElementById('app').textContent = '{texto}';</script>"
+                  if cada_js and i % cada_js == cada_js - 1 else f"<h1>Sección {i}</h1><p>{texto}</p>")
+        with open(os.path.join(directorio, f"pagina_{i}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<html><body>{cuerpo}<nav>{enlaces}</nav></body></html>")
+
+def crawl_secuencial(base_url: str, max_paginas: int):
+    """Recorrido anterior: una página cada vez, en orden de descubrimiento"""
+    visitadas, pendientes, en_cola = set(), [base_url], {base_url}
+    session = requests.Session()
+    while pendientes and len(visitadas) < max_paginas:
+        url = pendientes.pop(0)
+        html = session.get(url).text
+        visitadas.add(url)
+        for nueva in extract_links(html, url):
+            if nueva not in visitadas and nueva not in en_cola:
+                pendientes.append(nueva)
+                en_cola.add(nueva)
+    return visitadas
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del crawler HTTP concurrente")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.1, help="Latencia simulada por petición (s)")
+    parser.add_argument("--js-every", type=int, default=10, help="Una de cada N páginas solo con JavaScript")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-host-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    _SlowHandler.latency = args.latency
+    with tempfile.TemporaryDirectory() as directorio:
+        generar_sitio(directorio, args.pages, args.js_every)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_SlowHandler, directory=directorio))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}/pagina_0.html"
+
+        print(f"🕸️ BENCHMARK CRAWLER ({args.pages} páginas, latencia {args.latency}s)")
+        print("=" * 50)
+
+        start = time.time()
+        secuencial = crawl_secuencial(base, args.pages)
+        segundos_secuencial = time.time() - start
+        print(f"🐢 Secuencial: {len(secuencial)} páginas en {segundos_secuencial:.2f}s")
+
+        navegador = _FakeBrowserPool()
+        crawler = AsyncCrawler({
+            "concurrency": args.concurrency,
+            "per_host_concurrency": args.concurrency,
+            "per_host_delay": args.per_host_delay
+        }, browser_pool=navegador)
+        paginas = []
+        start = time.time()
+        concurrente = crawler.crawl(base, args.pages, paginas.append)
+        segundos_concurrente = time.time() - start
+        print(f"⚡ Concurrente: {len(concurrente)} páginas en {segundos_concurrente:.2f}s "
+              f"({crawler.stats['http_pages']} HTTP, {crawler.stats['rendered_pages']} con navegador)")
+        print(f"🚀 Aceleración: x{segundos_secuencial / max(segundos_concurrente, 1e-9):.1f}")
+
+        esperadas_js = sum(1 for p in paginas if needs_browser(requests.get(p.url).text))
+        print(f"{'✅' if concurrente == secuencial else '❌'} Mismas páginas visitadas: {concurrente == secuencial}")
+        print(f"{'✅' if esperadas_js == navegador.pages else '❌'} "
+              f"Navegador solo para páginas JavaScript: {navegador.pages}/{esperadas_js}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
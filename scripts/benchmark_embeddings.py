@@ -0,0 +1,109 @@
+"""
+Benchmark de backends de embeddings (torch vs ONNX vs ONNX int8)
+Ejecutar desde la raíz del proyecto: python scripts/benchmark_embeddings.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.embedding_registry import get_embedding_model, EMBEDDING_BACKENDS
+from app.utils.rag_utils import DEFAULT_TEST_QUERIES
+from app.utils.metrics_evaluator import TFM_TEST_QUERIES
+
+def cargar_corpus(limite: int):
+    """Muestra de fragmentos reales de ChromaDB (o consultas de test si está vacío)"""
+    try:
+        from app.utils.chroma_store import get_chroma_store
+        store = get_chroma_store()
+        collection = store.client.get_collection(store.collection_name)
+        textos = collection.get(limit=limite, include=["documents"]).get("documents") or []
+        if textos:
+            print(f"📚 Corpus: {len(textos)} fragmentos de ChromaDB")
+            return textos
+    except Exception as e:
+        print(f"⚠️ No se pudo leer ChromaDB: {e}")
+
+    textos = DEFAULT_TEST_QUERIES + TFM_TEST_QUERIES
+    print(f"📚 Corpus: {len(textos)} consultas de test")
+    return textos
+
+def medir_backend(model_name, backend, textos, consultas, batch_size):
+    """Throughput (documentos), latencia por consulta y embeddings resultantes"""
+    inicio = time.time()
+    modelo = get_embedding_model(model_name, backend=backend)
+    carga = time.time() - inicio
+
+    # Calentamiento
+    modelo.encode(textos[:batch_size], batch_size=batch_size)
+
+    inicio = time.time()
+    embeddings = modelo.encode(textos, batch_size=batch_size, normalize_embeddings=True)
+    duracion = time.time() - inicio
+
+    latencias = []
+    for consulta in consultas:
+        inicio = time.time()
+        modelo.encode([consulta])
+        latencias.append((time.time() - inicio) * 1000)
+
+    return {
+        "backend": backend,
+        "load_time_s": round(carga, 3),
+        "throughput_docs_s": round(len(textos) / duracion, 1) if duracion > 0 else None,
+        "latency_ms_p50": round(float(np.percentile(latencias, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencias, 95)), 2),
+    }, np.asarray(embeddings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--limit", type=int, default=2000, help="Número máximo de fragmentos del corpus")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print("🚀 BENCHMARK DE BACKENDS DE EMBEDDINGS")
+    print("=" * 50)
+
+    textos = cargar_corpus(args.limit)
+    consultas = TFM_TEST_QUERIES
+
+    resultados = []
+    referencia = None
+    for backend in args.backends:
+        print(f"\n⏱️ Midiendo backend: {backend}")
+        resultado, embeddings = medir_backend(args.model, backend, textos, consultas, args.batch_size)
+
+        if backend == "torch":
+            referencia = embeddings
+        if referencia is not None:
+            # Coseno entre vectores normalizados del mismo texto
+            cosenos = np.sum(referencia * embeddings, axis=1)
+            resultado["cosine_vs_torch_mean"] = round(float(np.mean(cosenos)), 5)
+            resultado["cosine_vs_torch_min"] = round(float(np.min(cosenos)), 5)
+
+        resultados.append(resultado)
+        for clave, valor in resultado.items():
+            print(f"   {clave}: {valor}")
+
+    os.makedirs("reports", exist_ok=True)
+    report_path = f"reports/embedding_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "model": args.model,
+            "corpus_size": len(textos),
+            "results": resultados
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Reporte guardado en: {report_path}")
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ sys.path.insert(0, str(project_root))
 from app.utils.chroma_store import get_chroma_store
 from app.utils.rag_utils import (
     ingest_documents_with_llamaindex, 
+    obtener_estadisticas_ultima_ingesta,
     obtener_estadisticas_vectorstore,
     diagnosticar_vectorstore
 )
@@ -89,7 +90,11 @@ def migrate_documents(config):
     
     try:
         total_docs = ingest_documents_with_llamaindex(folders)
-        logger.info(f"✅ Documentos migrados: {total_docs}")
+        stats = obtener_estadisticas_ultima_ingesta()
+        logger.info(
+            f"✅ Documentos migrados: {total_docs} "
+            f"({stats.get('chunks_por_segundo', 0)} chunks/s, {stats.get('procesos_embedding', 1)} procesos)"
+        )
         return total_docs
     except Exception as e:
         logger.error(f"❌ Error migrando documentos: {e}")
@@ -0,0 +1,49 @@
+"""
+Reindexación de documentos en ChromaDB desde línea de comandos
+Ejecutar desde la raíz del proyecto: python scripts/reindex_documents.py --workers 8
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.rag_utils import ingest_documents_with_llamaindex, obtener_estadisticas_ultima_ingesta
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+def main():
+    parser = argparse.ArgumentParser(description="Reindexar carpetas de documentos en ChromaDB")
+    parser.add_argument("folders", nargs="*", help="Carpetas a procesar (por defecto, document_folders de settings.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos de embeddings (0/1 = sin pool; por defecto, embedding_workers de settings.json)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rechunkear todos los archivos aunque no hayan cambiado (el texto sale de la caché)")
+    args = parser.parse_args()
+
+    folders = args.folders
+    if not folders:
+        with open(os.path.join("app", "config", "settings.json"), "r", encoding="utf-8") as f:
+            folders = json.load(f).get("document_folders", [])
+
+    if not folders:
+        print("⚠️ No hay carpetas configuradas")
+        return False
+
+    print(f"🚀 Reindexando {len(folders)} carpetas...")
+    total = ingest_documents_with_llamaindex(folders, embedding_workers=args.workers, forzar=args.force)
+    stats = obtener_estadisticas_ultima_ingesta()
+
+    print("=" * 50)
+    print(f"✅ Fragmentos indexados: {total}")
+    print(f"⏱️ Duración: {stats.get('segundos', 0)}s")
+    print(f"⚡ Throughput: {stats.get('chunks_por_segundo', 0)} chunks/s")
+    print(f"🧵 Procesos de embedding: {stats.get('procesos_embedding', 1)}")
+    print(f"🧠 Embeddings reutilizados de caché: {stats.get('embeddings_reutilizados', 0)} "
+          f"(calculados: {stats.get('embeddings_calculados', 0)})")
+    return total > 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Informe de truncado: cuánto texto almacenado en ChromaDB nunca llega al embedding
+Los chunks que superan max_seq_length del modelo se truncan en silencio al embeber
+Ejecutar desde la raíz del proyecto: python scripts/report_truncation.py
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.chroma_store import get_chroma_store
+from app.utils.token_chunker import get_token_chunker
+
+def iterar_textos(collection, batch_size: int):
+    """Documentos de la colección por lotes (sin cargar toda la colección en memoria)"""
+    offset = 0
+    while True:
+        lote = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+        documentos = lote.get("documents") or []
+        if not documentos:
+            break
+        yield documentos, lote.get("metadatas") or [{}] * len(documentos)
+        offset += len(documentos)
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de texto truncado por el modelo de embeddings")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    print("✂️ INFORME DE TRUNCADO DE EMBEDDINGS")
+    print("=" * 50)
+
+    store = get_chroma_store()
+    chunker = get_token_chunker(store.embeddings.model_name)
+    collection = store.client.get_collection(store.collection_name)
+
+    total = None
+    por_metodo = {}
+    for documentos, metadatos in iterar_textos(collection, args.batch_size):
+        for texto, metadata in zip(documentos, metadatos):
+            parcial = chunker.truncation_report([texto])
+            if total is None:
+                total = {k: 0 for k in parcial if not k.endswith("_ratio") and k != "max_seq_length"}
+            for clave in total:
+                total[clave] += parcial[clave]
+
+            # Desglose por método de ingesta (llamaindex_v2, web, migración FAISS...)
+            metodo = (metadata or {}).get("metodo_ingesta") or (metadata or {}).get("fuente", "desconocido")
+            acumulado = por_metodo.setdefault(metodo, {"chunks": 0, "truncated_chunks": 0, "truncated_tokens": 0})
+            for clave in acumulado:
+                acumulado[clave] += parcial[clave]
+
+    if not total:
+        print("⚠️ La colección está vacía")
+        return
+
+    total["max_seq_length"] = chunker.max_seq_length
+    total["content_tokens_per_chunk"] = chunker.max_tokens
+    total["truncated_chunks_ratio"] = round(total["truncated_chunks"] / total["chunks"], 4)
+    total["truncated_tokens_ratio"] = round(total["truncated_tokens"] / total["tokens"], 4) if total["tokens"] else 0.0
+    total["truncated_characters_ratio"] = round(total["truncated_characters"] / total["characters"], 4) if total["characters"] else 0.0
+
+    for clave, valor in total.items():
+        print(f"   {clave}: {valor}")
+    print("\n📊 Por método de ingesta:")
+    for metodo, datos in sorted(por_metodo.items()):
+        print(f"   {metodo}: {datos['truncated_chunks']}/{datos['chunks']} chunks truncados, "
+              f"{datos['truncated_tokens']} tokens descartados")
+
+    os.makedirs("reports", exist_ok=True)
+    report_path = f"reports/truncation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "model": store.embeddings.model_name,
+            "summary": total,
+            "by_ingestion_method": por_metodo
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Reporte guardado en: {report_path}")
+
+if __name__ == "__main__":
+    main()
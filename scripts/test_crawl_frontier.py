@@ -0,0 +1,107 @@
+"""
+Comprobaciones de la frontera del crawler (sin red)
+Canonicalización de URLs, deduplicación, prioridades, robots.txt y sitemaps
+Ejecutar desde la raíz del proyecto: python scripts/test_crawl_frontier.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.crawl_frontier import CrawlFrontier, canonicalize_url, parse_sitemap
+
+def test_canonicalizacion():
+    """Las variantes de una misma página tienen la misma forma canónica"""
+    canonica = "https://ayto.es/tramites/licencias?a=1&b=2"
+    variantes = [
+        "https://ayto.es/tramites/licencias?a=1&b=2",
+        "HTTPS://AYTO.ES:443/tramites/licencias/?b=2&a=1",
+        "https://ayto.es/tramites/./otros/../licencias?a=1&b=2#requisitos",
+        "https://ayto.es/tramites/licencias?utm_source=x&a=1&fbclid=y&b=2",
+        "https://ayto.es./tramites/licencias?a=1&b=2&PHPSESSID=abc",
+    ]
+    for url in variantes:
+        assert canonicalize_url(url) == canonica, f"{url} -> {canonicalize_url(url)}"
+
+    assert canonicalize_url("http://ayto.es:8080/") == "http://ayto.es:8080/"
+    assert canonicalize_url("https://ayto.es/a%20b") == canonicalize_url("https://ayto.es/a b")
+    assert canonicalize_url("https://ayto.es") == "https://ayto.es/"
+    for url in ("mailto:alcaldia@ayto.es", "javascript:void(0)", "ftp://ayto.es/x", "https://", "http://[::1"):
+        assert canonicalize_url(url) is None, url
+    print("✅ Canonicalización de URLs")
+
+def test_frontera():
+    """Deduplicación, exclusiones, prioridades y tope de variantes de query"""
+    frontier = CrawlFrontier("ayto.es", {"path_priorities": {"/tramites": -5},
+                                         "max_query_variants_per_path": 2})
+    assert frontier.add("https://ayto.es/noticias", 1)
+    assert frontier.add("https://ayto.es/noticias/?utm_campaign=x", 1) is None
+    assert frontier.add("https://ayto.es/tramites/licencias", 2)
+    assert frontier.add("https://ayto.es/login", 1) is None
+    assert frontier.add("https://ayto.es/bando.pdf", 1) is None
+    assert frontier.add("https://otro.es/pagina", 1) is None
+    assert frontier.add("https://ayto.es/agenda/2024", 1)
+    for pagina in range(1, 4):
+        frontier.add(f"https://ayto.es/noticias?pagina={pagina}", 1)
+
+    orden = []
+    while len(frontier):
+        orden.append(frontier.pop()[2])
+    assert orden[0] == "https://ayto.es/tramites/licencias", "las rutas prioritarias van primero"
+    assert orden.index("https://ayto.es/agenda/2024") > orden.index("https://ayto.es/noticias"), \
+        "las agendas van detrás de las páginas con contenido"
+    assert all("pagina=" in url for url in orden[-2:]), "la paginación va al final"
+    assert sum("pagina=" in url for url in orden) == 2
+    assert frontier.stats["duplicates"] == 1
+    assert frontier.stats["query_variants_capped"] == 1
+    print("✅ Frontera por prioridad")
+
+def test_robots_y_snapshot():
+    """robots.txt bloquea rutas y la frontera se reanuda desde su instantánea"""
+    frontier = CrawlFrontier("ayto.es")
+    frontier.load_robots("User-agent: *\nDisallow: /privado\nCrawl-delay: 2\n"
+                         "Sitemap: https://ayto.es/sitemap.xml\n")
+    assert frontier.add("https://ayto.es/privado/actas", 1) is None
+    assert frontier.stats["robots_blocked"] == 1
+    assert frontier.robots_crawl_delay() == 2.0
+    assert frontier.robots_sitemaps() == ["https://ayto.es/sitemap.xml"]
+
+    frontier.add("https://ayto.es/a", 1)
+    frontier.add("https://ayto.es/b", 1)
+    reanudada = CrawlFrontier("ayto.es")
+    reanudada.restore(frontier.snapshot())
+    assert reanudada.add("https://ayto.es/a/", 1) is None, "las URLs vistas se conservan"
+    assert [reanudada.pop()[2] for _ in range(2)] == ["https://ayto.es/a", "https://ayto.es/b"]
+    print("✅ robots.txt e instantáneas")
+
+def test_sitemaps():
+    """Sitemaps de URLs y sitemapindex"""
+    urls, hijos = parse_sitemap(
+        '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        "<url><loc>https://ayto.es/a</loc><priority>0.8</priority></url>"
+        "<url><loc>https://ayto.es/b</loc></url><url><priority>1</priority></url></urlset>"
+    )
+    assert urls == [("https://ayto.es/a", 0.8), ("https://ayto.es/b", None)] and hijos == []
+
+    urls, hijos = parse_sitemap(
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        "<sitemap><loc>https://ayto.es/sitemap-1.xml</loc></sitemap></sitemapindex>"
+    )
+    assert urls == [] and hijos == ["https://ayto.es/sitemap-1.xml"]
+    assert parse_sitemap("<no es xml") == ([], [])
+    print("✅ Sitemaps")
+
+def main():
+    print("🕸️ COMPROBACIONES DE LA FRONTERA DEL CRAWLER")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_canonicalizacion, test_frontera, test_robots_y_snapshot, test_sitemaps):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
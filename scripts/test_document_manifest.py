@@ -0,0 +1,97 @@
+"""
+Comprobaciones del manifiesto de documentos (ingesta incremental)
+Estados de archivo, ids de chunk y borrado por carpeta
+Ejecutar desde la raíz del proyecto: python scripts/test_document_manifest.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.document_manifest import (
+    DocumentManifest, chunk_id, file_sha256, FILE_NEW, FILE_CHANGED, FILE_UNCHANGED
+)
+
+def _escribir(path, texto):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(texto)
+
+def test_estados_de_archivo():
+    """Nuevo → sin cambios → modificado; un touch no fuerza reindexación"""
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = os.path.join(tmp, "ordenanza.txt")
+        _escribir(doc, "Artículo 1. Objeto.")
+        manifest = DocumentManifest(os.path.join(tmp, "manifest.json"))
+
+        estado, sha = manifest.check(doc)
+        assert estado == FILE_NEW and sha == file_sha256(doc)
+        manifest.update(doc, sha, [chunk_id(doc, sha, 0)])
+        manifest.save()
+
+        recargado = DocumentManifest(manifest.path)
+        assert recargado.check(doc)[0] == FILE_UNCHANGED
+
+        os.utime(doc, (1, 1))
+        assert recargado.check(doc)[0] == FILE_UNCHANGED, "un touch no cambia el contenido"
+
+        _escribir(doc, "Artículo 1. Objeto y ámbito.")
+        assert recargado.check(doc)[0] == FILE_CHANGED
+    print("✅ Estados nuevo / sin cambios / modificado")
+
+def test_ids_por_ruta():
+    """Copias idénticas en rutas distintas no comparten ids de chunk"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "a", "acta.txt")
+        copia = os.path.join(tmp, "b", "acta.txt")
+        os.makedirs(os.path.dirname(original))
+        os.makedirs(os.path.dirname(copia))
+        _escribir(original, "Acta del pleno ordinario")
+        shutil.copy(original, copia)
+        sha = file_sha256(original)
+        assert sha == file_sha256(copia)
+
+        ids_original = [chunk_id(original, sha, i) for i in range(3)]
+        ids_copia = [chunk_id(copia, sha, i) for i in range(3)]
+        assert not set(ids_original) & set(ids_copia)
+        # Deterministas: misma ruta y contenido dan los mismos ids
+        assert ids_original == [chunk_id(original, sha, i) for i in range(3)]
+        assert len(set(ids_original)) == 3
+
+        manifest = DocumentManifest(os.path.join(tmp, "manifest.json"))
+        manifest.update(original, sha, ids_original)
+        manifest.update(copia, sha, ids_copia)
+        assert manifest.remove(copia) == ids_copia
+        assert manifest.get(original)["chunk_ids"] == ids_original
+    print("✅ Ids de chunk distintos por ruta")
+
+def test_rutas_por_carpeta():
+    """paths_under no confunde carpetas con prefijo común"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for carpeta in ("fuentes", "fuentes2"):
+            os.makedirs(os.path.join(tmp, carpeta))
+            doc = os.path.join(tmp, carpeta, "doc.txt")
+            _escribir(doc, carpeta)
+        manifest = DocumentManifest(os.path.join(tmp, "manifest.json"))
+        for carpeta in ("fuentes", "fuentes2"):
+            doc = os.path.join(tmp, carpeta, "doc.txt")
+            manifest.update(doc, file_sha256(doc), [])
+        rutas = manifest.paths_under(os.path.join(tmp, "fuentes"))
+        assert rutas == [os.path.abspath(os.path.join(tmp, "fuentes", "doc.txt"))]
+    print("✅ Rutas por carpeta")
+
+def main():
+    print("🧾 COMPROBACIONES DEL MANIFIESTO DE DOCUMENTOS")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_estados_de_archivo, test_ids_por_ruta, test_rutas_por_carpeta):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
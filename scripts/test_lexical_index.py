@@ -0,0 +1,87 @@
+"""
+Comprobaciones del índice léxico BM25 (sin ChromaDB ni modelos)
+Altas, bajas, compactación de posiciones borradas y persistencia
+Ejecutar desde la raíz del proyecto: python scripts/test_lexical_index.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.lexical_index import BM25Index, is_identifier_query, reciprocal_rank_fusion
+
+TEXTOS = {
+    "a": "Ordenanza reguladora de la tasa por licencia de obras",
+    "b": "Acta del pleno: aprobación del expediente 2023/0045",
+    "c": "Presupuesto municipal del ejercicio 2024, capítulo de inversiones",
+}
+
+def _indice(path):
+    index = BM25Index(path)
+    index.add(list(TEXTOS), list(TEXTOS.values()))
+    return index
+
+def test_busqueda_y_borrado():
+    """Los documentos borrados desaparecen de los postings y de los resultados"""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _indice(os.path.join(tmp, "bm25.pkl"))
+        assert index.search("2023/0045", k=3)[0][0] == "b"
+        assert index.dirty
+
+        index.remove(["b"])
+        assert len(index) == 2
+        assert index.search("2023/0045", k=3) == []
+        assert "2023/0045" not in index.postings
+        # Reemplazar un documento no deja rastro del texto anterior
+        index.add(["a"], ["Ordenanza de ruidos"])
+        assert index.search("licencia", k=3) == []
+        assert index.search("ruidos", k=3)[0][0] == "a"
+    print("✅ Búsqueda, reemplazo y borrado")
+
+def test_compactacion_y_persistencia():
+    """Guardar compacta las posiciones borradas y el índice recargado es equivalente"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bm25.pkl")
+        index = _indice(path)
+        index.remove(["a"])
+        esperado = index.search("presupuesto inversiones", k=3)
+
+        assert index.flush() and not index.dirty
+        assert index.doc_ids == ["b", "c"]
+        assert not index.flush(), "sin cambios no se vuelve a guardar"
+
+        recargado = BM25Index(path)
+        assert recargado.load()
+        assert len(recargado) == 2
+        assert recargado.search("presupuesto inversiones", k=3) == esperado
+        recargado.remove(["c"])
+        assert recargado.search("presupuesto", k=3) == []
+    print("✅ Compactación y persistencia")
+
+def test_consultas_identificadoras_y_rrf():
+    """Vía rápida léxica y fusión de rankings"""
+    assert is_identifier_query("expediente 2023/0045")
+    assert is_identifier_query("art. 12")
+    assert not is_identifier_query("licencia de obras en suelo rústico")
+
+    fusion = reciprocal_rank_fusion([["x", "y"], ["y", "z"]])
+    assert fusion[0][0] == "y"
+    assert [doc_id for doc_id, _ in fusion] == ["y", "x", "z"]
+    print("✅ Consultas identificadoras y RRF")
+
+def main():
+    print("🔎 COMPROBACIONES DEL ÍNDICE BM25")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_busqueda_y_borrado, test_compactacion_y_persistencia,
+                 test_consultas_identificadoras_y_rrf):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
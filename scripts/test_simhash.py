@@ -0,0 +1,78 @@
+"""
+Comprobaciones de la detección de fragmentos web casi duplicados
+Huellas SimHash, índice por bandas y relación de fragmentos descartados
+Ejecutar desde la raíz del proyecto: python scripts/test_simhash.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.simhash import simhash, hamming_distance, SimHashIndex
+from app.utils.crawl_state import CrawlState
+
+AVISO = ("El Ayuntamiento informa de que el plazo de presentación de solicitudes para las "
+         "ayudas al comercio local permanecerá abierto hasta el día 15 de marzo en la sede "
+         "electrónica municipal y en el registro general de la casa consistorial")
+
+def test_huellas():
+    """Un cambio pequeño mueve pocos bits; un texto distinto, muchos"""
+    variante = AVISO.replace("15 de marzo", "22 de marzo")
+    otro = "Orden del día del pleno extraordinario: aprobación inicial del presupuesto general"
+    assert simhash(AVISO) == simhash(AVISO.upper()), "la huella no distingue mayúsculas"
+    assert hamming_distance(simhash(AVISO), simhash(variante)) <= 3
+    assert hamming_distance(simhash(AVISO), simhash(otro)) > 3
+    assert simhash("") == 0
+    print("✅ Huellas SimHash")
+
+def test_indice():
+    """find devuelve la clave cercana y respeta `exclude`"""
+    index = SimHashIndex(max_distance=3)
+    huella = simhash(AVISO)
+    index.add(huella, "web-a-0")
+    cercana = huella ^ 0b101  # dos bits de distancia
+    lejana = huella ^ 0xFFFF0000FFFF
+
+    assert index.find(cercana) == "web-a-0"
+    assert index.find(lejana) is None
+    assert index.find(cercana, exclude={"web-a-0"}) is None
+    index.add(huella, "web-b-0")
+    assert index.find(cercana, exclude={"web-a-0"}) == "web-b-0"
+    assert len(index) == 2
+    print("✅ Índice por bandas")
+
+def test_paginas_dependientes():
+    """Una página con fragmentos descartados se invalida si el original desaparece"""
+    with tempfile.TemporaryDirectory() as tmp:
+        estado = CrawlState(os.path.join(tmp, "crawl_state.json"))
+        estado.update("https://ayto.es/a", "sha-a", ["web-a-0"], [], etag='"1"')
+        estado.update("https://ayto.es/b", "sha-b", ["web-b-1"], [], etag='"2"', suppressed_by=["web-a-0"])
+
+        assert estado.dependents(["web-a-0"]) == ["https://ayto.es/b"]
+        assert estado.dependents(["web-b-1"]) == []
+
+        estado.invalidate("https://ayto.es/b")
+        assert estado.pending_reindex("ayto.es") == ["https://ayto.es/b"]
+        assert estado.conditional_headers("https://ayto.es/b") == {}
+        assert estado.get("https://ayto.es/b")["content_sha256"] is None
+
+        # Al volver a indexarla deja de estar pendiente
+        estado.update("https://ayto.es/b", "sha-b", ["web-b-0", "web-b-1"], [])
+        assert estado.pending_reindex() == []
+    print("✅ Reindexación de páginas dependientes")
+
+def main():
+    print("♻️ COMPROBACIONES DE CASI DUPLICADOS")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_huellas, test_indice, test_paginas_dependientes):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
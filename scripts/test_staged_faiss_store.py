@@ -0,0 +1,133 @@
+"""
+Comprobaciones del vectorstore FAISS por lotes (StagedFaissStore)
+Lotes en disco, checkpoint/reanudación y consolidación con fragmentos eliminados
+Ejecutar desde la raíz del proyecto: python scripts/test_staged_faiss_store.py
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.staged_faiss_store import StagedFaissStore
+
+DIM = 8
+
+def _fragmentos(prefijo: str, n: int):
+    textos = [f"{prefijo} {i}" for i in range(n)]
+    vectores = np.random.default_rng(len(prefijo) + n).random((n, DIM), dtype="float32")
+    metadatos = [{"chunk_id": f"{prefijo}-{i}", "url": f"https://ayto.es/{prefijo}"} for i in range(n)]
+    return textos, vectores, metadatos
+
+def test_lotes_y_checkpoint():
+    """Los lotes escritos tras el checkpoint se descartan al reanudar"""
+    with tempfile.TemporaryDirectory() as vector_dir:
+        store = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        store.add(*_fragmentos("a", 5))
+        assert store.batches == 1 and store.rows == 5
+        store.save_checkpoint({"visitadas": ["https://ayto.es/a"]})
+        store.add(*_fragmentos("b", 4))
+        store.add(*_fragmentos("c", 2))
+        store.flush()
+        assert store.batches == 3 and store.rows == 11
+
+        reanudado = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        checkpoint = reanudado.load_checkpoint()
+        assert checkpoint["visitadas"] == ["https://ayto.es/a"]
+        reanudado.resume(checkpoint)
+        assert reanudado.batches == 1 and reanudado.rows == 5
+        assert not os.path.exists(reanudado._batch_path(1)) and not os.path.exists(reanudado._batch_path(2))
+        assert [meta["chunk_id"] for _, meta in reanudado.staged_rows()] == [f"a-{i}" for i in range(5)]
+    print("✅ Lotes y checkpoint")
+
+def test_consolidacion():
+    """Consolidar conserva lo anterior, sustituye lo re-ingestado y quita lo eliminado"""
+    with tempfile.TemporaryDirectory() as vector_dir:
+        store = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        store.add(*_fragmentos("a", 5))
+        resumen = store.consolidate()
+        assert resumen == {"fragmentos": 5, "conservados": 0, "nuevos": 5, "eliminados": 0}
+        store.reset()
+
+        textos, vectores, metadatos = _fragmentos("b", 3)
+        store.add(textos + ["a 1 nuevo"], np.vstack([vectores, np.ones((1, DIM), dtype="float32")]),
+                  metadatos + [{"chunk_id": "a-1"}])
+        resumen = store.consolidate(removed_ids={"a-0"})
+        assert resumen == {"fragmentos": 7, "conservados": 3, "nuevos": 4, "eliminados": 1}
+
+        fragmentos, metadatos = store.previous_rows()
+        assert fragmentos[:3] == ["a 2", "a 3", "a 4"] and fragmentos[-1] == "a 1 nuevo"
+        assert len(metadatos) == 7
+        embeddings = np.load(store.embeddings_path)
+        assert embeddings.shape == (7, DIM)
+        assert np.allclose(embeddings[-1], 1.0)
+
+        import faiss
+        index = faiss.read_index(store.index_path)
+        assert index.ntotal == 7
+        _, posiciones = index.search(np.ones((1, DIM), dtype="float32"), 1)
+        assert posiciones[0][0] == 6
+    print("✅ Consolidación")
+
+def test_consolidacion_sin_anterior():
+    """keep_previous=False reescribe el vectorstore solo con los lotes"""
+    with tempfile.TemporaryDirectory() as vector_dir:
+        store = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        store.add(*_fragmentos("a", 3))
+        store.consolidate()
+        store.reset()
+        store.add(*_fragmentos("b", 2))
+        resumen = store.consolidate(keep_previous=False)
+        assert resumen["fragmentos"] == 2 and resumen["conservados"] == 0
+        assert store.previous_rows()[0] == ["b 0", "b 1"]
+    print("✅ Consolidación sin vectorstore anterior")
+
+def test_consolidacion_interrumpida():
+    """Una consolidación interrumpida nunca mezcla metadatos y vectores de generaciones distintas"""
+    with tempfile.TemporaryDirectory() as vector_dir:
+        store = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        store.add(*_fragmentos("a", 5))
+        store.consolidate()
+        store.reset()
+
+        # Muere tras confirmar (marcador escrito) pero antes de renombrar: se completa al reabrir
+        store.add(*_fragmentos("b", 2))
+        aplicar = store._apply_commit
+        store._apply_commit = lambda: (_ for _ in ()).throw(KeyboardInterrupt())
+        try:
+            store.consolidate()
+            assert False, "la consolidación debía interrumpirse"
+        except KeyboardInterrupt:
+            pass
+        store._apply_commit = aplicar
+        assert os.path.exists(store.commit_path)
+        reabierto = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        fragmentos, metadatos = reabierto.previous_rows()
+        assert len(fragmentos) == len(metadatos) == len(np.load(reabierto.embeddings_path)) == 7
+        assert not os.path.exists(reabierto.commit_path)
+
+        # Muere antes de confirmar: los temporales se descartan y queda la generación anterior
+        with open(reabierto.metadatos_path + ".tmp", "wb") as f:
+            f.write(b"incompleto")
+        reabierto = StagedFaissStore(vector_dir, batch_size=4, dim=DIM)
+        assert not os.path.exists(reabierto.metadatos_path + ".tmp")
+        assert len(reabierto.previous_rows()[1]) == 7
+    print("✅ Consolidación interrumpida")
+
+def main():
+    print("🧱 COMPROBACIONES DEL VECTORSTORE POR LOTES")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_lotes_y_checkpoint, test_consolidacion, test_consolidacion_sin_anterior,
+                 test_consolidacion_interrumpida):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,65 @@
+"""
+Comprobaciones del chunker por tokens (aproximación por caracteres, sin modelo)
+Límite de tokens por ventana, solapamiento y texto sin espacios
+Ejecutar desde la raíz del proyecto: python scripts/test_token_chunker.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.token_chunker import TokenChunker
+
+def _chunker():
+    return TokenChunker(tokenizer=None, max_seq_length=64, overlap=8)
+
+def test_ventanas_dentro_del_limite():
+    """Ninguna ventana supera max_tokens y todo el texto queda cubierto"""
+    chunker = _chunker()
+    palabras = [f"palabra{i:04d}" for i in range(400)]
+    texto = " ".join(palabras)
+    chunks = chunker.split_text(texto)
+
+    assert len(chunks) > 1
+    assert all(chunker.count_tokens(chunk) <= chunker.max_tokens for chunk in chunks)
+    # Los cortes caen entre palabras y todas las palabras aparecen
+    vistas = {p for chunk in chunks for p in chunk.split()}
+    assert vistas == set(palabras)
+    print(f"✅ {len(chunks)} ventanas dentro de {chunker.max_tokens} tokens")
+
+def test_solapamiento():
+    """Ventanas consecutivas comparten palabras del final de la anterior"""
+    chunker = _chunker()
+    texto = " ".join(f"w{i:06d}" for i in range(200))
+    chunks = chunker.split_text(texto)
+    for anterior, siguiente in zip(chunks, chunks[1:]):
+        assert siguiente.split()[0] in anterior.split(), "sin solapamiento"
+    print("✅ Solapamiento entre ventanas")
+
+def test_texto_sin_espacios():
+    """Regresión: una palabra enorme no multiplica el texto (antes ~190x)"""
+    chunker = _chunker()
+    for texto in ("x" * 4000, "prefijo " + "y" * 4000 + " sufijo"):
+        spans = chunker.split(texto)
+        tokens = chunker.count_tokens(texto)
+        paso = chunker.max_tokens // 2 - chunker.overlap
+        assert len(spans) <= tokens // paso + 2, f"{len(spans)} ventanas para {tokens} tokens"
+        total = sum(end - start for start, end in spans)
+        assert total <= 1.5 * len(texto), f"{total} caracteres para un texto de {len(texto)}"
+        assert spans[0][0] == 0 and spans[-1][1] == len(texto)
+    print(f"✅ Texto sin espacios: {len(spans)} ventanas, {total} caracteres")
+
+def main():
+    print("✂️ COMPROBACIONES DEL CHUNKER POR TOKENS")
+    print("=" * 40)
+    fallos = 0
+    for test in (test_ventanas_dentro_del_limite, test_solapamiento, test_texto_sin_espacios):
+        try:
+            test()
+        except AssertionError as e:
+            fallos += 1
+            print(f"❌ {test.__name__}: {e or 'comprobación fallida'}")
+    return fallos == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -9,7 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.utils.chroma_store import get_chroma_store
 from app.utils.rag_utils import (
-    buscar_fragmentos_combinados,
+    buscar_fragmentos_batch,
     buscar_por_tipo_documento,
     obtener_tipos_documento_disponibles,
     obtener_estadisticas_vectorstore
@@ -54,14 +54,16 @@ def test_semantic_search():
     ]
     
     results = {}
-    for query in test_queries:
-        try:
-            fragmentos = buscar_fragmentos_combinados(query, k=3)
+    try:
+        # Todas las consultas en un único lote
+        batch_fragmentos = buscar_fragmentos_batch(test_queries, k=3)
+        for query, fragmentos in zip(test_queries, batch_fragmentos):
             results[query] = len(fragmentos)
             print(f"✅ '{query}': {len(fragmentos)} fragmentos encontrados")
-        except Exception as e:
+    except Exception as e:
+        for query in test_queries:
             results[query] = f"Error: {e}"
-            print(f"❌ '{query}': {e}")
+        print(f"❌ Error en búsqueda por lotes: {e}")
     
     return results
 